@@ -1,5 +1,6 @@
 const { app, BrowserWindow, ipcMain } = require("electron");
 const { spawn } = require("child_process");
+const net = require("net");
 const path = require("path");
 
 const PYTHON_BIN =
@@ -13,6 +14,20 @@ const BACKEND_SCRIPT = path.join(
   "kiosk_backend_cli.py"
 );
 
+// Set to the socket of a running kiosk_service.py to share its registry and
+// group-committing writer with the other kiosks at the desk, instead of
+// starting a private backend process.
+const SERVICE_SOCKET = process.env.TUBRIC_SERVICE_SOCKET || "";
+
+// The backend logs a traceback for every failed request and may run all day;
+// only the tail is kept for the error shown when it exits.
+const STDERR_TAIL_CHARS = 16 * 1024;
+
+// A check-in that gets no answer in this time is reported as failed rather
+// than left waiting on a hung backend. Generous, since the first request may
+// wait for the registry to load.
+const REQUEST_TIMEOUT_MS = 60 * 1000;
+
 function createWindow() {
   const win = new BrowserWindow({
     width: 1280,
@@ -30,36 +45,135 @@ function createWindow() {
   win.loadFile(path.join(__dirname, "index.html"));
 }
 
-ipcMain.handle("submit-checkin", async (_event, payload) => {
-  return new Promise((resolve, reject) => {
-    const proc = spawn(PYTHON_BIN, [BACKEND_SCRIPT], {
-      stdio: ["pipe", "pipe", "pipe"],
-    });
+// One long-lived backend process (or the shared service) keeps the CSV
+// registry loaded between check-ins; requests and responses are
+// newline-delimited JSON with an id.
+let backend = null;
+let nextRequestId = 1;
+const pending = new Map();
 
-    let stdout = "";
-    let stderr = "";
+function takePending(id) {
+  const request = pending.get(id);
+  if (!request) return null;
+  pending.delete(id);
+  clearTimeout(request.timer);
+  return request;
+}
 
-    proc.stdout.on("data", (d) => (stdout += d.toString()));
-    proc.stderr.on("data", (d) => (stderr += d.toString()));
+function rejectPending(error) {
+  for (const request of pending.values()) {
+    clearTimeout(request.timer);
+    request.reject(error);
+  }
+  pending.clear();
+}
 
-    proc.on("close", (code) => {
-      if (code !== 0) {
-        return reject(new Error(stderr || `Backend exited with code ${code}`));
-      }
+function readResponses(stream) {
+  let buffer = "";
+  stream.on("data", (d) => {
+    buffer += d.toString();
+    let newline;
+    while ((newline = buffer.indexOf("\n")) >= 0) {
+      const line = buffer.slice(0, newline);
+      buffer = buffer.slice(newline + 1);
+      if (!line.trim()) continue;
+      let response;
       try {
-        resolve(JSON.parse(stdout));
+        response = JSON.parse(line);
       } catch (err) {
-        reject(new Error(`Invalid backend response: ${err.message}`));
+        console.error(`Invalid backend response: ${err.message}`);
+        continue;
+      }
+      const request = takePending(response.id);
+      if (!request) continue;
+      if (response.ok) {
+        request.resolve(response.result);
+      } else {
+        request.reject(new Error(response.error || "Backend error"));
       }
-    });
+    }
+  });
+}
+
+function startBackend() {
+  const proc = spawn(PYTHON_BIN, [BACKEND_SCRIPT, "--serve"], {
+    stdio: ["pipe", "pipe", "pipe"],
+  });
 
-    proc.stdin.write(JSON.stringify(payload || {}));
-    proc.stdin.end();
+  let stderr = "";
+  // Only the current backend may clear itself; the next call respawns it.
+  const fail = (error) => {
+    if (backend !== proc.stdin) return;
+    backend = null;
+    rejectPending(error);
+  };
+
+  readResponses(proc.stdout);
+  proc.stderr.on("data", (d) => {
+    stderr = (stderr + d.toString()).slice(-STDERR_TAIL_CHARS);
+  });
+
+  // A failed spawn (no Python) or a write after the backend died (EPIPE)
+  // would otherwise be an uncaught exception in the main process.
+  proc.on("error", (err) => fail(new Error(`Could not run the backend: ${err.message}`)));
+  proc.stdin.on("error", (err) => {
+    fail(new Error(stderr || `Backend unavailable: ${err.message}`));
+    proc.kill();
   });
+
+  proc.on("close", (code) => fail(new Error(stderr || `Backend exited with code ${code}`)));
+
+  return proc.stdin;
+}
+
+function connectService() {
+  const socket = net.createConnection(SERVICE_SOCKET);
+  let lastError = null;
+  readResponses(socket);
+  socket.on("error", (err) => (lastError = err));
+  socket.on("close", () => {
+    if (backend !== socket) return;
+    backend = null;
+    rejectPending(
+      new Error(
+        lastError
+          ? `Check-in service unavailable: ${lastError.message}`
+          : "Check-in service closed the connection"
+      )
+    );
+  });
+  return socket;
+}
+
+function openBackend() {
+  return SERVICE_SOCKET ? connectService() : startBackend();
+}
+
+function callBackend(op, payload) {
+  if (!backend) backend = openBackend();
+  const id = nextRequestId++;
+  return new Promise((resolve, reject) => {
+    const timer = setTimeout(() => {
+      if (takePending(id)) reject(new Error(`Backend did not answer within ${REQUEST_TIMEOUT_MS / 1000} s`));
+    }, REQUEST_TIMEOUT_MS);
+    pending.set(id, { resolve, reject, timer });
+    backend.write(JSON.stringify({ id, op, payload }) + "\n");
+  });
+}
+
+ipcMain.handle("submit-checkin", async (_event, payload) => {
+  return callBackend("submit", payload || {});
 });
 
-app.whenReady().then(createWindow);
+app.whenReady().then(() => {
+  backend = openBackend();
+  createWindow();
+});
 
 app.on("window-all-closed", () => {
   if (process.platform !== "darwin") app.quit();
 });
+
+app.on("will-quit", () => {
+  if (backend) backend.end();
+});
@@ -5,15 +5,38 @@ Notes:
 - This script does NOT call the REDCap API.
 - It prepares import files only, with `source_code` populated for every row.
 - If a source CSV is missing, an empty template (header only) is written.
+- Rows are streamed from source to output; only the guid -> last_seen_at
+  join map is held in memory (plus the push ledger, see push_ledger.py).
+- Each import file gets a `*_delta.csv` sibling with only the rows that are
+  new or changed since the target project (--api-url and its token) last
+  accepted them. Without a target it holds every row.
+- The kiosk CSVs are views that lag its check-in journal (or SQLite
+  database); fold_kiosk_journal() brings them up to date before a build.
 """
 
 from __future__ import annotations
 
+import argparse
 import csv
 import os
+import sys
 from collections import defaultdict
+from typing import Callable, Iterable, Iterator
+
+from push_ledger import (
+    contact_instance,
+    delta_path,
+    import_kind,
+    load_ledger,
+    project_key,
+    row_changed,
+    save_ledger,
+)
+from push_to_redcap import DEFAULT_TOKEN_PATH
+from redcap_api_client import RedcapApiError, read_token
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+KIOSK_DIR = os.path.join(BASE_DIR, "tubric_kiosk")
 PRIVATE_DIR = os.path.abspath(os.path.join(BASE_DIR, "..", "ID-data"))
 
 FULL_EXPORT_DIR = os.path.join(PRIVATE_DIR, "db_exports")
@@ -29,29 +52,82 @@ DEID_EXPORT_FILE = os.path.join(DEID_EXPORT_DIR, "deidentified_visits.csv")
 OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "output")
 
 
-def read_csv(path: str) -> list[dict]:
+def fold_kiosk_journal() -> bool:
+    """
+    Rewrites the kiosk's source CSVs if check-ins are still only in its
+    journal (or, with TUBRIC_STORAGE=sqlite, in its database), the same as
+    `kiosk_backend_cli.py --compact`. Safe while kiosks are running: it takes
+    their storage lock. Returns True if the CSVs were rewritten.
+    """
+    if KIOSK_DIR not in sys.path:
+        sys.path.insert(0, KIOSK_DIR)
+    import kiosk_core
+
+    if not kiosk_core.journal_size():
+        return False
+    kiosk_core.compact_journal(kiosk_core.load_registry())
+    return True
+
+
+def iter_csv(path: str) -> Iterator[dict]:
+    """
+    Yields one dict per row, so callers never hold a whole source file.
+    A missing file yields nothing.
+    """
     if not os.path.exists(path):
-        return []
+        return
     with open(path, "r", newline="", encoding="utf-8") as f:
-        return list(csv.DictReader(f))
+        yield from csv.DictReader(f)
 
 
-def write_csv(path: str, fieldnames: list[str], rows: list[dict]) -> None:
+def write_csv(path: str, fieldnames: list[str], rows: Iterable[dict]) -> int:
+    """
+    Writes rows as they are produced and returns how many were written.
+    """
     os.makedirs(os.path.dirname(path), exist_ok=True)
+    count = 0
     with open(path, "w", newline="", encoding="utf-8") as f:
         writer = csv.DictWriter(f, fieldnames=fieldnames)
         writer.writeheader()
         for row in rows:
             writer.writerow(row)
+            count += 1
+    return count
+
+
+def write_import(
+    path: str, fieldnames: list[str], rows: Iterable[dict], ledger: dict | None, project: str | None
+) -> tuple[int, int]:
+    """
+    Writes the full import file and, in the same pass, its delta file with
+    only the rows whose content differs from what the ledger says `project`
+    last accepted (every row without a ledger or project).
+    Returns (rows written, delta rows written).
+    """
+    kind = import_kind(path)
+    total = changed = 0
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8") as full_file, open(
+        delta_path(path), "w", newline="", encoding="utf-8"
+    ) as delta_file:
+        full_writer = csv.DictWriter(full_file, fieldnames=fieldnames)
+        delta_writer = csv.DictWriter(delta_file, fieldnames=fieldnames)
+        full_writer.writeheader()
+        delta_writer.writeheader()
+        for row in rows:
+            full_writer.writerow(row)
+            total += 1
+            if ledger is None or project is None or row_changed(ledger, project, kind, fieldnames, row):
+                delta_writer.writerow(row)
+                changed += 1
+    return total, changed
 
 
 def load_record_id_map(path: str | None) -> dict:
-    if not path or not os.path.exists(path):
+    if not path:
         return {}
-    with open(path, "r", newline="", encoding="utf-8") as f:
-        rows = list(csv.DictReader(f))
     mapping = {}
-    for row in rows:
+    for row in iter_csv(path):
         guid = row.get("guid", "")
         record_id = row.get("record_id", "")
         if guid and record_id:
@@ -59,6 +135,31 @@ def load_record_id_map(path: str | None) -> dict:
     return mapping
 
 
+def load_last_seen_by_guid(path: str) -> dict[str, str]:
+    """
+    guid -> last_seen_at, the only join the builders need.
+
+    Reads just the two columns with a plain csv.reader (no dict per row) and
+    skips people who were never seen, so the map stays small.
+    """
+    last_seen_by_guid: dict[str, str] = {}
+    if not os.path.exists(path):
+        return last_seen_by_guid
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        if "guid" not in header or "last_seen_at" not in header:
+            return last_seen_by_guid
+        guid_col = header.index("guid")
+        seen_col = header.index("last_seen_at")
+        width = max(guid_col, seen_col)
+        for row in reader:
+            if len(row) <= width or not row[seen_col]:
+                continue
+            last_seen_by_guid[row[guid_col]] = row[seen_col]
+    return last_seen_by_guid
+
+
 def record_id_for_guid(guid: str, mapping: dict) -> str:
     return mapping.get(guid, guid)
 
@@ -69,192 +170,248 @@ def first_pipe_value(value: str) -> str:
     return value.split("|")[0]
 
 
-def build_participant_import(record_id_map: dict) -> tuple[list[str], list[dict]]:
-    participants = read_csv(PARTICIPANTS_CSV)
-    guid_people = read_csv(GUID_PEOPLE_CSV)
-    last_seen_by_guid = {row.get("guid", ""): row.get("last_seen_at", "") for row in guid_people}
-
-    rows = []
-    for p in participants:
+# ----------------------------
+# Builders
+# ----------------------------
+# Each build_*_import returns (fieldnames, rows) where rows is a generator:
+# source rows are read, projected and handed to write_csv one at a time.
+PARTICIPANT_IMPORT_FIELDS = [
+    "sub_id",
+    "guid",
+    "first_name",
+    "last_name",
+    "dob",
+    "primary_email",
+    "primary_phone",
+    "newsletter_email",
+    "newsletter_phone",
+    "newsletter_pref",
+    "consent_participant",
+    "created_at",
+    "last_seen_at",
+]
+
+VISIT_IMPORT_FIELDS = [
+    "sub_id",
+    "redcap_repeat_instrument",
+    "redcap_repeat_instance",
+    "visit_number",
+    "visit_datetime",
+    "visit_date",
+    "visit_time",
+    "tubric_study_code",
+    "consent_contact_visit",
+    "entered_by",
+]
+
+CONTACT_UPDATE_IMPORT_FIELDS = [
+    "sub_id",
+    "redcap_repeat_instrument",
+    "redcap_repeat_instance",
+    "contact_type",
+    "contact_value",
+    "added_at",
+    "contact_visit_number",
+    "contact_visit_datetime",
+]
+
+DEIDENTIFIED_VISIT_IMPORT_FIELDS = [
+    "sub_id",
+    "redcap_repeat_instrument",
+    "redcap_repeat_instance",
+    "guid",
+    "visit_number",
+    "visit_datetime",
+    "visit_date",
+    "visit_time",
+    "tubric_study_code",
+]
+
+
+def participant_rows(record_id_map: dict, last_seen_by_guid: dict[str, str]) -> Iterator[dict]:
+    for p in iter_csv(PARTICIPANTS_CSV):
         guid = p.get("guid", "")
         record_id = record_id_for_guid(guid, record_id_map)
         # If no separate newsletter contact exists, default to participant contact.
         newsletter_email = first_pipe_value(p.get("newsletter_emails", "")) or p.get("email", "")
         newsletter_phone = first_pipe_value(p.get("newsletter_phones", "")) or p.get("phone", "")
         newsletter_pref = p.get("newsletter_pref", "") or "participant_only"
-        rows.append(
-            {
-                "sub_id": record_id,
-                "guid": guid,
-                "first_name": p.get("first_name", ""),
-                "last_name": p.get("last_name", ""),
-                "dob": p.get("dob", ""),
-                "primary_email": p.get("email", ""),
-                "primary_phone": p.get("phone", ""),
-                "newsletter_email": newsletter_email,
-                "newsletter_phone": newsletter_phone,
-                "newsletter_pref": newsletter_pref,
-                "consent_participant": p.get("consent_contact", ""),
-                "created_at": p.get("created_at", ""),
-                "last_seen_at": last_seen_by_guid.get(guid, ""),
-            }
-        )
-
-    fieldnames = [
-        "sub_id",
-        "guid",
-        "first_name",
-        "last_name",
-        "dob",
-        "primary_email",
-        "primary_phone",
-        "newsletter_email",
-        "newsletter_phone",
-        "newsletter_pref",
-        "consent_participant",
-        "created_at",
-        "last_seen_at",
-    ]
-    return fieldnames, rows
-
-
-def build_visit_import(record_id_map: dict) -> tuple[list[str], list[dict]]:
-    visits = read_csv(PARTICIPANT_VISITS_CSV)
-    rows = []
-    for v in visits:
+        yield {
+            "sub_id": record_id,
+            "guid": guid,
+            "first_name": p.get("first_name", ""),
+            "last_name": p.get("last_name", ""),
+            "dob": p.get("dob", ""),
+            "primary_email": p.get("email", ""),
+            "primary_phone": p.get("phone", ""),
+            "newsletter_email": newsletter_email,
+            "newsletter_phone": newsletter_phone,
+            "newsletter_pref": newsletter_pref,
+            "consent_participant": p.get("consent_contact", ""),
+            "created_at": p.get("created_at", ""),
+            "last_seen_at": last_seen_by_guid.get(guid, ""),
+        }
+
+
+def visit_rows(record_id_map: dict) -> Iterator[dict]:
+    for v in iter_csv(PARTICIPANT_VISITS_CSV):
         guid = v.get("guid", "")
         visit_number = v.get("visit_number", "")
+        yield {
+            "sub_id": record_id_for_guid(guid, record_id_map),
+            "redcap_repeat_instrument": "visits",
+            "redcap_repeat_instance": visit_number,
+            "visit_number": visit_number,
+            "visit_datetime": v.get("visit_datetime", ""),
+            "visit_date": v.get("visit_date", ""),
+            "visit_time": v.get("visit_time", ""),
+            "tubric_study_code": v.get("tubric_study_code", ""),
+            "consent_contact_visit": v.get("consent_contact", ""),
+            "entered_by": v.get("entered_by", ""),
+        }
+
+
+def contact_update_rows(
+    record_id_map: dict, ledger: dict | None = None, project: str | None = None
+) -> Iterator[dict]:
+    # With a ledger and a target project, repeat instances are pinned per
+    # (project, record, update), so new updates never renumber ones that
+    # project already has. Without them, instances
+    # are assigned per GUID in the order the file is read; the counter map
+    # grows with the number of people, not with the file.
+    instance_by_guid: dict[str, int] = defaultdict(int)
+    for c in iter_csv(PARTICIPANT_CONTACT_UPDATES_CSV):
+        guid = c.get("guid", "")
         record_id = record_id_for_guid(guid, record_id_map)
-        rows.append(
-            {
-                "sub_id": record_id,
-                "redcap_repeat_instrument": "visits",
-                "redcap_repeat_instance": visit_number,
-                "visit_number": visit_number,
-                "visit_datetime": v.get("visit_datetime", ""),
-                "visit_date": v.get("visit_date", ""),
-                "visit_time": v.get("visit_time", ""),
-                "tubric_study_code": v.get("tubric_study_code", ""),
-                "consent_contact_visit": v.get("consent_contact", ""),
-                "entered_by": v.get("entered_by", ""),
-            }
-        )
-
-    fieldnames = [
-        "sub_id",
-        "redcap_repeat_instrument",
-        "redcap_repeat_instance",
-        "visit_number",
-        "visit_datetime",
-        "visit_date",
-        "visit_time",
-        "tubric_study_code",
-        "consent_contact_visit",
-        "entered_by",
-    ]
-    return fieldnames, rows
+        if ledger is not None and project is not None:
+            identity = "|".join((c.get("type", ""), c.get("value", ""), c.get("added_at", "")))
+            instance = contact_instance(ledger, project, record_id, identity)
+        else:
+            instance_by_guid[guid] += 1
+            instance = instance_by_guid[guid]
+        yield {
+            "sub_id": record_id,
+            "redcap_repeat_instrument": "contact_updates",
+            "redcap_repeat_instance": instance,
+            "contact_type": c.get("type", ""),
+            "contact_value": c.get("value", ""),
+            "added_at": c.get("added_at", ""),
+            "contact_visit_number": c.get("visit_number", ""),
+            "contact_visit_datetime": c.get("visit_datetime", ""),
+        }
+
+
+def deidentified_visit_rows(record_id_map: dict) -> Iterator[dict]:
+    for v in iter_csv(DEID_EXPORT_FILE):
+        guid = v.get("guid", "")
+        visit_number = v.get("visit_number", "")
+        yield {
+            "sub_id": record_id_for_guid(guid, record_id_map),
+            "redcap_repeat_instrument": "deidentified_visits",
+            "redcap_repeat_instance": visit_number,
+            "guid": guid,
+            "visit_number": visit_number,
+            "visit_datetime": v.get("visit_datetime", ""),
+            "visit_date": v.get("visit_date", ""),
+            "visit_time": v.get("visit_time", ""),
+            "tubric_study_code": v.get("tubric_study_code", ""),
+        }
 
 
-def build_contact_update_import(record_id_map: dict) -> tuple[list[str], list[dict]]:
-    contacts = read_csv(PARTICIPANT_CONTACT_UPDATES_CSV)
+def build_participant_import(record_id_map: dict) -> tuple[list[str], Iterator[dict]]:
+    last_seen_by_guid = load_last_seen_by_guid(GUID_PEOPLE_CSV)
+    return PARTICIPANT_IMPORT_FIELDS, participant_rows(record_id_map, last_seen_by_guid)
 
-    # Assign a repeat instance per GUID in the order the file is read.
-    instance_by_guid = defaultdict(int)
 
-    rows = []
-    for c in contacts:
-        guid = c.get("guid", "")
-        instance_by_guid[guid] += 1
-        record_id = record_id_for_guid(guid, record_id_map)
-        rows.append(
-            {
-                "sub_id": record_id,
-                "redcap_repeat_instrument": "contact_updates",
-                "redcap_repeat_instance": instance_by_guid[guid],
-                "contact_type": c.get("type", ""),
-                "contact_value": c.get("value", ""),
-                "added_at": c.get("added_at", ""),
-                "contact_visit_number": c.get("visit_number", ""),
-                "contact_visit_datetime": c.get("visit_datetime", ""),
-            }
-        )
-
-    fieldnames = [
-        "sub_id",
-        "redcap_repeat_instrument",
-        "redcap_repeat_instance",
-        "contact_type",
-        "contact_value",
-        "added_at",
-        "contact_visit_number",
-        "contact_visit_datetime",
-    ]
-    return fieldnames, rows
+def build_visit_import(record_id_map: dict) -> tuple[list[str], Iterator[dict]]:
+    return VISIT_IMPORT_FIELDS, visit_rows(record_id_map)
 
 
-def build_deidentified_visit_import(record_id_map: dict) -> tuple[list[str], list[dict]]:
-    visits = read_csv(DEID_EXPORT_FILE)
-    rows = []
-    for v in visits:
-        guid = v.get("guid", "")
-        visit_number = v.get("visit_number", "")
-        record_id = record_id_for_guid(guid, record_id_map)
-        rows.append(
-            {
-                "sub_id": record_id,
-                "redcap_repeat_instrument": "deidentified_visits",
-                "redcap_repeat_instance": visit_number,
-                "guid": guid,
-                "visit_number": visit_number,
-                "visit_datetime": v.get("visit_datetime", ""),
-                "visit_date": v.get("visit_date", ""),
-                "visit_time": v.get("visit_time", ""),
-                "tubric_study_code": v.get("tubric_study_code", ""),
-            }
-        )
-
-    fieldnames = [
-        "sub_id",
-        "redcap_repeat_instrument",
-        "redcap_repeat_instance",
-        "guid",
-        "visit_number",
-        "visit_datetime",
-        "visit_date",
-        "visit_time",
-        "tubric_study_code",
+def build_contact_update_import(
+    record_id_map: dict, ledger: dict | None = None, project: str | None = None
+) -> tuple[list[str], Iterator[dict]]:
+    return CONTACT_UPDATE_IMPORT_FIELDS, contact_update_rows(record_id_map, ledger, project)
+
+
+def build_deidentified_visit_import(record_id_map: dict) -> tuple[list[str], Iterator[dict]]:
+    return DEIDENTIFIED_VISIT_IMPORT_FIELDS, deidentified_visit_rows(record_id_map)
+
+
+PARTICIPANT_IMPORT_PATH = os.path.join(OUTPUT_DIR, "redcap_import_participant.csv")
+VISIT_IMPORT_PATH = os.path.join(OUTPUT_DIR, "redcap_import_visits.csv")
+CONTACT_UPDATE_IMPORT_PATH = os.path.join(OUTPUT_DIR, "redcap_import_contact_updates.csv")
+DEIDENTIFIED_VISIT_IMPORT_PATH = os.path.join(OUTPUT_DIR, "redcap_import_deidentified_visits.csv")
+
+
+def payload_stages(
+    record_id_map: dict, ledger: dict | None, project: str | None
+) -> list[Callable[[], tuple[bool, str]]]:
+    """
+    One callable per import file. The stages read different sources and
+    write different outputs, so they can run concurrently; each returns
+    (written, one-line report), like the dictionary stages. They share
+    `record_id_map` and `ledger`, loaded once by the caller (only the
+    contact-update stage writes to the ledger). `project` is the target the
+    delta files are for (see push_ledger.project_key()).
+    """
+
+    def stage(path: str, build: Callable[[], tuple[list[str], Iterator[dict]]]) -> Callable[[], tuple[bool, str]]:
+        def run() -> tuple[bool, str]:
+            fieldnames, rows = build()
+            total, changed = write_import(path, fieldnames, rows, ledger, project)
+            return True, f"{path} ({total} rows, {changed} new or changed in {os.path.basename(delta_path(path))})"
+
+        return run
+
+    return [
+        stage(PARTICIPANT_IMPORT_PATH, lambda: build_participant_import(record_id_map)),
+        stage(VISIT_IMPORT_PATH, lambda: build_visit_import(record_id_map)),
+        stage(CONTACT_UPDATE_IMPORT_PATH, lambda: build_contact_update_import(record_id_map, ledger, project)),
+        stage(DEIDENTIFIED_VISIT_IMPORT_PATH, lambda: build_deidentified_visit_import(record_id_map)),
     ]
-    return fieldnames, rows
 
 
-def main() -> None:
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+NO_TARGET_NOTE = "No --api-url: the *_delta.csv files hold every row, and contact updates are numbered in file order."
 
-    participant_path = os.path.join(OUTPUT_DIR, "redcap_import_participant.csv")
-    visits_path = os.path.join(OUTPUT_DIR, "redcap_import_visits.csv")
-    contact_path = os.path.join(OUTPUT_DIR, "redcap_import_contact_updates.csv")
-    deid_path = os.path.join(OUTPUT_DIR, "redcap_import_deidentified_visits.csv")
 
-    record_map_path = os.environ.get("TUBRIC_RECORD_ID_MAP")
-    record_id_map = load_record_id_map(record_map_path)
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Build REDCap import CSVs (no API calls).")
+    parser.add_argument("--api-url", help="REDCap API URL of the project the *_delta.csv files are for.")
+    parser.add_argument(
+        "--token-path",
+        default=DEFAULT_TOKEN_PATH,
+        help="API token file of that project (only fingerprinted, never sent).",
+    )
+    args = parser.parse_args()
 
-    fieldnames, rows = build_participant_import(record_id_map)
-    write_csv(participant_path, fieldnames, rows)
+    project = None
+    if args.api_url:
+        try:
+            project = project_key(args.api_url, read_token(args.token_path))
+        except (OSError, RedcapApiError) as exc:
+            print(f"Token error: {exc}")
+            return 1
 
-    fieldnames, rows = build_visit_import(record_id_map)
-    write_csv(visits_path, fieldnames, rows)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    if fold_kiosk_journal():
+        print(f"Folded the kiosk check-in journal into {FULL_EXPORT_DIR}")
 
-    fieldnames, rows = build_contact_update_import(record_id_map)
-    write_csv(contact_path, fieldnames, rows)
+    record_map_path = os.environ.get("TUBRIC_RECORD_ID_MAP")
+    record_id_map = load_record_id_map(record_map_path)
+    ledger = load_ledger() if project else None
+    if project is None:
+        print(NO_TARGET_NOTE)
 
-    fieldnames, rows = build_deidentified_visit_import(record_id_map)
-    write_csv(deid_path, fieldnames, rows)
+    for stage in payload_stages(record_id_map, ledger, project):
+        _, report = stage()
+        print(f"Wrote: {report}")
 
-    print(f"Wrote: {participant_path}")
-    print(f"Wrote: {visits_path}")
-    print(f"Wrote: {contact_path}")
-    print(f"Wrote: {deid_path}")
+    # Persist newly pinned contact-update instance numbers right away, so a
+    # rebuild before the next push numbers them the same way.
+    if ledger is not None:
+        save_ledger(ledger)
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
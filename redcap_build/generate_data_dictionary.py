@@ -4,15 +4,19 @@ Generate REDCap data dictionary CSVs for the TUBRIC kiosk project.
 Notes:
 - This script does NOT call the REDCap API.
 - Each dictionary includes a required `source_code` field to satisfy provenance requirements.
-- Output files are written to redcap_build/output/.
+- Output files are written to redcap_build/output/, and only when their
+  content changed.
 """
 
 from __future__ import annotations
 
 import csv
+import io
 import os
 
 OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "output")
+FULL_DICTIONARY_PATH = os.path.join(OUTPUT_DIR, "tubric_redcap_data_dictionary.csv")
+DEID_DICTIONARY_PATH = os.path.join(OUTPUT_DIR, "tubric_redcap_deidentified_dictionary.csv")
 
 # Standard REDCap data dictionary column order.
 COLUMNS = [
@@ -211,24 +215,48 @@ def build_deidentified_dictionary() -> list[dict]:
     return rows
 
 
-def write_dictionary(path: str, rows: list[dict]) -> None:
+def write_dictionary(path: str, rows: list[dict]) -> bool:
+    """
+    Writes the dictionary only if its content differs from what is on disk,
+    so an unchanged dictionary keeps its mtime. Returns True if written.
+    """
+    out = io.StringIO(newline="")
+    writer = csv.DictWriter(out, fieldnames=COLUMNS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+    content = out.getvalue().encode("utf-8")
+
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            if f.read() == content:
+                return False
+
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=COLUMNS)
-        writer.writeheader()
-        for row in rows:
-            writer.writerow(row)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    return True
 
 
-def main() -> None:
-    full_path = os.path.join(OUTPUT_DIR, "tubric_redcap_data_dictionary.csv")
-    deid_path = os.path.join(OUTPUT_DIR, "tubric_redcap_deidentified_dictionary.csv")
+def generate_full_dictionary() -> tuple[bool, str]:
+    return write_dictionary(FULL_DICTIONARY_PATH, build_full_dictionary()), FULL_DICTIONARY_PATH
+
 
-    write_dictionary(full_path, build_full_dictionary())
-    write_dictionary(deid_path, build_deidentified_dictionary())
+def generate_deidentified_dictionary() -> tuple[bool, str]:
+    return write_dictionary(DEID_DICTIONARY_PATH, build_deidentified_dictionary()), DEID_DICTIONARY_PATH
 
-    print(f"Wrote: {full_path}")
-    print(f"Wrote: {deid_path}")
+
+# Independent stages, run concurrently by run_build_and_push.py. Each returns
+# (written, report); an unchanged dictionary is not rewritten.
+DICTIONARY_STAGES = [generate_full_dictionary, generate_deidentified_dictionary]
+
+
+def main() -> None:
+    for stage in DICTIONARY_STAGES:
+        written, report = stage()
+        print(f"{'Wrote' if written else 'Unchanged'}: {report}")
 
 
 if __name__ == "__main__":
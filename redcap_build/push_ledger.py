@@ -0,0 +1,196 @@
+"""
+Push-state ledger for incremental REDCap imports.
+
+Records, per REDCap project, import file and (record, repeat instrument,
+repeat instance), a short content hash of the row REDCap last accepted.
+build_import_payloads.py compares fresh rows against it to write delta files
+for one target project, and push_to_redcap.py updates it only for chunks
+REDCap accepted, so a failed push is retried on the next run.
+
+It also pins contact-update repeat instance numbers per project, so new
+contact updates get new instances and never renumber ones already pushed,
+and remembers the hash of the last data dictionary imported into each project
+so identical metadata imports can be skipped.
+
+A project is its API URL plus a fingerprint of its token (project_key()), so
+a push to a test project never marks rows as accepted for production.
+
+Notes:
+- The ledger holds GUIDs and hashes of identifiable rows, so it lives next to
+  the private CSV exports by default (override with TUBRIC_PUSH_LEDGER).
+- This module does NOT call the REDCap API.
+"""
+
+from __future__ import annotations
+
+import csv
+import hashlib
+import io
+import json
+import os
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+PRIVATE_DIR = os.path.abspath(os.path.join(BASE_DIR, "..", "ID-data"))
+
+DEFAULT_LEDGER_PATH = os.path.join(PRIVATE_DIR, "redcap_push_ledger.json")
+LEDGER_VERSION = 2
+
+DELTA_SUFFIX = "_delta"
+
+
+def ledger_path() -> str:
+    return os.environ.get("TUBRIC_PUSH_LEDGER") or DEFAULT_LEDGER_PATH
+
+
+def empty_ledger() -> dict:
+    return {
+        "version": LEDGER_VERSION,
+        "accepted": {},
+        "contact_instances": {},
+        "legacy_contact_instances": {},
+        "metadata": {},
+    }
+
+
+def load_ledger(path: str | None = None) -> dict:
+    path = path or ledger_path()
+    if not os.path.exists(path):
+        return empty_ledger()
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("version") == 1:
+        data = _upgrade_v1(data)
+    if data.get("version") != LEDGER_VERSION:
+        raise ValueError(f"Unsupported push ledger version in {path}: {data.get('version')}")
+    for section in ("accepted", "contact_instances", "legacy_contact_instances", "metadata"):
+        data.setdefault(section, {})
+    return data
+
+
+def _upgrade_v1(data: dict) -> dict:
+    """
+    Version 1 kept accepted rows and contact instances for whichever project
+    was pushed to. The accepted hashes are dropped (the next delta resends
+    every row once); the contact instances seed each project's numbering, so
+    instances REDCap already has are never renumbered.
+    """
+    ledger = empty_ledger()
+    ledger["legacy_contact_instances"] = data.get("contact_instances", {})
+    ledger["metadata"] = data.get("metadata", {})
+    return ledger
+
+
+def save_ledger(ledger: dict, path: str | None = None) -> None:
+    path = path or ledger_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(ledger, f, separators=(",", ":"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def import_kind(path: str) -> str:
+    """
+    Ledger section for an import file: its base name without `.csv` or the
+    delta suffix, so a delta file updates the same section as its full file.
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    if name.endswith(DELTA_SUFFIX):
+        name = name[: -len(DELTA_SUFFIX)]
+    return name
+
+
+def delta_path(path: str) -> str:
+    root, ext = os.path.splitext(path)
+    return f"{root}{DELTA_SUFFIX}{ext}"
+
+
+def row_key(row: dict) -> str:
+    return "|".join(
+        (
+            str(row.get("sub_id", "")),
+            str(row.get("redcap_repeat_instrument", "")),
+            str(row.get("redcap_repeat_instance", "")),
+        )
+    )
+
+
+def row_hash(fieldnames: list[str], row: dict) -> str:
+    h = hashlib.blake2b(digest_size=8)
+    for name in fieldnames:
+        h.update(str(row.get(name, "")).encode("utf-8"))
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+
+def project_key(api_url: str, token: str) -> str:
+    """
+    Identifies a REDCap project as API URL + a fingerprint of its token (the
+    token itself is never stored).
+    """
+    fingerprint = hashlib.blake2b(token.encode("utf-8"), digest_size=8).hexdigest()
+    return f"{api_url}#{fingerprint}"
+
+
+def row_changed(ledger: dict, project: str, kind: str, fieldnames: list[str], row: dict) -> bool:
+    accepted = ledger["accepted"].get(project, {}).get(kind, {})
+    return accepted.get(row_key(row)) != row_hash(fieldnames, row)
+
+
+def contact_instance(ledger: dict, project: str, sub_id: str, identity: str) -> int:
+    """
+    Repeat instance in `project` for one contact update of `sub_id`,
+    identified by `identity` (type, value and timestamp). Known updates keep
+    their number; new ones get the next free instance for that record.
+    """
+    by_record = ledger["contact_instances"].get(project)
+    if by_record is None:
+        by_record = json.loads(json.dumps(ledger["legacy_contact_instances"]))
+        ledger["contact_instances"][project] = by_record
+    instances = by_record.setdefault(sub_id, {})
+    instance = instances.get(identity)
+    if instance is None:
+        instance = max(instances.values(), default=0) + 1
+        instances[identity] = instance
+    return instance
+
+
+def metadata_key(api_url: str, token: str, kind: str) -> str:
+    """
+    The project plus the dictionary it was sent, since one token may be used
+    for both the full and de-identified dictionaries.
+    """
+    return f"{project_key(api_url, token)}|{kind}"
+
+
+def content_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def metadata_unchanged(ledger: dict, api_url: str, token: str, kind: str, csv_text: str) -> bool:
+    return ledger["metadata"].get(metadata_key(api_url, token, kind)) == content_hash(csv_text)
+
+
+def mark_metadata_imported(ledger: dict, api_url: str, token: str, kind: str, csv_text: str) -> None:
+    ledger["metadata"][metadata_key(api_url, token, kind)] = content_hash(csv_text)
+
+
+def mark_accepted(ledger: dict, project: str, kind: str, csv_text: str, record_ids: list[str]) -> int:
+    """
+    Stores, for `project`, the hash of every row in `csv_text` whose record is
+    in `record_ids`. Returns how many rows were recorded.
+    """
+    accepted_ids = set(record_ids)
+    if not accepted_ids:
+        return 0
+    accepted = ledger["accepted"].setdefault(project, {}).setdefault(kind, {})
+    reader = csv.DictReader(io.StringIO(csv_text, newline=""))
+    fieldnames = list(reader.fieldnames or [])
+    count = 0
+    for row in reader:
+        if row.get("sub_id", "") in accepted_ids:
+            accepted[row_key(row)] = row_hash(fieldnames, row)
+            count += 1
+    return count
@@ -10,10 +10,30 @@ Add --execute to perform the network calls.
 from __future__ import annotations
 
 import argparse
+import logging
 import os
 import sys
 
-from redcap_api_client import import_metadata, import_records, read_token, summarize_response, RedcapApiError
+from push_ledger import (
+    import_kind,
+    ledger_path,
+    load_ledger,
+    mark_accepted,
+    mark_metadata_imported,
+    metadata_unchanged,
+    project_key,
+    save_ledger,
+)
+from redcap_api_client import (
+    DEFAULT_CHUNK_RECORDS,
+    DEFAULT_IMPORT_WORKERS,
+    DEFAULT_RETRIES,
+    DEFAULT_TIMEOUT_SECONDS,
+    RedcapClient,
+    read_token,
+    summarize_response,
+    RedcapApiError,
+)
 
 DEFAULT_TOKEN_PATH = "/Users/dannyzweben/Desktop/TUBRIC/Database/RDCAPI/key.txt"
 
@@ -23,16 +43,186 @@ def read_file(path: str) -> str:
         return f.read()
 
 
+def add_upload_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Token, timeout, retry and chunking flags shared with run_build_and_push.py.
+    """
+    parser.add_argument("--token-path", default=DEFAULT_TOKEN_PATH, help="Path to API token file.")
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=DEFAULT_TIMEOUT_SECONDS,
+        help="Seconds to wait on a single API request.",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_RECORDS,
+        help="Records per import request (all repeat instances of a record stay together).",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_IMPORT_WORKERS,
+        help="Record import requests to run in parallel.",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=DEFAULT_RETRIES,
+        help="Retries per request for connection errors, 429/5xx (jittered exponential backoff).",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=0,
+        help="Maximum API requests per second across all workers (0 = no limit).",
+    )
+    parser.add_argument(
+        "--log-requests",
+        action="store_true",
+        help="Log every API request with its latency.",
+    )
+    parser.add_argument(
+        "--ledger",
+        default=ledger_path(),
+        help="Push ledger to update with the rows REDCap accepted (see push_ledger.py).",
+    )
+    parser.add_argument(
+        "--no-ledger",
+        action="store_true",
+        help="Do not read or record accepted rows, contact instances or imported metadata.",
+    )
+    parser.add_argument(
+        "--force-metadata",
+        action="store_true",
+        help="Import data dictionaries even if the ledger says the project already has them.",
+    )
+
+
+def validate_upload_arguments(args: argparse.Namespace) -> str | None:
+    if args.chunk_size < 1 or args.concurrency < 1:
+        return "--chunk-size and --concurrency must be at least 1."
+    if args.timeout <= 0:
+        return "--timeout must be positive."
+    if args.retries < 0 or args.rate_limit < 0:
+        return "--retries and --rate-limit cannot be negative."
+    return None
+
+
+def configure_logging(args: argparse.Namespace) -> None:
+    logging.basicConfig(
+        level=logging.DEBUG if args.log_requests else logging.WARNING,
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+
+
+def open_client(args: argparse.Namespace, token: str) -> RedcapClient:
+    return RedcapClient(
+        args.api_url,
+        token,
+        timeout=args.timeout,
+        max_idle=args.concurrency,
+        retries=args.retries,
+        rate_limit=args.rate_limit or None,
+    )
+
+
+def print_stats(client: RedcapClient) -> None:
+    stats = client.stats
+    average = stats["seconds"] / stats["requests"] if stats["requests"] else 0.0
+    print(
+        f"API requests: {stats['requests']} ({stats['retries']} retried, "
+        f"{stats['throttled']} throttled), average {average:.2f}s"
+    )
+
+
+def print_plan(dictionaries: list[str], data: list[str], args: argparse.Namespace) -> None:
+    print("Planned actions:")
+    for path in dictionaries:
+        print(f"- Import metadata: {path}")
+    for path in data:
+        print(f"- Import records: {path} ({args.chunk_size} records/request, {args.concurrency} in parallel)")
+
+
+def push_files(
+    client: RedcapClient,
+    dictionaries: list[str],
+    data: list[str],
+    *,
+    chunk_records: int = DEFAULT_CHUNK_RECORDS,
+    max_workers: int = DEFAULT_IMPORT_WORKERS,
+    ledger_file: str | None = None,
+    force_metadata: bool = False,
+) -> bool:
+    """
+    Imports dictionaries, then record files, over one client.
+    Returns False if any record chunk failed. Raises RedcapApiError if a metadata import fails.
+
+    With `ledger_file`, the rows of every accepted chunk are recorded in the
+    push ledger under this project (API URL + token, saved after each file),
+    so the next delta build for the same project skips them,
+    and a dictionary identical to the last one imported into this project
+    (API URL + token) is skipped unless `force_metadata` is set.
+    """
+    ledger = load_ledger(ledger_file) if ledger_file else None
+    project = project_key(client.api_url, client.token)
+    ok = True
+    for path in dictionaries:
+        csv_text = read_file(path)
+        kind = import_kind(path)
+        if ledger is not None and not force_metadata and metadata_unchanged(
+            ledger, client.api_url, client.token, kind, csv_text
+        ):
+            print(f"Metadata unchanged, skipping: {path}")
+            continue
+        print(f"Importing metadata: {path}")
+        resp = client.import_metadata(csv_text)
+        print(summarize_response(resp))
+        if ledger is not None:
+            mark_metadata_imported(ledger, client.api_url, client.token, kind, csv_text)
+            save_ledger(ledger, ledger_file)
+
+    for path in data:
+        csv_text = read_file(path)
+        print(f"Importing records: {path}")
+        summary = client.import_records_batched(
+            csv_text,
+            chunk_records=chunk_records,
+            max_workers=max_workers,
+        )
+        print(
+            f"Imported {summary['count']} of {summary['records']} records "
+            f"in {summary['chunks']} request(s)."
+        )
+        if ledger is not None and summary["accepted"]:
+            mark_accepted(ledger, project, import_kind(path), csv_text, summary["accepted"])
+            save_ledger(ledger, ledger_file)
+        for error in summary["errors"]:
+            ok = False
+            print(
+                f"REDCap API error (chunk {error['chunk']}, records "
+                f"{error['first_record']}..{error['last_record']}): {error['error']}"
+            )
+    return ok
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(description="Push REDCap metadata and records using the API.")
     parser.add_argument("--api-url", required=True, help="Base REDCap API URL (ends with /api/).")
-    parser.add_argument("--token-path", default=DEFAULT_TOKEN_PATH, help="Path to API token file.")
     parser.add_argument("--dictionary", action="append", default=[], help="Data dictionary CSV to import.")
     parser.add_argument("--data", action="append", default=[], help="Record import CSV to upload.")
+    add_upload_arguments(parser)
     parser.add_argument("--execute", action="store_true", help="Actually perform the API calls.")
 
     args = parser.parse_args()
 
+    problem = validate_upload_arguments(args)
+    if problem:
+        print(problem)
+        return 1
+    configure_logging(args)
+
     if not args.dictionary and not args.data:
         print("Nothing to push: provide --dictionary and/or --data.")
         return 1
@@ -50,33 +240,29 @@ def main() -> int:
         print(f"Token error: {exc}")
         return 1
 
-    print("Planned actions:")
-    for path in args.dictionary:
-        print(f"- Import metadata: {path}")
-    for path in args.data:
-        print(f"- Import records: {path}")
+    print_plan(args.dictionary, args.data, args)
 
     if not args.execute:
         print("Dry-run only. Re-run with --execute to perform the API calls.")
         return 0
 
     try:
-        for path in args.dictionary:
-            csv_text = read_file(path)
-            print(f"Importing metadata: {path}")
-            resp = import_metadata(args.api_url, token, csv_text)
-            print(summarize_response(resp))
-
-        for path in args.data:
-            csv_text = read_file(path)
-            print(f"Importing records: {path}")
-            resp = import_records(args.api_url, token, csv_text)
-            print(summarize_response(resp))
+        with open_client(args, token) as client:
+            ok = push_files(
+                client,
+                args.dictionary,
+                args.data,
+                chunk_records=args.chunk_size,
+                max_workers=args.concurrency,
+                ledger_file=None if args.no_ledger else args.ledger,
+                force_metadata=args.force_metadata,
+            )
+            print_stats(client)
     except RedcapApiError as exc:
         print(f"REDCap API error: {exc}")
         return 1
 
-    return 0
+    return 0 if ok else 1
 
 
 if __name__ == "__main__":
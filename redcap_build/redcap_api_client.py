@@ -8,11 +8,33 @@ This module is intentionally small and script-friendly:
 
 from __future__ import annotations
 
+import csv
+import http.client
+import io
 import json
+import logging
 import os
+import random
+import ssl
+import threading
+import time
 import urllib.parse
-import urllib.request
-import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_CHUNK_RECORDS = 500
+DEFAULT_IMPORT_WORKERS = 4
+DEFAULT_TIMEOUT_SECONDS = 120.0
+
+# Retry policy: transient failures (connection errors and the statuses below)
+# are retried with full-jitter exponential backoff. 429/503 also pause every
+# worker sharing the client, honouring Retry-After when the server sends it.
+DEFAULT_RETRIES = 5
+DEFAULT_BACKOFF_BASE_SECONDS = 1.0
+DEFAULT_BACKOFF_MAX_SECONDS = 60.0
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+THROTTLE_STATUSES = (429, 503)
+
+log = logging.getLogger("redcap_api_client")
 
 
 class RedcapApiError(RuntimeError):
@@ -27,32 +49,18 @@ def read_token(token_path: str) -> str:
     return token
 
 
-def _post_form(api_url: str, payload: dict) -> str:
-    data = urllib.parse.urlencode(payload).encode("utf-8")
-    req = urllib.request.Request(api_url, data=data)
-    try:
-        with urllib.request.urlopen(req) as resp:
-            return resp.read().decode("utf-8")
-    except urllib.error.HTTPError as exc:
-        body = exc.read().decode("utf-8", errors="replace")
-        raise RedcapApiError(f"HTTP {exc.code}: {body}") from exc
-    except urllib.error.URLError as exc:
-        raise RedcapApiError(f"URL error: {exc.reason}") from exc
-
-
-def import_metadata(api_url: str, token: str, csv_text: str) -> str:
-    payload = {
+def _metadata_payload(token: str, csv_text: str) -> dict:
+    return {
         "token": token,
         "content": "metadata",
         "format": "csv",
         "data": csv_text,
         "returnFormat": "json",
     }
-    return _post_form(api_url, payload)
 
 
-def import_records(api_url: str, token: str, csv_text: str, *, overwrite: str = "normal") -> str:
-    payload = {
+def _records_payload(token: str, csv_text: str, overwrite: str) -> dict:
+    return {
         "token": token,
         "content": "record",
         "format": "csv",
@@ -61,7 +69,362 @@ def import_records(api_url: str, token: str, csv_text: str, *, overwrite: str =
         "overwriteBehavior": overwrite,
         "returnFormat": "json",
     }
-    return _post_form(api_url, payload)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: at most `rate` requests per second on average,
+    with bursts of up to `capacity` (default 1, i.e. evenly spaced requests).
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be positive.")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else 1.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def _retry_after_seconds(value: str | None) -> float | None:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+class RedcapClient:
+    """
+    REDCap API client bound to one API URL and token.
+
+    Keeps idle keep-alive `http.client` connections to the API host and
+    reuses them across calls and threads, so a push pays the TCP/TLS
+    handshake once per connection rather than once per request. A reused
+    connection that the server has closed is replaced transparently.
+
+    Every request goes through a small scheduler: an optional token-bucket
+    rate limit (`rate_limit` requests/second), then up to `retries` retries
+    of transient failures with jittered exponential backoff. Each attempt's
+    latency is logged on the "redcap_api_client" logger (DEBUG; retries at
+    WARNING), and totals are kept in `stats`.
+
+        with RedcapClient(api_url, token, timeout=120) as client:
+            client.import_metadata(dictionary_csv)
+            client.import_records_batched(records_csv)
+    """
+
+    def __init__(
+        self,
+        api_url: str,
+        token: str,
+        *,
+        timeout: float = DEFAULT_TIMEOUT_SECONDS,
+        max_idle: int = DEFAULT_IMPORT_WORKERS,
+        retries: int = DEFAULT_RETRIES,
+        backoff_base: float = DEFAULT_BACKOFF_BASE_SECONDS,
+        backoff_max: float = DEFAULT_BACKOFF_MAX_SECONDS,
+        rate_limit: float | None = None,
+    ) -> None:
+        parts = urllib.parse.urlsplit(api_url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise RedcapApiError(f"Unsupported API URL: {api_url}")
+        self.api_url = api_url
+        self.token = token
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._scheme = parts.scheme
+        self._host = parts.hostname
+        self._port = parts.port
+        self._path = parts.path or "/"
+        if parts.query:
+            self._path += "?" + parts.query
+        self._idle: list[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+        self._ssl_context = ssl.create_default_context() if self._scheme == "https" else None
+        self.retries = max(0, retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._bucket = TokenBucket(rate_limit) if rate_limit else None
+        # Monotonic time before which no request may start (set by 429/503).
+        self._paused_until = 0.0
+        self.stats = {"requests": 0, "retries": 0, "throttled": 0, "seconds": 0.0}
+
+    def __enter__(self) -> "RedcapClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def _connect(self) -> http.client.HTTPConnection:
+        if self._scheme == "https":
+            return http.client.HTTPSConnection(
+                self._host, self._port, timeout=self.timeout, context=self._ssl_context
+            )
+        return http.client.HTTPConnection(self._host, self._port, timeout=self.timeout)
+
+    def _acquire(self) -> tuple[http.client.HTTPConnection, bool]:
+        """
+        Returns (connection, reused).
+        """
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self._connect(), False
+
+    def _release(self, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def _send(self, body: bytes, headers: dict) -> tuple[int, str, str | None]:
+        """
+        One HTTP exchange. Returns (status, body text, Retry-After header).
+        """
+        fresh = False
+        while True:
+            if fresh:
+                conn, reused = self._connect(), False
+            else:
+                conn, reused = self._acquire()
+            try:
+                conn.request("POST", self._path, body=body, headers=headers)
+                resp = conn.getresponse()
+                raw = resp.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as exc:
+                conn.close()
+                if reused:
+                    # The server dropped an idle keep-alive connection; retry once on a new one.
+                    fresh = True
+                    continue
+                raise RedcapApiError(f"Connection error: {exc}") from exc
+            except (OSError, http.client.HTTPException) as exc:
+                conn.close()
+                raise RedcapApiError(f"Connection error: {exc}") from exc
+
+            if resp.will_close:
+                conn.close()
+            else:
+                self._release(conn)
+            return resp.status, raw.decode("utf-8", errors="replace"), resp.getheader("Retry-After")
+
+    def _wait_turn(self) -> None:
+        while True:
+            with self._lock:
+                delay = self._paused_until - time.monotonic()
+            if delay <= 0:
+                break
+            time.sleep(delay)
+        if self._bucket is not None:
+            self._bucket.acquire()
+
+    def _backoff(self, attempt: int, retry_after: float | None) -> float:
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    def post_form(self, payload: dict) -> str:
+        body = urllib.parse.urlencode(payload).encode("utf-8")
+        headers = {
+            "Content-Type": "application/x-www-form-urlencoded",
+            "Accept": "application/json",
+        }
+        content = payload.get("content", "")
+        attempt = 0
+        while True:
+            self._wait_turn()
+            start = time.monotonic()
+            status = None
+            retry_after = None
+            try:
+                status, text, retry_after_header = self._send(body, headers)
+            except RedcapApiError as exc:
+                error = exc
+            else:
+                if status < 400:
+                    error = None
+                else:
+                    error = RedcapApiError(f"HTTP {status}: {text}")
+                    retry_after = _retry_after_seconds(retry_after_header)
+            elapsed = time.monotonic() - start
+            with self._lock:
+                self.stats["requests"] += 1
+                self.stats["seconds"] += elapsed
+            log.debug(
+                "POST %s content=%s bytes=%d status=%s %.3fs",
+                self._path, content, len(body), status if status is not None else "error", elapsed,
+            )
+
+            if error is None:
+                return text
+            if (status is not None and status not in RETRY_STATUSES) or attempt >= self.retries:
+                raise error
+
+            delay = self._backoff(attempt, retry_after)
+            with self._lock:
+                self.stats["retries"] += 1
+                if status in THROTTLE_STATUSES:
+                    # The server is shedding load: hold every worker, not just this one.
+                    self.stats["throttled"] += 1
+                    self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            log.warning(
+                "POST %s content=%s failed (%s); retry %d/%d in %.1fs",
+                self._path, content, error, attempt + 1, self.retries, delay,
+            )
+            time.sleep(delay)
+            attempt += 1
+
+    def import_metadata(self, csv_text: str) -> str:
+        return self.post_form(_metadata_payload(self.token, csv_text))
+
+    def import_records(self, csv_text: str, *, overwrite: str = "normal") -> str:
+        return self.post_form(_records_payload(self.token, csv_text, overwrite))
+
+    def import_records_batched(
+        self,
+        csv_text: str,
+        *,
+        chunk_records: int = DEFAULT_CHUNK_RECORDS,
+        max_workers: int = DEFAULT_IMPORT_WORKERS,
+        overwrite: str = "normal",
+    ) -> dict:
+        """
+        Imports a record CSV in record-aligned chunks, `max_workers` requests at a time.
+
+        A failed chunk does not stop the others. Returns a summary:
+          {"chunks": n, "records": n, "count": n imported (per REDCap),
+           "accepted": [record ids from chunks REDCap accepted], "errors": [...]}
+        where each error is {"chunk": i, "first_record": id, "last_record": id, "error": text}.
+        """
+        chunks = split_record_csv(csv_text, chunk_records)
+
+        def upload(chunk: tuple[list[str], str]) -> str:
+            return self.import_records(chunk[1], overwrite=overwrite)
+
+        summary = {
+            "chunks": len(chunks),
+            "records": sum(len(ids) for ids, _ in chunks),
+            "count": 0,
+            "accepted": [],
+            "errors": [],
+        }
+        if not chunks:
+            return summary
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            futures = [pool.submit(upload, chunk) for chunk in chunks]
+            for index, future in enumerate(futures):
+                ids = chunks[index][0]
+                try:
+                    raw = future.result()
+                except RedcapApiError as exc:
+                    summary["errors"].append(
+                        {"chunk": index, "first_record": ids[0], "last_record": ids[-1], "error": str(exc)}
+                    )
+                    continue
+                summary["count"] += _response_count(raw)
+                summary["accepted"].extend(ids)
+        return summary
+
+
+# One-shot helpers for callers that make a single request. Anything that
+# uploads more than once should hold a RedcapClient instead.
+def import_metadata(api_url: str, token: str, csv_text: str) -> str:
+    with RedcapClient(api_url, token) as client:
+        return client.import_metadata(csv_text)
+
+
+def import_records(api_url: str, token: str, csv_text: str, *, overwrite: str = "normal") -> str:
+    with RedcapClient(api_url, token) as client:
+        return client.import_records(csv_text, overwrite=overwrite)
+
+
+def import_records_batched(
+    api_url: str,
+    token: str,
+    csv_text: str,
+    *,
+    chunk_records: int = DEFAULT_CHUNK_RECORDS,
+    max_workers: int = DEFAULT_IMPORT_WORKERS,
+    overwrite: str = "normal",
+) -> dict:
+    with RedcapClient(api_url, token, max_idle=max_workers) as client:
+        return client.import_records_batched(
+            csv_text, chunk_records=chunk_records, max_workers=max_workers, overwrite=overwrite
+        )
+
+
+def split_record_csv(csv_text: str, chunk_records: int = DEFAULT_CHUNK_RECORDS) -> list[tuple[list[str], str]]:
+    """
+    Splits a flat record import CSV into chunks of at most `chunk_records` records.
+
+    The record ID is the first column (`sub_id`). Every row of a record,
+    including all of its repeating instances, lands in the same chunk, in the
+    original order. Returns [(record_ids, chunk_csv_text), ...]; each chunk
+    repeats the header.
+    """
+    if chunk_records < 1:
+        raise ValueError("chunk_records must be at least 1.")
+    reader = csv.reader(io.StringIO(csv_text, newline=""))
+    header = next(reader, None)
+    if header is None:
+        return []
+
+    rows_by_record: dict[str, list[list[str]]] = {}
+    for row in reader:
+        if not row:
+            continue
+        rows_by_record.setdefault(row[0], []).append(row)
+
+    chunks = []
+    record_ids = list(rows_by_record)
+    for start in range(0, len(record_ids), chunk_records):
+        ids = record_ids[start:start + chunk_records]
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(header)
+        for record_id in ids:
+            writer.writerows(rows_by_record[record_id])
+        chunks.append((ids, out.getvalue()))
+    return chunks
+
+
+def _response_count(raw: str) -> int:
+    try:
+        data = json.loads(raw)
+    except json.JSONDecodeError:
+        return 0
+    if isinstance(data, dict):
+        try:
+            return int(data.get("count", 0))
+        except (TypeError, ValueError):
+            return 0
+    if isinstance(data, list):
+        return len(data)
+    return 0
 
 
 def summarize_response(raw: str) -> str:
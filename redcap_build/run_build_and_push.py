@@ -5,29 +5,71 @@ This script:
 - Generates data dictionaries.
 - Builds import-ready CSVs.
 - Optionally pushes to REDCap via API (only with --execute).
+
+Everything runs in one process: the dictionary and payload stages are
+imported from their scripts and run concurrently, sharing one record ID map
+and push ledger, and all uploads share one RedcapClient. The individual
+scripts still work on their own.
 """
 
 from __future__ import annotations
 
 import argparse
 import os
-import subprocess
 import sys
-
-BASE_DIR = os.path.dirname(__file__)
-OUTPUT_DIR = os.path.join(BASE_DIR, "output")
-
-DICT_FULL = os.path.join(OUTPUT_DIR, "tubric_redcap_data_dictionary.csv")
-DICT_DEID = os.path.join(OUTPUT_DIR, "tubric_redcap_deidentified_dictionary.csv")
-
-IMPORT_PARTICIPANT = os.path.join(OUTPUT_DIR, "redcap_import_participant.csv")
-IMPORT_VISITS = os.path.join(OUTPUT_DIR, "redcap_import_visits.csv")
-IMPORT_CONTACTS = os.path.join(OUTPUT_DIR, "redcap_import_contact_updates.csv")
-IMPORT_DEID = os.path.join(OUTPUT_DIR, "redcap_import_deidentified_visits.csv")
-
-
-def run(cmd: list[str]) -> None:
-    subprocess.run(cmd, check=True)
+from concurrent.futures import ThreadPoolExecutor
+
+import build_import_payloads
+import generate_data_dictionary
+from push_ledger import delta_path, load_ledger, project_key, save_ledger
+from push_to_redcap import (
+    add_upload_arguments,
+    configure_logging,
+    open_client,
+    print_plan,
+    print_stats,
+    push_files,
+    validate_upload_arguments,
+)
+from redcap_api_client import RedcapApiError, read_token
+
+DICT_FULL = generate_data_dictionary.FULL_DICTIONARY_PATH
+DICT_DEID = generate_data_dictionary.DEID_DICTIONARY_PATH
+
+IMPORT_PARTICIPANT = build_import_payloads.PARTICIPANT_IMPORT_PATH
+IMPORT_VISITS = build_import_payloads.VISIT_IMPORT_PATH
+IMPORT_CONTACTS = build_import_payloads.CONTACT_UPDATE_IMPORT_PATH
+IMPORT_DEID = build_import_payloads.DEIDENTIFIED_VISIT_IMPORT_PATH
+
+
+def build_all(project: str | None = None, ledger_file: str | None = None, max_workers: int = 6) -> None:
+    """
+    Generates both dictionaries and all four import payloads concurrently,
+    after folding the kiosk journal into the source CSVs. The delta files and
+    contact-update instances are for `project`, from the ledger in
+    `ledger_file`; without either, the deltas hold every row. Raises the
+    first stage error after every stage has finished.
+    """
+    if build_import_payloads.fold_kiosk_journal():
+        print(f"Folded the kiosk check-in journal into {build_import_payloads.FULL_EXPORT_DIR}")
+    record_map_path = os.environ.get("TUBRIC_RECORD_ID_MAP")
+    record_id_map = build_import_payloads.load_record_id_map(record_map_path)
+    ledger = load_ledger(ledger_file) if project and ledger_file else None
+    if project is None:
+        print(build_import_payloads.NO_TARGET_NOTE)
+    elif ledger is None:
+        print("--no-ledger: the *_delta.csv files hold every row.")
+
+    payload_stages = build_import_payloads.payload_stages(record_id_map, ledger, project)
+    stages = generate_data_dictionary.DICTIONARY_STAGES + payload_stages
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(stage) for stage in stages]
+    for future in futures:
+        written, report = future.result()
+        print(f"{'Wrote' if written else 'Unchanged'}: {report}")
+
+    if ledger is not None:
+        save_ledger(ledger, ledger_file)
 
 
 def main() -> int:
@@ -35,55 +77,87 @@ def main() -> int:
     parser.add_argument("--api-url", help="Base REDCap API URL (ends with /api/).")
     parser.add_argument("--push-full", action="store_true", help="Push full (identifiable) project files.")
     parser.add_argument("--push-deid", action="store_true", help="Push de-identified project files.")
+    parser.add_argument(
+        "--delta",
+        action="store_true",
+        help="Push only the *_delta.csv record files (rows new or changed since the last accepted push).",
+    )
+    add_upload_arguments(parser)
     parser.add_argument("--execute", action="store_true", help="Actually perform API calls when pushing.")
 
     args = parser.parse_args()
 
-    run(["python3", os.path.join(BASE_DIR, "generate_data_dictionary.py")])
-    run(["python3", os.path.join(BASE_DIR, "build_import_payloads.py")])
-
-    if not (args.push_full or args.push_deid):
+    pushing = args.push_full or args.push_deid
+    if pushing:
+        if not args.api_url:
+            print("--api-url is required when pushing.")
+            return 1
+        problem = validate_upload_arguments(args)
+        if problem:
+            print(problem)
+            return 1
+
+    # The ledger is kept per project, so the delta build needs the target first.
+    token = project = None
+    if args.api_url:
+        try:
+            token = read_token(args.token_path)
+        except (OSError, RedcapApiError) as exc:
+            print(f"Token error: {exc}")
+            return 1
+        project = project_key(args.api_url, token)
+
+    build_all(project, None if args.no_ledger else args.ledger)
+
+    if not pushing:
         return 0
+    configure_logging(args)
 
-    if not args.api_url:
-        print("--api-url is required when pushing.")
+    jobs = []
+    if args.push_full:
+        jobs.append(([DICT_FULL], [IMPORT_PARTICIPANT, IMPORT_VISITS, IMPORT_CONTACTS]))
+    if args.push_deid:
+        jobs.append(([DICT_DEID], [IMPORT_DEID]))
+
+    if args.delta:
+        jobs = [(dictionaries, [delta_path(p) for p in data]) for dictionaries, data in jobs]
+
+    missing = [p for dictionaries, data in jobs for p in dictionaries + data if not os.path.exists(p)]
+    if missing:
+        print("Missing files:")
+        for path in missing:
+            print(f"- {path}")
         return 1
 
-    push_script = os.path.join(BASE_DIR, "push_to_redcap.py")
+    for dictionaries, data in jobs:
+        print_plan(dictionaries, data, args)
 
-    if args.push_full:
-        cmd = [
-            "python3",
-            push_script,
-            "--api-url",
-            args.api_url,
-            "--dictionary",
-            DICT_FULL,
-            "--data",
-            IMPORT_PARTICIPANT,
-            "--data",
-            IMPORT_VISITS,
-            "--data",
-            IMPORT_CONTACTS,
-        ]
-        if args.execute:
-            cmd.append("--execute")
-        run(cmd)
+    if not args.execute:
+        print("Dry-run only. Re-run with --execute to perform the API calls.")
+        return 0
 
-    if args.push_deid:
-        cmd = [
-            "python3",
-            push_script,
-            "--api-url",
-            args.api_url,
-            "--dictionary",
-            DICT_DEID,
-            "--data",
-            IMPORT_DEID,
-        ]
-        if args.execute:
-            cmd.append("--execute")
-        run(cmd)
+    # One client for every upload, so the keep-alive connections are reused
+    # across the dictionary and record imports of both projects.
+    ok = True
+    try:
+        with open_client(args, token) as client:
+            for dictionaries, data in jobs:
+                ok = push_files(
+                    client,
+                    dictionaries,
+                    data,
+                    chunk_records=args.chunk_size,
+                    max_workers=args.concurrency,
+                    ledger_file=None if args.no_ledger else args.ledger,
+                    force_metadata=args.force_metadata,
+                ) and ok
+            print_stats(client)
+    except RedcapApiError as exc:
+        print(f"REDCap API error: {exc}")
+        return 1
+
+    if not ok:
+        return 1
 
     return 0
 
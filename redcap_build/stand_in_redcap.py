@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the REDCap API, for checking RedcapClient without a real project.
+
+Starts an HTTP server on 127.0.0.1 that accepts `content=record` and
+`content=metadata` imports the way REDCap answers them ({"count": n}, or
+HTTP 400 for a rejected import), and keeps every record row it accepts.
+Faults can be queued to answer the next requests with 429/5xx (optionally
+with Retry-After) or to drop the connection without a response.
+Running the script uploads synthetic record CSVs through RedcapClient and
+checks the results; it exits 1 on the first failed check:
+  python3 redcap_build/stand_in_redcap.py
+  python3 redcap_build/stand_in_redcap.py --records 2000 --chunk-size 100 --concurrency 8
+
+Checks:
+- import_records_batched: every record arrives exactly once, with all of
+  its repeat instances in the same request, and "accepted" lists them all.
+- A chunk REDCap rejects is reported with its record range, and every
+  other chunk is still accepted.
+- post_form retries 429/5xx and dropped connections, up to `retries`
+  times, and never retries a 4xx such as a bad token or rejected import.
+- A 429 with Retry-After holds every worker for that long, and
+  `rate_limit` keeps the request rate at or under the limit.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import json
+import sys
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from redcap_api_client import RedcapApiError, RedcapClient
+
+TOKEN = "STANDIN0000000000000000000000000"
+
+
+class StandInState:
+    """
+    What the stand-in server has seen. Guarded by `lock`.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.rows_by_record: dict[str, list[list[str]]] = {}
+        self.arrivals: Counter = Counter()  # record id -> requests it arrived in
+        self.requests = 0
+        # Record ids whose import REDCap rejects (the whole request fails, as in REDCap).
+        self.reject_records: set[str] = set()
+        # Answers for the next requests, in order: an HTTP status, or "drop"
+        # to close the connection without a response.
+        self.faults: list[int | str] = []
+        self.retry_after: str | None = None  # sent with injected 429/503
+        self.request_times: list[float] = []  # time.monotonic() of each arrival
+        self.fault_times: list[float] = []  # when each injected fault was answered
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def reply(self, status: int, obj, retry_after: str | None = None) -> None:
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        if retry_after is not None:
+            self.send_header("Retry-After", retry_after)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:
+        state: StandInState = self.server.state
+        length = int(self.headers.get("Content-Length", 0))
+        form = urllib.parse.parse_qs(self.rfile.read(length).decode("utf-8"))
+        with state.lock:
+            state.requests += 1
+            state.request_times.append(time.monotonic())
+            fault = state.faults.pop(0) if state.faults else None
+
+        if fault is not None:
+            if fault == "drop":
+                self.close_connection = True
+            else:
+                retry_after = state.retry_after if fault in (429, 503) else None
+                self.reply(fault, {"error": f"Injected HTTP {fault}"}, retry_after)
+            with state.lock:
+                state.fault_times.append(time.monotonic())
+            return
+        if form.get("token", [""])[0] != TOKEN:
+            self.reply(403, {"error": "You do not have permissions to use the API"})
+            return
+        rows = list(csv.reader(io.StringIO(form.get("data", [""])[0], newline="")))
+        if form.get("content", [""])[0] != "record":
+            self.reply(200, max(0, len(rows) - 1))
+            return
+
+        record_ids = list(dict.fromkeys(row[0] for row in rows[1:] if row))
+        with state.lock:
+            rejected = sorted(state.reject_records.intersection(record_ids))
+            if not rejected:
+                for record_id in record_ids:
+                    state.arrivals[record_id] += 1
+                for row in rows[1:]:
+                    if row:
+                        state.rows_by_record.setdefault(row[0], []).append(row)
+        if rejected:
+            self.reply(400, {"error": f"Record {rejected[0]} failed validation"})
+            return
+        self.reply(200, {"count": len(record_ids)})
+
+
+def start_server(state: StandInState | None = None) -> tuple[ThreadingHTTPServer, str]:
+    """
+    Starts the stand-in on a free port in a daemon thread. Returns (server, api_url).
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.daemon_threads = True
+    server.state = state or StandInState()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/api/"
+
+
+def synthetic_records_csv(records: int) -> tuple[str, dict[str, int]]:
+    """
+    A flat import CSV shaped like redcap_import_visits.csv: each record has a
+    participant row and 0-4 repeat instances, with the instances of some
+    records listed apart from their first row. Returns (csv_text, rows per record).
+    """
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["sub_id", "redcap_repeat_instrument", "redcap_repeat_instance", "visit_date"])
+    rows_per_record: dict[str, int] = {}
+    deferred = []
+    for i in range(records):
+        record_id = f"S{i:05d}"
+        writer.writerow([record_id, "", "", ""])
+        rows_per_record[record_id] = 1
+        for instance in range(1, i % 5 + 1):
+            row = [record_id, "visits", instance, f"2024-01-{instance:02d}"]
+            if i % 7 == 0:
+                deferred.append(row)
+            else:
+                writer.writerow(row)
+            rows_per_record[record_id] += 1
+    writer.writerows(deferred)
+    return out.getvalue(), rows_per_record
+
+
+def check(condition: bool, message: str) -> None:
+    print(f"{'OK' if condition else 'FAIL'}: {message}")
+    if not condition:
+        sys.exit(1)
+
+
+def check_batched_import(records: int, chunk_size: int, concurrency: int) -> None:
+    csv_text, rows_per_record = synthetic_records_csv(records)
+    expected_chunks = -(-records // chunk_size)
+
+    server, api_url = start_server()
+    state = server.state
+    try:
+        with RedcapClient(api_url, TOKEN, max_idle=concurrency) as client:
+            summary = client.import_records_batched(csv_text, chunk_records=chunk_size, max_workers=concurrency)
+    finally:
+        server.shutdown()
+    check(
+        summary["chunks"] == expected_chunks and state.requests == expected_chunks and not summary["errors"],
+        f"{records} records sent as {summary['chunks']} chunks of <= {chunk_size} with no errors",
+    )
+    check(
+        set(state.arrivals) == set(rows_per_record) and set(state.arrivals.values()) == {1},
+        "every record arrived exactly once",
+    )
+    check(
+        all(len(state.rows_by_record[r]) == n for r, n in rows_per_record.items()),
+        "every repeat instance arrived in the same request as its record",
+    )
+    check(
+        sorted(summary["accepted"]) == sorted(rows_per_record) and summary["count"] == records,
+        f"accepted lists all {records} records and REDCap's count matches",
+    )
+
+    # One bad record fails its own chunk only.
+    record_ids = list(rows_per_record)
+    bad = record_ids[chunk_size + chunk_size // 2]
+    bad_chunk = record_ids[chunk_size:2 * chunk_size]
+    state = StandInState()
+    state.reject_records.add(bad)
+    server, api_url = start_server(state)
+    try:
+        with RedcapClient(api_url, TOKEN, max_idle=concurrency) as client:
+            summary = client.import_records_batched(csv_text, chunk_records=chunk_size, max_workers=concurrency)
+    finally:
+        server.shutdown()
+    errors = summary["errors"]
+    check(
+        len(errors) == 1
+        and errors[0]["chunk"] == 1
+        and (errors[0]["first_record"], errors[0]["last_record"]) == (bad_chunk[0], bad_chunk[-1])
+        and "HTTP 400" in errors[0]["error"],
+        f"the chunk holding {bad} is reported as records {bad_chunk[0]}..{bad_chunk[-1]}",
+    )
+    others = [r for r in record_ids if r not in bad_chunk]
+    check(
+        sorted(summary["accepted"]) == sorted(others) and set(state.arrivals) == set(others),
+        f"the other {len(others)} records were still accepted, "
+        "and none of the failed chunk's records reached the server",
+    )
+
+
+def _post_records(client: RedcapClient, record_id: str) -> str:
+    return client.import_records(f"sub_id,visit_date\n{record_id},2024-01-01\n")
+
+
+def check_retries() -> None:
+    # Every kind of transient failure once, then success.
+    state = StandInState()
+    state.faults = ["drop", 429, 503, 500, 502]
+    state.retry_after = "0"
+    server, api_url = start_server(state)
+    try:
+        with RedcapClient(api_url, TOKEN, retries=5, backoff_base=0.01) as client:
+            _post_records(client, "R1")
+            stats = client.stats
+    finally:
+        server.shutdown()
+    check(
+        state.requests == 6 and stats["requests"] == 6 and stats["retries"] == 5 and stats["throttled"] == 2,
+        "a dropped connection, 429, 503, 500 and 502 are each retried once, then the import succeeds",
+    )
+
+    # Retries run out.
+    state = StandInState()
+    state.faults = [503] * 10
+    server, api_url = start_server(state)
+    try:
+        with RedcapClient(api_url, TOKEN, retries=2, backoff_base=0.01) as client:
+            try:
+                _post_records(client, "R1")
+                raised = False
+            except RedcapApiError as exc:
+                raised = "HTTP 503" in str(exc)
+    finally:
+        server.shutdown()
+    check(raised and state.requests == 3, "with retries=2 a persistent 503 fails after 3 requests")
+
+    # 4xx is never retried: a bad token (403) or a rejected import (400).
+    state = StandInState()
+    state.reject_records.add("BAD")
+    server, api_url = start_server(state)
+    outcomes = []
+    try:
+        for token, record_id in (("WRONG", "R1"), (TOKEN, "BAD")):
+            with RedcapClient(api_url, token, retries=5, backoff_base=0.01) as client:
+                try:
+                    _post_records(client, record_id)
+                    outcomes.append(None)
+                except RedcapApiError as exc:
+                    outcomes.append((str(exc)[:8], client.stats["retries"]))
+    finally:
+        server.shutdown()
+    check(
+        outcomes == [("HTTP 403", 0), ("HTTP 400", 0)] and state.requests == 2,
+        "403 and 400 fail on the first request with no retry",
+    )
+
+
+def check_throttling(rate: float, workers: int, per_worker: int) -> None:
+    # A 429 with Retry-After holds every worker, not only the one that got it.
+    state = StandInState()
+    state.faults = [429]
+    state.retry_after = "0.5"
+    server, api_url = start_server(state)
+    try:
+        with RedcapClient(api_url, TOKEN, max_idle=workers, backoff_base=0.01) as client:
+            first = threading.Thread(target=_post_records, args=(client, "R0"))
+            first.start()
+            while not state.fault_times:
+                time.sleep(0.005)
+            # Let the client see the 429 before the others start.
+            time.sleep(0.05)
+            others = [threading.Thread(target=_post_records, args=(client, f"R{i}")) for i in range(1, workers)]
+            for thread in others:
+                thread.start()
+            for thread in [first] + others:
+                thread.join()
+    finally:
+        server.shutdown()
+    held = min(state.request_times[1:]) - state.fault_times[0]
+    check(
+        state.requests == workers + 1 and held >= 0.45,
+        f"after a 429 with Retry-After 0.5 every worker waited (first request {held:.2f}s later)",
+    )
+
+    # rate_limit caps the request rate across all workers.
+    state = StandInState()
+    server, api_url = start_server(state)
+    total = workers * per_worker
+    try:
+        with RedcapClient(api_url, TOKEN, max_idle=workers, rate_limit=rate) as client:
+
+            def worker(w: int) -> None:
+                for i in range(per_worker):
+                    _post_records(client, f"R{w}-{i}")
+
+            threads = [threading.Thread(target=worker, args=(w,)) for w in range(workers)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+    finally:
+        server.shutdown()
+    times = sorted(state.request_times)
+    observed = (len(times) - 1) / (times[-1] - times[0])
+    check(
+        state.requests == total and observed <= rate * 1.1,
+        f"{total} requests from {workers} workers at rate_limit={rate:g}/s arrived at {observed:.1f}/s",
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check RedcapClient against a local stand-in REDCap server.")
+    parser.add_argument("--records", type=int, default=1050, help="Synthetic records to import.")
+    parser.add_argument("--chunk-size", type=int, default=100, help="Records per request.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Parallel requests.")
+    parser.add_argument("--rate-limit", type=float, default=20.0, help="Requests/second for the throttle check.")
+    args = parser.parse_args()
+    if args.records <= 2 * args.chunk_size:
+        parser.error("--records must be more than twice --chunk-size (the failure check needs three chunks).")
+
+    check_batched_import(args.records, args.chunk_size, args.concurrency)
+    check_retries()
+    check_throttling(args.rate_limit, args.concurrency, per_worker=10)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
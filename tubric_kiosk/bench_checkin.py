@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Benchmark the kiosk save path against synthetic registries.
+
+Seeds guid_people.csv, participants.csv, participant_visits.csv and the
+contact-update CSVs in a temporary folder (never the real ID-data folder),
+stubs the de-identified Git push so it runs offline, and times:
+- load_registry_csv / load_registry cold start, with
+  and without the snapshot cache
+- find_person with a matching and a non-matching input, and
+  find_person_fuzzy with a misspelled name
+- submit_checkin with a preloaded registry and without (reload from disk per call)
+
+Results are written as JSON so runs can be compared across versions:
+  python3 bench_checkin.py --output bench_baseline.json
+  python3 bench_checkin.py --compare bench_baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import kiosk_core as core
+from kiosk_core import config, push
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+FIRST_NAMES = ["alex", "jordan", "taylor", "morgan", "casey", "riley", "jamie", "avery", "quinn", "skyler"]
+LAST_NAMES = ["smith", "johnson", "williams", "brown", "jones", "garcia", "miller", "davis", "lopez", "wilson"]
+
+PATH_SETTINGS = {
+    "GUID_PEOPLE_CSV": "guid_people.csv",
+    "GUID_CONTACT_UPDATES_CSV": "guid_contact_updates.csv",
+    "PARTICIPANTS_CSV": "participants.csv",
+    "PARTICIPANT_VISITS_CSV": "participant_visits.csv",
+    "PARTICIPANT_CONTACT_UPDATES_CSV": "participant_contact_updates.csv",
+    "CHECKIN_JOURNAL": "checkin_journal.jsonl",
+    "SQLITE_DB": "tubric_kiosk.sqlite3",
+    "SNAPSHOT_FILE": ".kiosk_snapshot.pickle",
+    "MATCH_REVIEW_LOG": "match_review.jsonl",
+    "STORAGE_LOCK_FILE": ".kiosk_storage.lock",
+    "JOURNAL_GENERATION_FILE": "checkin_journal.generation",
+    "CHECKIN_JOURNAL_PREVIOUS": "checkin_journal.prev.jsonl",
+}
+
+
+def use_data_dir(data_dir):
+    """
+    Points every storage path in kiosk_core.config at data_dir and disables the Git push.
+    """
+    full_dir = os.path.join(data_dir, "db_exports")
+    config.FULL_EXPORT_DIR = full_dir
+    for name, filename in PATH_SETTINGS.items():
+        setattr(config, name, os.path.join(full_dir, filename))
+    config.DEID_EXPORT_FILE = os.path.join(data_dir, "deidentified_visits.csv")
+    config.LEGACY_DATA_FILE = os.path.join(data_dir, "tubric_profiles.json")
+    push.auto_push_deidentified = lambda: None
+
+
+def synthetic_people(n, rng):
+    base = datetime(2024, 1, 1, 9, 0, 0)
+    people = []
+    for i in range(n):
+        guid = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+        dob = f"{rng.randint(1950, 2015)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        created = base + timedelta(minutes=i)
+        visits = []
+        for v in range(1, rng.randint(1, 3) + 1):
+            dt = (created + timedelta(days=30 * (v - 1))).isoformat(timespec="seconds")
+            visits.append(
+                {
+                    "visit_number": v,
+                    "visit_datetime": dt,
+                    "visit_date": dt.split("T")[0],
+                    "visit_time": dt.split("T")[1],
+                    "tubric_study_code": f"STUDY-{rng.randint(1, 40)}",
+                    "consent_contact": rng.choice(["Yes", "No"]),
+                    "entered_by": rng.choice(["participant", "guardian"]),
+                }
+            )
+        secondary_emails = []
+        contact_updates = []
+        if rng.random() < 0.2:
+            secondary_emails.append(f"alt{i}@example.org")
+            contact_updates.append(
+                {
+                    "type": "email",
+                    "value": secondary_emails[0],
+                    "added_at": visits[-1]["visit_datetime"],
+                    "visit_number": len(visits),
+                    "visit_datetime": visits[-1]["visit_datetime"],
+                }
+            )
+        people.append(
+            {
+                "guid": guid,
+                "first_name": rng.choice(FIRST_NAMES).title(),
+                "last_name": f"{rng.choice(LAST_NAMES).title()}{i}",
+                "dob": dob,
+                "email": f"person{i}@example.com",
+                "phone": f"{2150000000 + i:010d}",
+                "secondary_emails": secondary_emails,
+                "contact_updates": contact_updates,
+                "created_at": created.isoformat(timespec="seconds"),
+                "visits": visits,
+            }
+        )
+    return people
+
+
+def seed_registry(n, seed=1234):
+    """
+    Writes a synthetic registry of n people through the normal export code.
+    Returns the generated people so benchmarks can pick inputs from them.
+    """
+    rng = random.Random(seed)
+    people = synthetic_people(n, rng)
+    registry = {
+        "people": [
+            {
+                "guid": p["guid"],
+                "first_name": p["first_name"],
+                "last_name": p["last_name"],
+                "dob": p["dob"],
+                "primary_email": p["email"],
+                "primary_phone": p["phone"],
+                "secondary_emails": p["secondary_emails"],
+                "secondary_phones": [],
+                "newsletter_emails": [],
+                "newsletter_phones": [],
+                "newsletter_pref": "",
+                "consent_contact": p["visits"][0]["consent_contact"],
+                "created_at": p["created_at"],
+                "enrolled_at": p["created_at"],
+                "last_seen_at": p["visits"][-1]["visit_datetime"],
+                "visits": p["visits"],
+                "contact_updates": p["contact_updates"],
+            }
+            for p in people
+        ]
+    }
+    core.export_all_csv(registry)
+    return people
+
+
+def checkin_state(person, **overrides):
+    state = {
+        "first_name": person["first_name"],
+        "last_name": person["last_name"],
+        "dob": person["dob"],
+        "email": person["email"],
+        "phone": person["phone"],
+        "tubric_study_code": "BENCH",
+        "consent_contact": "Yes",
+        "is_guardian": "participant",
+    }
+    state.update(overrides)
+    return state
+
+
+def new_person_state(i):
+    return {
+        "first_name": "Bench",
+        "last_name": f"New{i}",
+        "dob": "1999-12-31",
+        "email": f"bench{i}@example.net",
+        "phone": f"{4840000000 + i:010d}",
+        "tubric_study_code": "BENCH",
+        "consent_contact": "No",
+        "is_guardian": "participant",
+    }
+
+
+def timed(fn, repeat):
+    samples = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - start) * 1000.0)
+    samples.sort()
+    return {
+        "n": len(samples),
+        "median_ms": round(statistics.median(samples), 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+        "min_ms": round(samples[0], 4),
+    }
+
+
+def bench_size(n, repeat, cold_repeat):
+    data_dir = tempfile.mkdtemp(prefix=f"tubric_bench_{n}_")
+    try:
+        use_data_dir(data_dir)
+        people = seed_registry(n)
+        rng = random.Random(n)
+        results = {}
+
+        results["load_registry_csv"] = timed(lambda i: core.load_registry_csv(), cold_repeat)
+
+        def load_without_snapshot(i):
+            if os.path.exists(config.SNAPSHOT_FILE):
+                os.remove(config.SNAPSHOT_FILE)
+            core.load_registry()
+
+        results["load_registry"] = timed(load_without_snapshot, cold_repeat)
+        results["load_registry_snapshot"] = timed(lambda i: core.load_registry(), cold_repeat)
+
+        registry = core.load_registry()
+        picks = [rng.choice(people) for _ in range(repeat)]
+
+        def find(i, match):
+            p = picks[i]
+            core.find_person(
+                registry["people"],
+                dob=p["dob"],
+                first_name=p["first_name"] if match else "Nobody",
+                last_name=p["last_name"] if match else "Nowhere",
+                email=p["email"] if match else "nobody@example.invalid",
+                phone=p["phone"] if match else "2679990000",
+                by_dob=registry.get("people_by_dob"),
+                by_email=registry.get("people_by_email"),
+                by_phone=registry.get("people_by_phone"),
+            )
+
+        results["find_person_match"] = timed(lambda i: find(i, True), repeat)
+        results["find_person_no_match"] = timed(lambda i: find(i, False), repeat)
+
+        def find_fuzzy(i):
+            p = picks[i]
+            core.find_person_fuzzy(
+                registry,
+                dob=p["dob"],
+                first_name=p["first_name"],
+                last_name=p["last_name"][:1] + p["last_name"][2:],
+                email=p["email"],
+                phone="",
+            )
+
+        results["find_person_fuzzy_typo"] = timed(find_fuzzy, repeat)
+
+        def submit_preloaded(i):
+            core.submit_checkin(checkin_state(picks[i]), registry)
+
+        def submit_new_preloaded(i):
+            core.submit_checkin(new_person_state(i), registry)
+
+        results["submit_checkin_preloaded_existing"] = timed(submit_preloaded, repeat)
+        results["submit_checkin_preloaded_new"] = timed(submit_new_preloaded, repeat)
+        results["submit_checkin_cold"] = timed(
+            lambda i: core.submit_checkin(checkin_state(picks[i])), cold_repeat
+        )
+        return results
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def git_revision():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            check=False,
+            capture_output=True,
+            text=True,
+        )
+        return out.stdout.strip()
+    except Exception:
+        return ""
+
+
+def compare(results, baseline, threshold):
+    """
+    Prints median ratios against a baseline file. Returns True if any
+    benchmark slowed down by more than `threshold` (e.g. 0.25 = 25%).
+    """
+    regressed = False
+    for size, benches in results["sizes"].items():
+        base_benches = baseline.get("sizes", {}).get(size, {})
+        for name, stats in benches.items():
+            base = base_benches.get(name)
+            if not base or not base.get("median_ms"):
+                continue
+            ratio = stats["median_ms"] / base["median_ms"]
+            flag = ""
+            if ratio > 1 + threshold:
+                flag = "  REGRESSION"
+                regressed = True
+            print(f"{size:>7} {name:<36} {base['median_ms']:>10.3f} -> {stats['median_ms']:>10.3f} ms  x{ratio:.2f}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark submit_checkin and friends on synthetic registries.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Registry sizes (people).")
+    parser.add_argument("--repeat", type=int, default=50, help="Iterations for the fast benchmarks.")
+    parser.add_argument("--cold-repeat", type=int, default=3, help="Iterations for load/cold benchmarks.")
+    parser.add_argument("--storage", choices=["csv", "sqlite"], default="csv", help="Storage backend to benchmark.")
+    parser.add_argument("--output", default="bench_results.json", help="Where to write the JSON results.")
+    parser.add_argument("--compare", help="Baseline JSON to compare against.")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown before flagging (fraction).")
+    args = parser.parse_args()
+
+    config.STORAGE_BACKEND = args.storage
+
+    results = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "storage": args.storage,
+        "repeat": args.repeat,
+        "cold_repeat": args.cold_repeat,
+        "sizes": {},
+    }
+    for n in args.sizes:
+        print(f"Benchmarking {n} people...", file=sys.stderr)
+        results["sizes"][str(n)] = bench_size(n, args.repeat, args.cold_repeat)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote: {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Checks that the headless core stays cheap to import.
+
+Runs `python -X importtime -c "import kiosk_core"` in a fresh interpreter and
+fails (exit 1) if tkinter gets pulled in or the cumulative import time of
+kiosk_core exceeds the budget:
+  python3 check_import_budget.py --budget-ms 150
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+DEFAULT_BUDGET_MS = 150.0
+FORBIDDEN_MODULES = ("tkinter", "_tkinter")
+
+
+def measure_import(module="kiosk_core"):
+    """
+    Returns (cumulative_ms, imported_module_names) for importing `module`.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    cumulative_ms = None
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = [p.strip() for p in line[len("import time:"):].split("|")]
+        if len(parts) != 3 or not parts[1].isdigit():
+            continue
+        name = parts[2]
+        modules.append(name)
+        if name == module:
+            cumulative_ms = int(parts[1]) / 1000.0
+    return cumulative_ms, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if importing kiosk_core is too slow or imports tkinter.")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="Cumulative import budget.")
+    args = parser.parse_args()
+
+    cumulative_ms, modules = measure_import()
+    failures = []
+    if cumulative_ms is None:
+        failures.append("kiosk_core did not appear in the import trace")
+    elif cumulative_ms > args.budget_ms:
+        failures.append(f"import took {cumulative_ms:.1f} ms (budget {args.budget_ms:.1f} ms)")
+    forbidden = sorted({m for m in modules if m.split(".")[0] in FORBIDDEN_MODULES})
+    if forbidden:
+        failures.append(f"imports UI modules: {', '.join(forbidden)}")
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        return 1
+    print(f"OK: import kiosk_core took {cumulative_ms:.1f} ms (budget {args.budget_ms:.1f} ms), no tkinter")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Find likely duplicate people in guid_people.csv.
+
+Partitions the registry by blocking key (DOB, phonetic surname, email,
+phone), scores pairs inside each block with the find_person / fuzzy rules
+across a process pool, and writes ranked merge candidates for staff review:
+  python3 dedupe_registry.py
+  python3 dedupe_registry.py --input /path/to/guid_people.csv --min-score 4
+
+Check-ins still in the journal are not in the CSV yet; run
+`kiosk_backend_cli.py --compact` first to include them. Nothing is merged.
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+
+from kiosk_core import config
+from kiosk_core.dedupe import MAX_BLOCK_SIZE, find_duplicates
+from kiosk_core.storage import read_csv, registry_from_rows
+
+OUTPUT_FIELDS = [
+    "rank",
+    "score",
+    "rule",
+    "reasons",
+    "guid_a",
+    "first_name_a",
+    "last_name_a",
+    "dob_a",
+    "guid_b",
+    "first_name_b",
+    "last_name_b",
+    "dob_b",
+]
+
+
+def candidate_rows(candidates, people):
+    by_guid = {p["guid"]: p for p in people}
+    for rank, c in enumerate(candidates, start=1):
+        a = by_guid[c["guid_a"]]
+        b = by_guid[c["guid_b"]]
+        yield {
+            "rank": rank,
+            "score": c["score"],
+            "rule": c["rule"],
+            "reasons": "|".join(c["reasons"]),
+            "guid_a": a["guid"],
+            "first_name_a": a["first_name"],
+            "last_name_a": a["last_name"],
+            "dob_a": a["dob"],
+            "guid_b": b["guid"],
+            "first_name_b": b["first_name"],
+            "last_name_b": b["last_name"],
+            "dob_b": b["dob"],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rank likely duplicate people in the GUID registry.")
+    parser.add_argument("--input", default=config.GUID_PEOPLE_CSV, help="guid_people.csv to scan.")
+    parser.add_argument(
+        "--output",
+        default=os.path.join(config.FULL_EXPORT_DIR, "merge_candidates.csv"),
+        help="Where to write the ranked candidates (identifiable: keep it in the private folder).",
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes.")
+    parser.add_argument(
+        "--min-score",
+        type=int,
+        default=config.FUZZY_REVIEW_SCORE,
+        help="Lowest pair score to report (same scale as find_person: 2 DOB, 2 name, 1 email, 1 phone).",
+    )
+    parser.add_argument(
+        "--max-block",
+        type=int,
+        default=MAX_BLOCK_SIZE,
+        help="Skip blocks with more people than this (e.g. a placeholder email).",
+    )
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"Missing registry: {args.input}")
+        return 1
+
+    started = time.perf_counter()
+    people = registry_from_rows(read_csv(args.input), [])["people"]
+    loaded = time.perf_counter()
+    candidates, stats = find_duplicates(
+        people,
+        workers=args.workers,
+        min_score=args.min_score,
+        max_block=args.max_block,
+    )
+    scored = time.perf_counter()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=OUTPUT_FIELDS)
+        writer.writeheader()
+        writer.writerows(candidate_rows(candidates, people))
+
+    exact = sum(1 for c in candidates if c["rule"] == "exact")
+    print(
+        f"{stats['people']} people, {stats['blocks']} blocks, {stats['pairs']} pairs scored "
+        f"({stats['skipped_blocks']} oversized blocks skipped) with {args.workers} worker(s)"
+    )
+    print(f"Load {loaded - started:.2f}s, scoring {scored - loaded:.2f}s")
+    print(f"{len(candidates)} merge candidates ({exact} exact, {len(candidates) - exact} fuzzy)")
+    print(f"Wrote: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
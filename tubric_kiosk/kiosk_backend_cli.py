@@ -1,11 +1,209 @@
 #!/usr/bin/env python3
+import argparse
 import json
+import os
+import socketserver
 import sys
+import threading
 
-import survey
+import kiosk_core as core
+from kiosk_core import config
+
+
+class Backend:
+    """
+    Keeps the registry warm between requests.
+
+    Requests and responses are one JSON object per line:
+      {"id": 1, "op": "submit", "payload": {...}}
+      {"id": 1, "ok": true, "result": {"guid": "...", "action": "..."}}
+    Supported ops: submit, ping, status, owners, match_review, compact, repair_deid, reload.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.registry = core.load_registry()
+
+    def handle(self, request):
+        op = request.get("op", "submit")
+        with self.lock:
+            if op == "submit":
+                try:
+                    guid, action, self.registry = core.submit_checkin(request.get("payload") or {}, self.registry)
+                except Exception:
+                    # The in-memory copy may be half-updated; start over from disk.
+                    self.registry = core.load_registry()
+                    raise
+                return {"guid": guid, "action": action}
+            if op == "ping":
+                return {"people": len(self.registry["people"])}
+            if op == "status":
+                return {"people": len(self.registry["people"]), "push": core.get_push_worker().status()}
+            if op == "owners":
+                return who_owns(self.registry, (request.get("payload") or {}).get("contact", ""))
+            if op == "match_review":
+                return {"entries": core.read_match_review()}
+            if op == "compact":
+                self.registry = core.compact_journal(self.registry)
+                return {"compacted": True}
+            if op == "repair_deid":
+                return {"problems": core.repair_deidentified_visits(self.registry)}
+            if op == "reload":
+                self.registry = core.load_registry()
+                return {"people": len(self.registry["people"])}
+        raise ValueError(f"Unknown op: {op}")
+
+    def submit_many(self, payloads, compact=True):
+        """
+        Saves several check-ins as one group commit (used by kiosk_service.py).
+        Returns one result dict or exception per payload, in order.
+
+        If the batch fails, the check-ins are saved one by one so only the bad
+        one fails. Disk errors (OSError) are raised instead: part of the batch
+        may already be on disk, and every retry would hit the same error.
+        """
+        with self.lock:
+            try:
+                results, self.registry = core.submit_checkins(payloads, self.registry, compact=compact)
+                return [{"guid": guid, "action": action} for guid, action in results]
+            except Exception as exc:
+                # The in-memory copy may be half-updated; start over from disk.
+                self.registry = core.load_registry()
+                if isinstance(exc, OSError) or len(payloads) == 1:
+                    raise
+        outcomes = []
+        for payload in payloads:
+            try:
+                outcomes.append(self.handle({"op": "submit", "payload": payload}))
+            except Exception as exc:
+                outcomes.append(exc)
+        return outcomes
+
+    def compact_if_due(self, limit):
+        """
+        Compacts the journal if it has grown past `limit` bytes. Returns True if it did.
+        """
+        with self.lock:
+            if core.journal_size() < limit:
+                return False
+            self.registry = core.compact_journal(self.registry)
+            return True
+
+    def handle_line(self, line):
+        try:
+            request = json.loads(line)
+        except ValueError as exc:
+            return {"id": None, "ok": False, "error": f"Invalid JSON input: {exc}"}
+        try:
+            result = self.handle(request)
+        except Exception as exc:
+            return {"id": request.get("id"), "ok": False, "error": str(exc)}
+        return {"id": request.get("id"), "ok": True, "result": result}
+
+
+def who_owns(registry, contact):
+    """
+    Staff lookup: which GUIDs have this email or phone as a primary/secondary contact.
+    """
+    if "@" in contact:
+        guids = core.owners_of_email(registry, contact)
+    else:
+        guids = core.owners_of_phone(registry, contact)
+    return {"contact": contact, "guids": sorted(guids)}
+
+
+def serve_stdio(backend):
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        response = backend.handle_line(line)
+        sys.stdout.write(json.dumps(response) + "\n")
+        sys.stdout.flush()
+
+
+def serve_socket(backend, path):
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for raw in self.rfile:
+                line = raw.decode("utf-8")
+                if not line.strip():
+                    continue
+                response = backend.handle_line(line)
+                self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+                self.wfile.flush()
+
+    if os.path.exists(path):
+        os.remove(path)
+    with socketserver.ThreadingUnixStreamServer(path, Handler) as server:
+        try:
+            server.serve_forever()
+        finally:
+            os.remove(path)
 
 
 def main():
+    parser = argparse.ArgumentParser(description="TUBRIC kiosk backend (reads a check-in payload on stdin).")
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Rewrite the full CSV exports (retiring the check-in journal) and exit.",
+    )
+    parser.add_argument(
+        "--repair-deid",
+        action="store_true",
+        help="Verify the de-identified export against the source visits, rebuild it if needed, and exit.",
+    )
+    parser.add_argument(
+        "--who-owns",
+        metavar="EMAIL_OR_PHONE",
+        help="Print the GUIDs that have this email or phone on file and exit.",
+    )
+    parser.add_argument(
+        "--match-review",
+        action="store_true",
+        help="Print the fuzzy matches and near misses logged for staff review and exit.",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Stay running and answer newline-delimited JSON requests on stdin/stdout.",
+    )
+    parser.add_argument(
+        "--socket",
+        help="Serve newline-delimited JSON requests on this Unix socket path instead of stdin/stdout.",
+    )
+    args = parser.parse_args()
+
+    if args.compact:
+        core.compact_journal(core.load_registry())
+        sys.stdout.write(json.dumps({"compacted": True}))
+        return
+
+    if args.repair_deid:
+        problems = core.repair_deidentified_visits(core.load_registry())
+        sys.stdout.write(json.dumps({"problems": problems, "rebuilt": bool(problems)}))
+        return
+
+    if args.who_owns:
+        sys.stdout.write(json.dumps(who_owns(core.load_registry(), args.who_owns)))
+        return
+
+    if args.match_review:
+        sys.stdout.write(json.dumps({"entries": core.read_match_review()}))
+        return
+
+    if args.serve or args.socket:
+        backend = Backend()
+        core.freeze_loaded_registry()
+        try:
+            if args.socket:
+                serve_socket(backend, args.socket)
+            else:
+                serve_stdio(backend)
+        finally:
+            core.get_push_worker().flush(timeout=config.PUSH_TIMEOUT_SECONDS)
+        return
+
     try:
         raw = sys.stdin.read()
         payload = json.loads(raw) if raw.strip() else {}
@@ -13,8 +211,10 @@ def main():
         sys.stderr.write(f"Invalid JSON input: {exc}\n")
         sys.exit(1)
 
-    guid, action, _, _ = survey.submit_checkin(payload)
+    guid, action, _ = core.submit_checkin(payload)
     sys.stdout.write(json.dumps({"guid": guid, "action": action}))
+    sys.stdout.flush()
+    core.get_push_worker().flush(timeout=config.PUSH_TIMEOUT_SECONDS)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,67 @@
+"""
+Headless TUBRIC kiosk core: storage, matching, normalization and export.
+
+Imports only the standard library (no tkinter), so the Electron backend and
+batch tools can use it on machines without a display. The Tk kiosk in
+survey.py is a UI on top of it.
+"""
+
+from .checkin import submit_checkin, submit_checkins
+from .dedupe import find_duplicates
+from .fuzzy import edit_distance, find_person_fuzzy, read_match_review
+from .matching import (
+    build_indexes,
+    ensure_indexes,
+    find_person,
+    index_person,
+    index_person_contacts,
+    match_key,
+    name_key,
+    names_match,
+    owners_of_email,
+    owners_of_phone,
+    surname_block_key,
+)
+from .normalize import (
+    normalize_dob,
+    normalize_email,
+    normalize_name,
+    normalize_phone,
+    now_iso,
+    phonetic_key,
+    swapped_dob,
+    today_str,
+)
+from .push import DeidPushWorker, auto_push_deidentified, get_push_worker, run_deidentified_push
+from .records import (
+    ContactUpdate,
+    Person,
+    Visit,
+    add_contact_update,
+    add_newsletter_email,
+    add_newsletter_phone,
+    add_secondary_email,
+    add_secondary_phone,
+    new_guid,
+)
+from .storage import (
+    append_deidentified_visit,
+    compact_journal,
+    journal_size,
+    export_all_csv,
+    export_deidentified_visits,
+    export_guid_csv,
+    export_participants_csv,
+    freeze_loaded_registry,
+    load_registry,
+    load_registry_csv,
+    maybe_migrate_legacy_to_csv,
+    merge_participant,
+    participants,
+    registry_from_rows,
+    repair_deidentified_visits,
+    storage_lock,
+    sync_registry,
+    verify_deidentified_visits,
+)
+from .writer import CheckinWriter
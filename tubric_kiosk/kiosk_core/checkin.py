@@ -0,0 +1,234 @@
+"""
+The check-in save path shared by the Tk kiosk and the Electron backend.
+"""
+
+import traceback
+
+from . import config, push
+from .fuzzy import find_person_fuzzy, record_match_review
+from .matching import find_person, index_person, index_person_contacts
+from .normalize import normalize_email, normalize_phone, now_iso
+from .records import (
+    CONTACT_FIELDS,
+    Person,
+    Visit,
+    add_newsletter_email,
+    add_newsletter_phone,
+    add_secondary_email,
+    add_secondary_phone,
+    contact_snapshot,
+    journal_record,
+    new_guid,
+)
+from .storage import (
+    append_deidentified_visits,
+    ensure_indexes,
+    export_deidentified_visits,
+    load_registry,
+    persist_checkins,
+    storage_lock,
+    sync_registry,
+)
+
+
+def submit_checkin(state, registry=None):
+    """
+    Core save path used by both Tk UI and Electron.
+    Returns (guid, action, registry).
+
+    With config.FUZZY_MATCHING on, a check-in the exact match misses goes
+    through find_person_fuzzy(); a fuzzy match is reported as action
+    "matched_fuzzy", and it and any near misses are logged for staff review.
+
+    The change is recorded as one fsynced journal append (or one SQLite
+    transaction); the full CSVs are only regenerated when the journal is compacted.
+
+    Matching and saving run under the cross-process storage lock, after the
+    registry has caught up with check-ins saved by other kiosks (sync_registry),
+    so concurrent kiosks never match against or write from a stale copy.
+    """
+    results, registry = submit_checkins([state], registry)
+    guid, action = results[0]
+    return guid, action, registry
+
+
+def submit_checkins(states, registry=None, compact=True):
+    """
+    submit_checkin() for several check-ins as one group commit.
+    Returns ([(guid, action), ...], registry).
+
+    The check-ins are matched and applied in order, exactly as if submitted
+    one by one (a new person earlier in the batch is matched by a later
+    entry), then saved with one journal write and fsync (or one SQLite
+    transaction) and one de-identified append. If any of them fails nothing
+    is saved, and the in-memory registry must be reloaded. Once saved, a
+    failed de-identified append or match-review write is only logged.
+
+    compact=False never compacts the journal here, for callers that compact
+    at a quieter moment (kiosk_service.py).
+    """
+    if not states:
+        return [], registry
+    with storage_lock():
+        if registry is None:
+            registry = load_registry()
+        else:
+            registry = sync_registry(registry)
+        applied = [_apply_checkin(state, registry) for state in states]
+
+        compacted = persist_checkins([entry for _, _, entry, _, _ in applied], registry, compact=compact)
+        # The check-ins are durable now. A failure in the side files below must
+        # not report them as failed, or a retry would save them twice; a
+        # de-identified export left behind is fixed by --repair-deid or the
+        # next compaction.
+        try:
+            for state, (guid, action, _, _, review_candidates) in zip(states, applied):
+                if review_candidates:
+                    record_match_review(guid, action, state, review_candidates)
+        except Exception:
+            traceback.print_exc()
+        try:
+            # A compaction already rewrote the de-identified export with these visits.
+            visits = [(guid, visit) for guid, _, _, visit, _ in applied]
+            if not compacted and not append_deidentified_visits(visits):
+                export_deidentified_visits(registry)
+        except Exception:
+            traceback.print_exc()
+    push.auto_push_deidentified()
+
+    return [(guid, action) for guid, action, _, _, _ in applied], registry
+
+
+def _apply_checkin(state, registry):
+    """
+    Matches one check-in and applies it to memory, without saving.
+    Returns (guid, action, journal entry, visit, fuzzy review candidates).
+    """
+    ensure_indexes(registry)
+
+    s = state
+
+    dob = s.get("dob", "")
+    email = s.get("email", "")
+    phone = s.get("phone", "")
+    newsletter_email = s.get("newsletter_email", "")
+    newsletter_phone = s.get("newsletter_phone", "")
+    newsletter_pref = s.get("newsletter_pref", "")
+
+    existing = find_person(
+        registry["people"],
+        dob=dob,
+        first_name=s.get("first_name", ""),
+        last_name=s.get("last_name", ""),
+        email=email,
+        phone=phone,
+        by_dob=registry["people_by_dob"],
+        by_email=registry["people_by_email"],
+        by_phone=registry["people_by_phone"],
+    )
+    review_candidates = []
+    if existing is None and config.FUZZY_MATCHING:
+        existing, review_candidates = find_person_fuzzy(
+            registry,
+            dob=dob,
+            first_name=s.get("first_name", ""),
+            last_name=s.get("last_name", ""),
+            email=email,
+            phone=phone,
+        )
+
+    visit_datetime = now_iso()
+    visit_date = visit_datetime.split("T")[0]
+    visit_time = visit_datetime.split("T")[1] if "T" in visit_datetime else ""
+
+    visit = Visit(
+        visit_number=1,
+        visit_datetime=visit_datetime,
+        visit_date=visit_date,
+        visit_time=visit_time,
+        tubric_study_code=s.get("tubric_study_code", ""),
+        consent_contact=s.get("consent_contact"),
+        entered_by=s.get("is_guardian"),
+    )
+
+    events = []
+
+    if existing:
+        guid = existing["guid"]
+        existing["last_seen_at"] = visit_datetime
+        events.append({"event": "last_seen", "guid": guid, "last_seen_at": visit_datetime})
+
+        visit_number = len(existing.get("visits", ())) + 1
+
+        # Update primary contact info if missing, otherwise track secondary changes
+        before = contact_snapshot(existing, CONTACT_FIELDS)
+        if email:
+            if not existing.get("primary_email"):
+                existing["primary_email"] = normalize_email(email)
+            elif normalize_email(email) != normalize_email(existing.get("primary_email", "")):
+                add_secondary_email(existing, email, visit_number, visit_datetime, registry["people_by_email"])
+
+        if phone:
+            if not existing.get("primary_phone"):
+                existing["primary_phone"] = normalize_phone(phone)
+            elif normalize_phone(phone) != normalize_phone(existing.get("primary_phone", "")):
+                add_secondary_phone(existing, phone, visit_number, visit_datetime, registry["people_by_phone"])
+
+        if newsletter_email:
+            add_newsletter_email(existing, newsletter_email, visit_number, visit_datetime)
+        if newsletter_phone:
+            add_newsletter_phone(existing, newsletter_phone, visit_number, visit_datetime)
+        if newsletter_pref:
+            existing["newsletter_pref"] = newsletter_pref
+
+        after = contact_snapshot(existing, CONTACT_FIELDS)
+        if after != before:
+            index_person_contacts(registry, existing)
+            events.append({"event": "contact_update", "guid": guid, "fields": after})
+
+        if existing.get("enrolled_at") is None:
+            # First check-in of someone already in the registry.
+            existing["enrolled_at"] = visit_datetime
+            existing["consent_contact"] = s.get("consent_contact")
+            events.append(
+                {
+                    "event": "enrolled",
+                    "guid": guid,
+                    "enrolled_at": visit_datetime,
+                    "consent_contact": s.get("consent_contact"),
+                }
+            )
+
+        visit["visit_number"] = visit_number
+        existing.setdefault("visits", []).append(visit)
+        events.append({"event": "new_visit", "guid": guid, "visit": visit})
+        action = "matched_fuzzy" if review_candidates else "matched_existing"
+    else:
+        guid = new_guid()
+        created_at = now_iso()
+        person = Person(
+            guid=guid,
+            first_name=s.get("first_name", "").strip(),
+            last_name=s.get("last_name", "").strip(),
+            dob=dob,
+            primary_email=normalize_email(email),
+            primary_phone=normalize_phone(phone),
+            consent_contact=s.get("consent_contact"),
+            created_at=created_at,
+            enrolled_at=created_at,
+            last_seen_at=visit_datetime,
+            visits=[visit],
+        )
+        if newsletter_email:
+            add_newsletter_email(person, newsletter_email, 1, visit_datetime)
+        if newsletter_phone:
+            add_newsletter_phone(person, newsletter_phone, 1, visit_datetime)
+        if newsletter_pref:
+            person["newsletter_pref"] = newsletter_pref
+        registry["people"].append(person)
+        index_person(registry, person)
+        events.append({"event": "new_person", "guid": guid, "person": journal_record(person)})
+        action = "created_new"
+
+    entry = {"at": visit_datetime, "guid": guid, "action": action, "events": events}
+    return guid, action, entry, visit, review_candidates
@@ -0,0 +1,81 @@
+"""
+Paths and tunables shared by the headless kiosk core.
+
+Everything here is read at call time (`config.NAME`), so tools such as the
+benchmark harness can point the core at another folder by reassigning them.
+"""
+
+import os
+
+KIOSK_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # /.../TUBRIC/Database/tubric_kiosk
+BASE_DIR = os.path.dirname(KIOSK_DIR)                                     # /.../TUBRIC/Database
+PRIVATE_DIR = os.path.abspath(os.path.join(BASE_DIR, "..", "ID-data"))    # /.../TUBRIC/ID-data
+
+LEGACY_DATA_FILE = os.path.join(KIOSK_DIR, "tubric_profiles.json")
+
+FULL_EXPORT_DIR = os.path.join(PRIVATE_DIR, "db_exports")
+DEID_EXPORT_DIR = os.path.join(BASE_DIR, "db_exports")
+
+GUID_PEOPLE_CSV = os.path.join(FULL_EXPORT_DIR, "guid_people.csv")
+GUID_CONTACT_UPDATES_CSV = os.path.join(FULL_EXPORT_DIR, "guid_contact_updates.csv")
+PARTICIPANTS_CSV = os.path.join(FULL_EXPORT_DIR, "participants.csv")
+PARTICIPANT_VISITS_CSV = os.path.join(FULL_EXPORT_DIR, "participant_visits.csv")
+PARTICIPANT_CONTACT_UPDATES_CSV = os.path.join(FULL_EXPORT_DIR, "participant_contact_updates.csv")
+
+DEID_EXPORT_FILE = os.path.join(DEID_EXPORT_DIR, "deidentified_visits.csv")
+
+# Append-only log of check-in events since the last compaction. The full CSVs
+# above are regenerated from memory once the journal grows past this size.
+CHECKIN_JOURNAL = os.path.join(FULL_EXPORT_DIR, "checkin_journal.jsonl")
+JOURNAL_COMPACT_BYTES = 256 * 1024
+
+# Multi-process safety: every write holds an flock on STORAGE_LOCK_FILE and
+# first replays what other processes appended. Compaction bumps the number in
+# JOURNAL_GENERATION_FILE and keeps the retired journal as
+# CHECKIN_JOURNAL_PREVIOUS for processes that are one compaction behind.
+STORAGE_LOCK_FILE = os.path.join(FULL_EXPORT_DIR, ".kiosk_storage.lock")
+JOURNAL_GENERATION_FILE = os.path.join(FULL_EXPORT_DIR, "checkin_journal.generation")
+CHECKIN_JOURNAL_PREVIOUS = os.path.join(FULL_EXPORT_DIR, "checkin_journal.prev.jsonl")
+
+# Binary dump of the parsed CSVs (plus indexes) for fast startup. Only used
+# while the CSVs still match the size/mtime/hash it was taken from.
+SNAPSHOT_FILE = os.path.join(FULL_EXPORT_DIR, ".kiosk_snapshot.pickle")
+SNAPSHOT_VERSION = 6
+
+# Storage backend for the private data: "csv" (CSVs + journal) or "sqlite".
+# With SQLite the CSVs above are still written as exports by compact_journal().
+STORAGE_BACKEND = os.environ.get("TUBRIC_STORAGE", "csv")
+SQLITE_DB = os.path.join(FULL_EXPORT_DIR, "tubric_kiosk.sqlite3")
+# Check-ins kept in the SQLite checkin_log table for other processes to catch up from.
+SQLITE_LOG_KEEP = 10000
+
+# Background git push of the de-identified export.
+PUSH_MIN_INTERVAL_SECONDS = 60
+PUSH_MAX_BACKOFF_SECONDS = 15 * 60
+PUSH_TIMEOUT_SECONDS = 120
+
+# Optional fuzzy matching (TUBRIC_FUZZY_MATCH=1). When the exact DOB + name
+# match finds nobody, candidates from the blocking indexes are scored with
+# edit distance; strong matches are accepted and near misses are appended to
+# MATCH_REVIEW_LOG for staff review.
+FUZZY_MATCHING = os.environ.get("TUBRIC_FUZZY_MATCH", "") == "1"
+FUZZY_MAX_NAME_DISTANCE = 2
+FUZZY_ACCEPT_SCORE = 4
+FUZZY_REVIEW_SCORE = 3
+MATCH_REVIEW_LOG = os.path.join(FULL_EXPORT_DIR, "match_review.jsonl")
+
+# Tk kiosk check-in writer thread: how many finished check-ins may wait to be
+# saved. Finish reports a failure at once if the queue is full.
+WRITER_QUEUE_SIZE = 32
+
+# Asyncio check-in service (kiosk_service.py). Check-ins queued while one
+# batch is being saved are written together, up to SERVICE_BATCH_MAX per
+# fsync; at most SERVICE_QUEUE_SIZE may wait before connections are paused.
+SERVICE_SOCKET = os.path.join(FULL_EXPORT_DIR, "kiosk_service.sock")
+SERVICE_BATCH_MAX = 64
+SERVICE_QUEUE_SIZE = 1024
+# The service compacts the journal once no check-in has arrived for
+# SERVICE_COMPACT_IDLE_SECONDS, rather than in the middle of a rush; only a
+# journal past SERVICE_COMPACT_MAX_BYTES is compacted under load.
+SERVICE_COMPACT_IDLE_SECONDS = 2
+SERVICE_COMPACT_MAX_BYTES = 4 * 1024 * 1024
@@ -0,0 +1,199 @@
+"""
+Batch duplicate detection over the GUID registry.
+
+Check-in matching only compares a new arrival against the registry, so
+duplicates that slipped through earlier (or came in with the legacy
+migration) are never found. find_duplicates() looks for them without the
+all-pairs comparison:
+  - every person is placed in a few blocks (canonical DOB, Soundex surname
+    with two of year/month/day, each email, each phone)
+  - pairs are only scored within a block, with the fuzzy matcher's rules
+  - blocks are spread across a process pool
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from . import config
+from .fuzzy import dob_points, name_points
+from .matching import name_key
+from .normalize import normalize_email, normalize_phone, phonetic_key, swapped_dob
+
+# Blocks bigger than this are skipped (and reported): a placeholder email or
+# phone shared by hundreds of people would otherwise cost O(size^2).
+MAX_BLOCK_SIZE = 500
+
+# Pairs per worker task; small blocks are batched up to roughly this many.
+PAIRS_PER_TASK = 20000
+
+
+def compact_person(person):
+    """
+    (guid, dob, name key, emails, phones): just what pair scoring needs, so
+    the registry is cheap to hand to worker processes.
+    """
+    emails = {normalize_email(e) for e in [person.get("primary_email", "")] + list(person.get("secondary_emails", []))}
+    phones = {normalize_phone(p) for p in [person.get("primary_phone", "")] + list(person.get("secondary_phones", []))}
+    emails.discard("")
+    phones.discard("")
+    return (
+        person.get("guid", ""),
+        person.get("dob", ""),
+        name_key(person.get("first_name", ""), person.get("last_name", "")),
+        frozenset(emails),
+        frozenset(phones),
+    )
+
+
+def blocking_keys(record):
+    """
+    Blocks one person belongs to. Two people who could score as duplicates
+    share at least one of them:
+      - DOB, canonicalized so a date and its day/month swap meet
+      - Soundex surname + two of (year, month, day), so a DOB that is one
+        digit off still meets on the other two parts
+      - each email and each phone
+    """
+    _, dob, key, emails, phones = record
+    keys = []
+    if dob:
+        swapped = swapped_dob(dob)
+        keys.append(("dob", min(dob, swapped) if swapped else dob))
+    sound = phonetic_key(key[1])
+    parts = dob.split("-")
+    if sound and len(parts) == 3:
+        year, month, day = parts
+        keys.append(("surname_ym", sound, year, month))
+        keys.append(("surname_yd", sound, year, day))
+        keys.append(("surname_md", sound, month, day))
+    keys.extend(("email", e) for e in emails)
+    keys.extend(("phone", p) for p in phones)
+    return keys
+
+
+def pair_score(a, b, min_score):
+    """
+    Scores two compact records on the find_person / fuzzy scale. Returns
+    (score, reasons, rule) or None below `min_score`. `rule` is "exact" when
+    find_person itself would have matched them (same DOB plus the exact
+    name, or plus a shared email and a shared phone), otherwise "fuzzy".
+    """
+    score, reason = dob_points(a[1], b[1])
+    reasons = [reason] if reason else []
+    same_dob = score == 2
+    contacts = 0
+    if a[3] & b[3]:
+        contacts += 1
+        reasons.append("email")
+    if a[4] & b[4]:
+        contacts += 1
+        reasons.append("phone")
+    score += contacts
+    if score + 2 < min_score:
+        return None
+
+    points, reason = name_points(a[2], b[2])
+    if points:
+        score += points
+        reasons.append(reason)
+    if score < min_score:
+        return None
+    exact = same_dob and (2 if points == 2 else 0) + contacts >= 2
+    return score, reasons, "exact" if exact else "fuzzy"
+
+
+_records = None
+
+
+def _init_worker(records):
+    global _records
+    _records = records
+
+
+def _score_blocks(blocks, min_score):
+    """
+    Worker task: scores every pair inside each block. Returns
+    [(i, j, score, reasons, rule)] with i < j.
+    """
+    records = _records
+    seen = set()
+    found = []
+    for block in blocks:
+        for x in range(len(block)):
+            i = block[x]
+            for y in range(x + 1, len(block)):
+                j = block[y]
+                pair = (i, j) if i < j else (j, i)
+                if pair in seen:
+                    continue
+                seen.add(pair)
+                result = pair_score(records[pair[0]], records[pair[1]], min_score)
+                if result:
+                    found.append(pair + result)
+    return found
+
+
+def _batch_blocks(blocks, pairs_per_task):
+    batch, pairs = [], 0
+    for block in blocks:
+        batch.append(block)
+        pairs += len(block) * (len(block) - 1) // 2
+        if pairs >= pairs_per_task:
+            yield batch
+            batch, pairs = [], 0
+    if batch:
+        yield batch
+
+
+def find_duplicates(people, workers=None, min_score=None, max_block=MAX_BLOCK_SIZE):
+    """
+    Ranked merge candidates among `people` (GUID DB person dicts).
+
+    Returns (candidates, stats). Each candidate is
+    {"guid_a", "guid_b", "score", "rule", "reasons"}, best first. stats has
+    people, blocks, pairs (scored within blocks) and skipped_blocks.
+    workers=1 scores in this process instead of a pool.
+    """
+    workers = workers or os.cpu_count() or 1
+    min_score = config.FUZZY_REVIEW_SCORE if min_score is None else min_score
+
+    records = [compact_person(p) for p in people]
+    blocks_by_key = {}
+    for index, record in enumerate(records):
+        for key in blocking_keys(record):
+            blocks_by_key.setdefault(key, []).append(index)
+
+    blocks = []
+    skipped = 0
+    for block in blocks_by_key.values():
+        if len(block) > max_block:
+            skipped += 1
+        elif len(block) > 1:
+            blocks.append(block)
+    blocks.sort(key=len, reverse=True)
+    stats = {
+        "people": len(records),
+        "blocks": len(blocks),
+        "pairs": sum(len(b) * (len(b) - 1) // 2 for b in blocks),
+        "skipped_blocks": skipped,
+    }
+
+    # A pair can share several blocks; keep one result per pair.
+    results = {}
+    if workers == 1:
+        _init_worker(records)
+        batches = [_score_blocks(blocks, min_score)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(records,)) as pool:
+            tasks = list(_batch_blocks(blocks, PAIRS_PER_TASK))
+            batches = list(pool.map(_score_blocks, tasks, [min_score] * len(tasks)))
+    for found in batches:
+        for i, j, score, reasons, rule in found:
+            results[(i, j)] = (score, reasons, rule)
+
+    candidates = [
+        {"guid_a": records[i][0], "guid_b": records[j][0], "score": score, "rule": rule, "reasons": reasons}
+        for (i, j), (score, reasons, rule) in results.items()
+    ]
+    candidates.sort(key=lambda c: (-c["score"], c["rule"] != "exact", c["guid_a"], c["guid_b"]))
+    return candidates, stats
@@ -0,0 +1,234 @@
+"""
+Optional typo-tolerant matching on top of the exact DOB-first match.
+
+Candidates come only from the blocking indexes kept by matching.py, so the
+cost is bounded by the block sizes rather than the registry size:
+  - exact DOB                          (people_by_dob)
+  - DOB with day and month swapped     (people_by_dob)
+  - Soundex surname + birth year       (people_by_surname_key)
+  - email / phone                      (people_by_email / people_by_phone)
+Each candidate is then scored with a bounded edit distance on the names.
+"""
+
+import json
+import os
+
+from . import config
+from .matching import match_key, name_key, surname_block_key
+from .normalize import normalize_email, normalize_phone, now_iso, swapped_dob
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Optimal string alignment distance (insert, delete, substitute, or swap two
+    neighbouring letters) between a and b, capped at limit + 1. After trimming
+    the common prefix and suffix, only the band of cells within `limit` of the
+    diagonal is computed, and it stops as soon as a whole row exceeds the limit.
+    """
+    if a == b:
+        return 0
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    # A shared prefix or suffix never changes the distance; most near-equal
+    # names differ in a letter or two, so this leaves very little to align.
+    start = 0
+    shortest = min(len(a), len(b))
+    while start < shortest and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < shortest - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a = a[start : len(a) - end]
+    b = b[start : len(b) - end]
+    if not a or not b:
+        return min(len(a) + len(b), limit + 1)
+    # Each edit adds or removes at most one letter from the letter set, so
+    # this rejects clearly different names without running the alignment.
+    if len(set(a) ^ set(b)) > 2 * limit:
+        return limit + 1
+    over = limit + 1
+    before = None
+    prev = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        cur = [over] * (len(b) + 1)
+        if i <= limit:
+            cur[0] = i
+        row_min = cur[0]
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            d = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                d = min(d, before[j - 2] + 1)
+            if d > over:
+                d = over
+            cur[j] = d
+            if d < row_min:
+                row_min = d
+        if row_min > limit:
+            return over
+        before, prev = prev, cur
+    return prev[-1]
+
+
+def block_candidates(registry, dob, last_name, email_n, phone_n):
+    """
+    Everyone sharing at least one blocking key with the input, by GUID.
+    """
+    found = {}
+    by_dob = registry["people_by_dob"]
+    blocks = [by_dob.get(dob, []), registry["people_by_surname_key"].get(surname_block_key(last_name, dob), [])]
+    swapped = swapped_dob(dob)
+    if swapped:
+        blocks.append(by_dob.get(swapped, []))
+    for block in blocks:
+        for person in block:
+            found[person.get("guid", "")] = person
+
+    people_by_guid = registry["people_by_guid"]
+    guids = set()
+    if email_n:
+        guids |= registry["people_by_email"].get(email_n, set())
+    if phone_n:
+        guids |= registry["people_by_phone"].get(phone_n, set())
+    for guid in guids:
+        if guid not in found and guid in people_by_guid:
+            found[guid] = people_by_guid[guid]
+    return found
+
+
+def dob_points(a: str, b: str):
+    """
+    DOB agreement of two canonical dates as (points, reason): 2 if equal, 1
+    if day and month are swapped or exactly one digit differs, else (0, None).
+    """
+    if a == b:
+        return 2, "dob"
+    if len(a) != len(b):
+        return 0, None
+    # Both are canonical YYYY-MM-DD, so a swap is a plain slice comparison.
+    if len(a) == 10 and a[:5] == b[:5] and a[5:7] == b[8:10] and a[8:10] == b[5:7]:
+        return 1, "dob_day_month_swapped"
+    if sum(map(str.__ne__, a, b)) == 1:
+        return 1, "dob_one_digit_off"
+    return 0, None
+
+
+def name_points(key_a, key_b):
+    """
+    Name agreement of two normalized (first, last) keys as (points, reason):
+    2 if equal, 1 within FUZZY_MAX_NAME_DISTANCE edits in total, else (0, None).
+    """
+    if key_a == key_b:
+        return 2, "name"
+    limit = config.FUZZY_MAX_NAME_DISTANCE
+    distance = edit_distance(key_a[1], key_b[1], limit)
+    if distance <= limit:
+        distance += edit_distance(key_a[0], key_b[0], limit - distance)
+    if distance <= limit:
+        return 1, f"name_{distance}_edit{'s' if distance > 1 else ''}"
+    return 0, None
+
+
+def fuzzy_score(person, key, dob, email_n, phone_n, by_email, by_phone):
+    """
+    Returns (score, reasons, dob_agrees) for one candidate.
+
+    Scoring (same scale as find_person):
+      +2 exact DOB, or +1 for DOB with day/month swapped or one digit off
+      +2 exact first+last name, or +1 if the names are within
+         FUZZY_MAX_NAME_DISTANCE edits in total
+      +1 email match
+      +1 phone match
+
+    Names are compared last, and skipped when even an exact name could not
+    lift the candidate to FUZZY_REVIEW_SCORE.
+    """
+    score, reason = dob_points(person.get("dob", ""), dob)
+    reasons = [reason] if reason else []
+    dob_agrees = score > 0
+
+    guid = person.get("guid", "")
+    if email_n and guid in by_email.get(email_n, ()):
+        score += 1
+        reasons.append("email")
+    if phone_n and guid in by_phone.get(phone_n, ()):
+        score += 1
+        reasons.append("phone")
+    if score + 2 < config.FUZZY_REVIEW_SCORE:
+        return score, reasons, dob_agrees
+
+    points, reason = name_points(match_key(person), key)
+    if points:
+        score += points
+        reasons.append(reason)
+    return score, reasons, dob_agrees
+
+
+def find_person_fuzzy(registry, dob, first_name, last_name, email, phone):
+    """
+    Typo-tolerant fallback for find_person(). Returns (match, candidates):
+      - match: the best candidate if it scores >= FUZZY_ACCEPT_SCORE, agrees
+        on the DOB (exactly, swapped or one digit off) and has no tie;
+        otherwise None
+      - candidates: every candidate scoring >= FUZZY_REVIEW_SCORE, best
+        first, as {"guid", "score", "reasons"} for staff review
+    """
+    key = name_key(first_name, last_name)
+    email_n = normalize_email(email)
+    phone_n = normalize_phone(phone)
+    by_email = registry["people_by_email"]
+    by_phone = registry["people_by_phone"]
+
+    scored = []
+    for guid, person in block_candidates(registry, dob, last_name, email_n, phone_n).items():
+        score, reasons, dob_agrees = fuzzy_score(person, key, dob, email_n, phone_n, by_email, by_phone)
+        if score >= config.FUZZY_REVIEW_SCORE:
+            scored.append((score, dob_agrees, guid, reasons, person))
+    scored.sort(key=lambda item: item[0], reverse=True)
+
+    match = None
+    if scored:
+        score, dob_agrees, _, _, person = scored[0]
+        unique = len(scored) == 1 or scored[1][0] < score
+        if score >= config.FUZZY_ACCEPT_SCORE and dob_agrees and unique:
+            match = person
+    candidates = [{"guid": guid, "score": score, "reasons": reasons} for score, _, guid, reasons, _ in scored]
+    return match, candidates
+
+
+# ----------------------------
+# Staff review log
+# ----------------------------
+def record_match_review(guid, action, state, candidates):
+    """
+    Appends one line to MATCH_REVIEW_LOG (private folder) describing a fuzzy
+    match or near miss, so staff can confirm or merge the records later.
+    """
+    entry = {
+        "at": now_iso(),
+        "guid": guid,
+        "action": action,
+        "input": {
+            "first_name": state.get("first_name", ""),
+            "last_name": state.get("last_name", ""),
+            "dob": state.get("dob", ""),
+        },
+        "candidates": candidates,
+    }
+    os.makedirs(os.path.dirname(config.MATCH_REVIEW_LOG), exist_ok=True)
+    with open(config.MATCH_REVIEW_LOG, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+
+def read_match_review():
+    if not os.path.exists(config.MATCH_REVIEW_LOG):
+        return []
+    entries = []
+    with open(config.MATCH_REVIEW_LOG, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return entries
@@ -0,0 +1,191 @@
+"""
+DOB-first identity matching and the in-memory lookup indexes it uses.
+"""
+
+from .normalize import normalize_email, normalize_name, normalize_phone, phonetic_key
+
+
+# ----------------------------
+# Lookup indexes
+# ----------------------------
+# Kept on the registry dict next to the people list so they travel with it:
+#   registry["people_by_dob"]   -> {dob: [person, ...]}
+#   registry["people_by_guid"]  -> {guid: person}
+#   registry["people_by_email"] -> {normalized email: {guid, ...}}
+#   registry["people_by_phone"] -> {normalized phone: {guid, ...}}
+#   registry["people_by_surname_key"] -> {(soundex of last name, birth year): [person, ...]}
+# The email/phone maps cover primary and secondary contacts (not newsletter
+# ones). Records and contacts are never removed, so indexing on append and
+# after every contact change is enough to stay in sync.
+def _index_contact_values(by_email, by_phone, guid, emails, phones):
+    for e in emails:
+        e = normalize_email(e)
+        if e:
+            by_email.setdefault(e, set()).add(guid)
+    for p in phones:
+        p = normalize_phone(p)
+        if p:
+            by_phone.setdefault(p, set()).add(guid)
+
+
+def index_person_contacts(registry, person):
+    _index_contact_values(
+        registry["people_by_email"],
+        registry["people_by_phone"],
+        person.get("guid", ""),
+        [person.get("primary_email", "")] + list(person.get("secondary_emails", [])),
+        [person.get("primary_phone", "")] + list(person.get("secondary_phones", [])),
+    )
+
+
+def surname_block_key(last_name: str, dob: str):
+    """
+    Blocking key for fuzzy matching: phonetic surname plus birth year, so a
+    block holds the spelling variants of one surname born in one year.
+    """
+    return (phonetic_key(last_name), (dob or "")[:4])
+
+
+def index_person(registry, person):
+    person["_match_key"] = name_key(person.get("first_name", ""), person.get("last_name", ""))
+    registry["people_by_dob"].setdefault(person.get("dob", ""), []).append(person)
+    registry["people_by_surname_key"].setdefault(
+        surname_block_key(person.get("last_name", ""), person.get("dob", "")), []
+    ).append(person)
+    registry["people_by_guid"][person.get("guid", "")] = person
+    index_person_contacts(registry, person)
+
+
+def build_indexes(registry):
+    registry["people_by_dob"] = {}
+    registry["people_by_guid"] = {}
+    registry["people_by_email"] = {}
+    registry["people_by_phone"] = {}
+    registry["people_by_surname_key"] = {}
+    for person in registry["people"]:
+        index_person(registry, person)
+
+
+def ensure_indexes(registry):
+    """
+    Builds the indexes for a registry that was assembled without load_registry().
+    """
+    if "people_by_surname_key" not in registry:
+        build_indexes(registry)
+
+
+def owners_of_email(registry, email: str):
+    """
+    GUIDs of everyone with this email as a primary or secondary contact.
+    """
+    return set(registry["people_by_email"].get(normalize_email(email), ()))
+
+
+def owners_of_phone(registry, phone: str):
+    """
+    GUIDs of everyone with this phone as a primary or secondary contact.
+    """
+    return set(registry["people_by_phone"].get(normalize_phone(phone), ()))
+
+
+# ----------------------------
+# Matching
+# ----------------------------
+def name_key(first_name: str, last_name: str):
+    return (normalize_name(first_name), normalize_name(last_name))
+
+
+def match_key(person):
+    """
+    Normalized (first, last) name for scoring, cached on the record as
+    person["_match_key"]. Names never change after creation, so it is set by
+    index_person() and rides along in the snapshot cache; the leading
+    underscore keeps it out of the CSVs and journal events.
+    """
+    key = person.get("_match_key")
+    if key is None:
+        key = name_key(person.get("first_name", ""), person.get("last_name", ""))
+        person["_match_key"] = key
+    return key
+
+
+def names_match(p, first_name: str, last_name: str) -> bool:
+    return match_key(p) == name_key(first_name, last_name)
+
+
+def _email_matches(person, email_n: str, by_email=None) -> bool:
+    if not email_n:
+        return False
+    if by_email is not None:
+        return person.get("guid", "") in by_email.get(email_n, ())
+    primary = normalize_email(person.get("primary_email", ""))
+    if primary and primary == email_n:
+        return True
+    for e in person.get("secondary_emails", []):
+        if normalize_email(e) == email_n:
+            return True
+    return False
+
+
+def _phone_matches(person, phone_n: str, by_phone=None) -> bool:
+    if not phone_n:
+        return False
+    if by_phone is not None:
+        return person.get("guid", "") in by_phone.get(phone_n, ())
+    primary = normalize_phone(person.get("primary_phone", ""))
+    if primary and primary == phone_n:
+        return True
+    for p in person.get("secondary_phones", []):
+        if normalize_phone(p) == phone_n:
+            return True
+    return False
+
+
+def find_person(people, dob, first_name, last_name, email, phone, by_dob=None, by_email=None, by_phone=None):
+    """
+    DOB-first matching:
+      - Step 1: candidates = exact DOB match (canonical YYYY-MM-DD),
+        taken from the `by_dob` index when given instead of scanning `people`
+      - Step 2: confirm identity using name/email/phone
+      - Accept the best candidate only if confirmation score >= 2
+
+    Scoring:
+      +2 name match (first+last)
+      +1 email match
+      +1 phone match
+
+    With the `by_email`/`by_phone` reverse indexes the contact checks are set
+    lookups instead of re-normalizing every stored contact. Names are compared
+    through the cached match_key(), so no candidate is re-normalized.
+    """
+    key = name_key(first_name, last_name)
+    email_n = normalize_email(email)
+    phone_n = normalize_phone(phone)  # will be "" if invalid (we validate earlier)
+
+    if by_dob is not None:
+        candidates = by_dob.get(dob, [])
+    else:
+        candidates = [p for p in people if p.get("dob") == dob]
+    if not candidates:
+        return None
+
+    best = None
+    best_score = -1
+
+    for p in candidates:
+        score = 0
+
+        if match_key(p) == key:
+            score += 2
+
+        if _email_matches(p, email_n, by_email):
+            score += 1
+
+        if _phone_matches(p, phone_n, by_phone):
+            score += 1
+
+        if score > best_score:
+            best_score = score
+            best = p
+
+    return best if best_score >= 2 else None
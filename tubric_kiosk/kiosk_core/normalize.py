@@ -0,0 +1,96 @@
+"""
+Input normalization shared by matching, storage and both front-ends.
+"""
+
+import re
+from datetime import datetime
+
+
+def now_iso():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def today_str():
+    return datetime.now().strftime("%Y-%m-%d")
+
+
+def normalize_email(s: str) -> str:
+    return (s or "").strip().lower()
+
+
+def normalize_phone(s: str) -> str:
+    """
+    Accepts ONLY valid US phone numbers with exactly 10 digits
+    (optionally entered with formatting characters).
+    Returns 10-digit string or "" if invalid.
+    """
+    digits = re.sub(r"\D+", "", s or "")
+    return digits if len(digits) == 10 else ""
+
+
+def normalize_name(s: str) -> str:
+    s = (s or "").strip().lower()
+    s = re.sub(r"\s+", " ", s)
+    return s
+
+
+def normalize_dob(s: str) -> str:
+    """
+    STRICT: Accepts ONLY MM-DD-YYYY entered by the user.
+    Returns canonical YYYY-MM-DD for storage/matching, or "" if invalid.
+
+    Example accepted: 03-14-2007
+    """
+    raw = (s or "").strip()
+    if not raw:
+        return ""
+
+    try:
+        dt = datetime.strptime(raw, "%m-%d-%Y")
+        return dt.strftime("%Y-%m-%d")
+    except ValueError:
+        return ""
+
+
+_SOUNDEX_CODES = {
+    letter: code
+    for code, letters in (("1", "bfpv"), ("2", "cgjkqsxz"), ("3", "dt"), ("4", "l"), ("5", "mn"), ("6", "r"))
+    for letter in letters
+}
+
+
+def phonetic_key(s: str) -> str:
+    """
+    American Soundex code of a name ("Smith", "Smyth" -> "S530"), used as a
+    blocking key so spelling variants of a surname land in the same bucket.
+    Non-letters are ignored; returns "" if the name has no letters.
+    """
+    letters = [c for c in (s or "").lower() if "a" <= c <= "z"]
+    if not letters:
+        return ""
+    key = letters[0].upper()
+    prev = _SOUNDEX_CODES.get(letters[0], "")
+    for c in letters[1:]:
+        code = _SOUNDEX_CODES.get(c, "")
+        if code and code != prev:
+            key += code
+            if len(key) == 4:
+                break
+        if c not in "hw":
+            prev = code
+    return key.ljust(4, "0")
+
+
+def swapped_dob(dob: str) -> str:
+    """
+    The canonical YYYY-MM-DD date with day and month exchanged (a common
+    entry slip for people used to DD-MM-YYYY), or "" if that is not a valid
+    different date. String-only, since it runs once per candidate pair.
+    """
+    parts = (dob or "").split("-")
+    if len(parts) != 3 or len(dob) != 10 or not all(p.isdigit() for p in parts):
+        return ""
+    year, month, day = parts
+    if day == month or not ("01" <= month <= "12") or not ("01" <= day <= "12"):
+        return ""
+    return f"{year}-{day}-{month}"
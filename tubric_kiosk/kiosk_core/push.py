@@ -0,0 +1,144 @@
+"""
+Background push of the de-identified export to the Git repo.
+"""
+
+import os
+import subprocess
+import threading
+import time
+
+from . import config
+from .normalize import now_iso
+
+
+def _python_executable():
+    exe = os.environ.get("VIRTUAL_ENV")
+    if exe:
+        candidate = os.path.join(exe, "bin", "python")
+        if os.path.exists(candidate):
+            return candidate
+    return "python3"
+
+
+def run_deidentified_push():
+    """
+    Pushes de-identified CSV to the Git repo at BASE_DIR.
+    Returns (ok, message). Blocks on git, so only the push worker calls it.
+    """
+    try:
+        script = os.path.join(config.KIOSK_DIR, "push_deidentified_to_git.py")
+        result = subprocess.run(
+            [_python_executable(), script, config.BASE_DIR, "--file", config.DEID_EXPORT_FILE],
+            check=False,
+            capture_output=True,
+            text=True,
+            timeout=config.PUSH_TIMEOUT_SECONDS,
+        )
+    except Exception as exc:
+        return False, str(exc)
+    message = (result.stdout or result.stderr or "").strip()
+    return result.returncode == 0, message
+
+
+class DeidPushWorker:
+    """
+    Background pusher owned by the kiosk process.
+
+    Check-ins only bump a pending counter; the worker thread folds everything
+    pending into one push, waits at least `min_interval` seconds between
+    pushes and backs off exponentially (capped at `max_backoff`) on failure.
+    """
+
+    def __init__(self, push=run_deidentified_push, min_interval=config.PUSH_MIN_INTERVAL_SECONDS,
+                 max_backoff=config.PUSH_MAX_BACKOFF_SECONDS):
+        self._push = push
+        self.min_interval = min_interval
+        self.max_backoff = max_backoff
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pending = 0
+        self._in_flight = 0
+        self._next_push_at = 0.0
+        self.failures = 0
+        self.last_success_at = ""
+        self.last_error = ""
+
+    def request_push(self):
+        with self._cond:
+            self._pending += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="deid-push", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def status(self):
+        with self._cond:
+            return {
+                "queue_depth": self._pending + self._in_flight,
+                "pushing": self._in_flight > 0,
+                "failures": self.failures,
+                "last_success_at": self.last_success_at,
+                "last_error": self.last_error,
+            }
+
+    def flush(self, timeout=None):
+        """
+        Waits until nothing is pending, ignoring the minimum interval.
+        Used by one-shot callers that are about to exit.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._next_push_at = 0.0
+            self._cond.notify_all()
+            while self._pending or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                delay = self._next_push_at - time.monotonic()
+                if delay > 0:
+                    # More check-ins may arrive meanwhile; they join this push.
+                    self._cond.wait(delay)
+                    continue
+                self._in_flight, self._pending = self._pending, 0
+
+            ok, message = self._push()
+
+            with self._cond:
+                if ok:
+                    self.failures = 0
+                    self.last_success_at = now_iso()
+                    self.last_error = ""
+                    self._next_push_at = time.monotonic() + self.min_interval
+                else:
+                    self.failures += 1
+                    self.last_error = message or "Push failed."
+                    self._pending += self._in_flight
+                    backoff = min(self.max_backoff, self.min_interval * (2 ** self.failures))
+                    self._next_push_at = time.monotonic() + backoff
+                self._in_flight = 0
+                self._cond.notify_all()
+
+
+_push_worker = None
+
+
+def get_push_worker():
+    global _push_worker
+    if _push_worker is None:
+        _push_worker = DeidPushWorker()
+    return _push_worker
+
+
+def auto_push_deidentified():
+    """
+    Queues a push of the de-identified CSV. Never waits on git.
+    """
+    get_push_worker().request_push()
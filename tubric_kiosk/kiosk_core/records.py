@@ -0,0 +1,323 @@
+"""
+Person/participant record types and helpers: GUIDs and contact-list updates.
+"""
+
+import sys
+import uuid
+from operator import attrgetter
+
+from .normalize import normalize_email, normalize_phone, now_iso
+
+# ----------------------------
+# Record types
+# ----------------------------
+# Enum-like fields (consent_contact, entered_by, newsletter_pref, contact
+# update type) and other low-cardinality ones (dob, visit date, study code)
+# are interned, so the registry holds one copy of "Yes" or "guardian"
+# however many records use it.
+LIST_FIELDS = frozenset(
+    ("secondary_emails", "secondary_phones", "newsletter_emails", "newsletter_phones", "contact_updates", "visits")
+)
+
+# Every empty list field holds this one empty tuple instead of its own [].
+_EMPTY = ()
+
+
+class _Unset:
+    """
+    Stands in for an unset field in a pickled record.
+    """
+
+
+class Record:
+    """
+    A registry record with a fixed set of fields stored in __slots__: no
+    per-record dict, enum-like values interned, and empty lists shared.
+
+    It keeps the dict methods the core uses (get, [], setdefault, update,
+    items, in). An empty list field reads as an empty tuple and
+    `record.setdefault("visits", []).append(v)` swaps in a real list, so
+    callers that only iterate or go through setdefault work as before.
+    Assigning a field the type does not have raises KeyError.
+
+    Subclasses list their fields in __slots__; FIELDS, LISTS (the list-valued
+    fields) and _values are derived from it.
+    """
+
+    __slots__ = ()
+    FIELDS = frozenset()
+    LISTS = ()
+    INTERNED = frozenset()
+    NESTED = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.FIELDS = frozenset(cls.__slots__)
+        cls.LISTS = tuple(key for key in cls.__slots__ if key in LIST_FIELDS)
+        # All slot values as a tuple in one C call; AttributeError if one is unset.
+        cls._values = attrgetter(*cls.__slots__)
+
+    def __init__(self, data=None, **fields):
+        if data:
+            fields = dict(data, **fields) if fields else data
+        for key in self.LISTS:
+            setattr(self, key, _EMPTY)
+        interned = self.INTERNED
+        for key, value in fields.items():
+            if type(value) is list:
+                if not value:
+                    continue
+                if key in self.NESTED:
+                    value = self._nested(key, value)
+            elif type(value) is str and key in interned:
+                value = sys.intern(value)
+            try:
+                setattr(self, key, value)
+            except AttributeError:
+                raise KeyError(f"{type(self).__name__} has no field {key!r}") from None
+
+    # Pickled (snapshot cache) as a plain tuple of values in slot order rather
+    # than the default per-record dict of slot names.
+    def __getstate__(self):
+        try:
+            return self._values(self)
+        except AttributeError:
+            return tuple([getattr(self, key, _Unset) for key in self.__slots__])
+
+    def __setstate__(self, state):
+        for key, value in zip(self.__slots__, state):
+            if value is not _Unset:
+                setattr(self, key, value)
+
+    def _nested(self, key, value):
+        record_type = self.NESTED[key]
+        return [item if isinstance(item, record_type) else record_type(item) for item in value]
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        if key not in self.FIELDS:
+            raise KeyError(f"{type(self).__name__} has no field {key!r}")
+        if type(value) is list:
+            if not value:
+                value = _EMPTY
+            elif key in self.NESTED:
+                value = self._nested(key, value)
+        elif type(value) is str and key in self.INTERNED:
+            value = sys.intern(value)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.FIELDS and hasattr(self, key)
+
+    def get(self, key, default=None):
+        if key not in self.FIELDS:
+            return default
+        return getattr(self, key, default)
+
+    def setdefault(self, key, default=None):
+        value = self.get(key, _Unset)
+        if value is _Unset or value is _EMPTY:
+            if key not in self.FIELDS:
+                raise KeyError(f"{type(self).__name__} has no field {key!r}")
+            # Set directly: an empty list default must stay a list the caller can append to.
+            setattr(self, key, default)
+            return default
+        return value
+
+    def update(self, fields):
+        for key, value in fields.items():
+            self[key] = value
+
+    def keys(self):
+        return [key for key in self.__slots__ if hasattr(self, key)]
+
+    def items(self):
+        return [(key, getattr(self, key)) for key in self.__slots__ if hasattr(self, key)]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self.items())!r})"
+
+
+class ContactUpdate(Record):
+    __slots__ = ("type", "value", "added_at", "visit_number", "visit_datetime")
+    INTERNED = frozenset(("type",))
+
+
+class Visit(Record):
+    __slots__ = (
+        "visit_number",
+        "visit_datetime",
+        "visit_date",
+        "visit_time",
+        "tubric_study_code",
+        "consent_contact",
+        "entered_by",
+    )
+    INTERNED = frozenset(("visit_date", "tubric_study_code", "consent_contact", "entered_by"))
+
+
+class Person(Record):
+    """
+    One identity: the GUID registry entry and, once they have checked in,
+    the participant with their visits. guid_people.csv and participants.csv
+    are both written from it. `enrolled_at` is the participant's created_at;
+    it stays None for someone in the registry who never checked in.
+    """
+
+    __slots__ = (
+        "guid",
+        "first_name",
+        "last_name",
+        "dob",
+        "primary_email",
+        "primary_phone",
+        "secondary_emails",
+        "secondary_phones",
+        "newsletter_emails",
+        "newsletter_phones",
+        "newsletter_pref",
+        "consent_contact",
+        "created_at",
+        "enrolled_at",
+        "last_seen_at",
+        "visits",
+        "contact_updates",
+        "_match_key",
+    )
+    INTERNED = frozenset(("dob", "newsletter_pref", "consent_contact"))
+    NESTED = {"visits": Visit, "contact_updates": ContactUpdate}
+
+
+def json_default(value):
+    """
+    `default=` hook for json.dumps: records are written like journal_record().
+    """
+    if isinstance(value, Record):
+        return journal_record(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def new_guid():
+    return str(uuid.uuid4())
+
+
+CONTACT_FIELDS = (
+    "primary_email",
+    "primary_phone",
+    "secondary_emails",
+    "secondary_phones",
+    "newsletter_emails",
+    "newsletter_phones",
+    "newsletter_pref",
+    "contact_updates",
+)
+
+
+def journal_record(record):
+    """
+    Copy of a record for a journal event, without in-memory-only keys (leading
+    underscore). Lists are copied too, so a later check-in in the same group
+    commit cannot change an event before it is written.
+    """
+    return {k: list(v) if isinstance(v, (list, tuple)) else v for k, v in record.items() if not k.startswith("_")}
+
+
+def contact_snapshot(record, fields):
+    snapshot = {}
+    for key in fields:
+        if key in LIST_FIELDS:
+            snapshot[key] = list(record.get(key, ()))
+        else:
+            snapshot[key] = record.get(key, "")
+    return snapshot
+
+
+def add_contact_update(person, contact_type: str, value: str, visit_number: int, visit_datetime: str):
+    person.setdefault("contact_updates", []).append(
+        ContactUpdate(
+            type=contact_type,
+            value=value,
+            added_at=now_iso(),
+            visit_number=visit_number,
+            visit_datetime=visit_datetime,
+        )
+    )
+
+
+def add_secondary_email(person, email: str, visit_number: int, visit_datetime: str, owners=None):
+    """
+    `owners` is the store's reverse index (email -> GUIDs). When given, the
+    duplicate check is one dict lookup and the index is updated in place.
+    """
+    email_n = normalize_email(email)
+    if not email_n:
+        return False
+    guid = person.get("guid", "")
+    if owners is not None:
+        if guid in owners.get(email_n, ()):
+            return False
+    elif email_n in {normalize_email(e) for e in person.get("secondary_emails", [])}:
+        return False
+    person.setdefault("secondary_emails", []).append(email_n)
+    if owners is not None:
+        owners.setdefault(email_n, set()).add(guid)
+    add_contact_update(person, "email", email_n, visit_number, visit_datetime)
+    return True
+
+
+def add_secondary_phone(person, phone: str, visit_number: int, visit_datetime: str, owners=None):
+    """
+    `owners` is the store's reverse index (phone -> GUIDs). When given, the
+    duplicate check is one dict lookup and the index is updated in place.
+    """
+    phone_n = normalize_phone(phone)
+    if not phone_n:
+        return False
+    guid = person.get("guid", "")
+    if owners is not None:
+        if guid in owners.get(phone_n, ()):
+            return False
+    elif phone_n in {normalize_phone(p) for p in person.get("secondary_phones", [])}:
+        return False
+    person.setdefault("secondary_phones", []).append(phone_n)
+    if owners is not None:
+        owners.setdefault(phone_n, set()).add(guid)
+    add_contact_update(person, "phone", phone_n, visit_number, visit_datetime)
+    return True
+
+
+def add_newsletter_email(person, email: str, visit_number: int, visit_datetime: str):
+    email_n = normalize_email(email)
+    if not email_n:
+        return False
+    existing = [normalize_email(e) for e in person.get("newsletter_emails", [])]
+    if email_n in existing:
+        return False
+    person.setdefault("newsletter_emails", []).append(email_n)
+    add_contact_update(person, "newsletter_email", email_n, visit_number, visit_datetime)
+    return True
+
+
+def add_newsletter_phone(person, phone: str, visit_number: int, visit_datetime: str):
+    phone_n = normalize_phone(phone)
+    if not phone_n:
+        return False
+    existing = [normalize_phone(p) for p in person.get("newsletter_phones", [])]
+    if phone_n in existing:
+        return False
+    person.setdefault("newsletter_phones", []).append(phone_n)
+    add_contact_update(person, "newsletter_phone", phone_n, visit_number, visit_datetime)
+    return True
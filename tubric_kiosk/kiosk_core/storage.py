@@ -0,0 +1,1403 @@
+"""
+Storage for the kiosk registry: CSV views, check-in journal, snapshot cache,
+optional SQLite backend, and the de-identified export.
+"""
+
+import contextlib
+import csv
+import errno
+import gc
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import Counter
+from operator import attrgetter
+
+try:
+    import fcntl
+except ImportError:  # Windows: storage_lock falls back to msvcrt, exclusive only
+    fcntl = None
+    import msvcrt
+
+from . import config
+from .matching import build_indexes, ensure_indexes, index_person, index_person_contacts
+from .normalize import normalize_email, normalize_phone, now_iso
+from .records import (
+    CONTACT_FIELDS,
+    ContactUpdate,
+    Person,
+    Record,
+    Visit,
+    contact_snapshot,
+    json_default,
+    new_guid,
+)
+
+
+def read_csv(path):
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, "r", newline="", encoding="utf-8") as f:
+            return list(csv.DictReader(f))
+    except Exception:
+        return []
+
+
+def write_csv(path, fieldnames, rows):
+    """
+    Writes `rows` (value lists in `fieldnames` order, see record_row) atomically.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(fieldnames)
+        writer.writerows(rows)
+    os.replace(tmp_path, path)
+
+
+def _split_list(value: str):
+    if not value:
+        return []
+    return [v for v in value.split("|") if v]
+
+
+def _int_or_blank(value):
+    try:
+        return int(value)
+    except Exception:
+        return ""
+
+
+def _contact_updates_by_guid(contact_rows):
+    contacts_by_guid = {}
+    for c in contact_rows:
+        contacts_by_guid.setdefault(c.get("guid", ""), []).append(
+            ContactUpdate(
+                type=c.get("type", ""),
+                value=c.get("value", ""),
+                added_at=c.get("added_at", ""),
+                visit_number=_int_or_blank(c.get("visit_number", "")),
+                visit_datetime=c.get("visit_datetime", ""),
+            )
+        )
+    return contacts_by_guid
+
+
+def _visits_by_guid(visit_rows):
+    visits_by_guid = {}
+    for v in visit_rows:
+        visits_by_guid.setdefault(v.get("guid", ""), []).append(
+            Visit(
+                visit_number=_int_or_blank(v.get("visit_number", "")),
+                visit_datetime=v.get("visit_datetime", ""),
+                visit_date=v.get("visit_date", ""),
+                visit_time=v.get("visit_time", ""),
+                tubric_study_code=v.get("tubric_study_code", ""),
+                consent_contact=v.get("consent_contact", ""),
+                entered_by=v.get("entered_by", ""),
+            )
+        )
+    return visits_by_guid
+
+
+def _person_from_row(p, contact_updates, visits=()):
+    """
+    A Person from a guid_people.csv row, or a SQLite people row (which also
+    has consent_contact and enrolled_at).
+    """
+    return Person(
+        guid=p.get("guid", ""),
+        first_name=p.get("first_name", ""),
+        last_name=p.get("last_name", ""),
+        dob=p.get("dob", ""),
+        primary_email=p.get("primary_email", ""),
+        primary_phone=p.get("primary_phone", ""),
+        secondary_emails=_split_list(p.get("secondary_emails", "")),
+        secondary_phones=_split_list(p.get("secondary_phones", "")),
+        newsletter_emails=_split_list(p.get("newsletter_emails", "")),
+        newsletter_phones=_split_list(p.get("newsletter_phones", "")),
+        newsletter_pref=p.get("newsletter_pref", ""),
+        consent_contact=p.get("consent_contact", ""),
+        created_at=p.get("created_at", ""),
+        enrolled_at=p.get("enrolled_at"),
+        last_seen_at=p.get("last_seen_at", ""),
+        visits=list(visits),
+        contact_updates=contact_updates,
+    )
+
+
+# participants.csv columns and the Person fields they must equal for the
+# participant row to add nothing but enrollment and visits.
+_SAME_CONTACT_COLUMNS = (
+    ("email", "primary_email"),
+    ("phone", "primary_phone"),
+    ("secondary_emails", "secondary_emails"),
+    ("secondary_phones", "secondary_phones"),
+    ("newsletter_emails", "newsletter_emails"),
+    ("newsletter_phones", "newsletter_phones"),
+    ("newsletter_pref", "newsletter_pref"),
+)
+
+
+def registry_from_rows(people_rows, contact_rows, participant_rows=(), visit_rows=(), participant_contact_rows=()):
+    """
+    Builds the in-memory registry from flat rows shaped like the CSV exports:
+    guid_people.csv and guid_contact_updates.csv, then participants.csv with
+    participant_visits.csv and participant_contact_updates.csv, which mark
+    who has checked in and add their visits.
+    """
+    registry = _registry_from_people_rows(people_rows, contact_rows)
+    _add_participant_rows(registry, participant_rows, visit_rows, participant_contact_rows)
+    return registry
+
+
+def _registry_from_people_rows(people_rows, contact_rows):
+    contacts_by_guid = _contact_updates_by_guid(contact_rows)
+    return {"people": [_person_from_row(p, contacts_by_guid.get(p.get("guid", ""), [])) for p in people_rows]}
+
+
+def _add_participant_rows(registry, participant_rows, visit_rows, participant_contact_rows):
+    """
+    Both sets of files are views of one Person per GUID. Files written before
+    that was so may disagree; see merge_participant(). When a participant's
+    contact columns and contact updates match the person's, as they do in
+    every export since, they are not parsed a second time.
+    """
+    people = registry["people"]
+    people_by_guid = {person["guid"]: person for person in people}
+    visits_by_guid = _visits_by_guid(visit_rows)
+    contact_rows_by_guid = {}
+    for c in participant_contact_rows:
+        contact_rows_by_guid.setdefault(c.get("guid", ""), []).append(c)
+
+    for p in participant_rows:
+        guid = p.get("guid", "")
+        person = people_by_guid.get(guid)
+        contacts = contact_rows_by_guid.get(guid, [])
+        if person is not None and _same_contacts(p, contacts, person):
+            person["consent_contact"] = p.get("consent_contact", "")
+            person["enrolled_at"] = p.get("created_at", "")
+            person["visits"] = visits_by_guid.get(guid, [])
+            continue
+        participant = {
+            "guid": guid,
+            "first_name": p.get("first_name", ""),
+            "last_name": p.get("last_name", ""),
+            "dob": p.get("dob", ""),
+            "email": p.get("email", ""),
+            "phone": p.get("phone", ""),
+            "secondary_emails": _split_list(p.get("secondary_emails", "")),
+            "secondary_phones": _split_list(p.get("secondary_phones", "")),
+            "newsletter_emails": _split_list(p.get("newsletter_emails", "")),
+            "newsletter_phones": _split_list(p.get("newsletter_phones", "")),
+            "newsletter_pref": p.get("newsletter_pref", ""),
+            "consent_contact": p.get("consent_contact", ""),
+            "created_at": p.get("created_at", ""),
+            "visits": visits_by_guid.get(guid, []),
+            "contact_updates": _contact_updates_by_guid(contacts).get(guid, []),
+        }
+        if person is None:
+            person = new_person_from_participant(participant)
+            people.append(person)
+            people_by_guid[guid] = person
+        else:
+            merge_participant(person, participant)
+
+
+def _same_contacts(participant_row, contact_rows, person):
+    for column, field in _SAME_CONTACT_COLUMNS:
+        value = person.get(field, "")
+        if type(value) in (list, tuple):
+            value = "|".join(value)
+        if participant_row.get(column, "") != (value or ""):
+            return False
+    updates = person.get("contact_updates", ())
+    if len(contact_rows) != len(updates):
+        return False
+    return all(
+        [row.get(field, "") for field in CONTACT_UPDATE_FIELDS[1:]] == [str(value) for value in contact_update_row("", cu)[1:]]
+        for row, cu in zip(contact_rows, updates)
+    )
+
+
+def new_person_from_participant(participant):
+    """
+    A registry Person for a participant record (participants.csv shape) that
+    has no guid_people.csv row of its own.
+    """
+    person = Person(
+        guid=participant.get("guid", ""),
+        first_name=participant.get("first_name", ""),
+        last_name=participant.get("last_name", ""),
+        dob=participant.get("dob", ""),
+        created_at=participant.get("created_at", ""),
+        last_seen_at="",
+    )
+    merge_participant(person, participant)
+    return person
+
+
+def _union(values, more):
+    merged = list(values)
+    for value in more:
+        if value not in merged:
+            merged.append(value)
+    return merged
+
+
+def merge_participant(person, participant):
+    """
+    Folds a participant record in the old participants.csv shape (email,
+    phone, created_at; any subset of its fields) into the Person with the
+    same GUID. Used when loading CSVs, SQLite tables or journal entries from
+    before the two stores were one.
+
+    The registry's name, DOB and primary contacts win. A different primary
+    email or phone becomes a secondary one, contact lists are unioned, and
+    contact updates the person does not have yet are added, so nothing
+    either copy knew is lost.
+    """
+    for key, field, secondary, normalize in (
+        ("email", "primary_email", "secondary_emails", normalize_email),
+        ("phone", "primary_phone", "secondary_phones", normalize_phone),
+    ):
+        value = normalize(participant.get(key) or "")
+        if not value:
+            continue
+        if not person.get(field):
+            person[field] = value
+        elif value != normalize(person.get(field, "")) and value not in person.get(secondary, ()):
+            person[secondary] = _union(person.get(secondary, ()), [value])
+    for key in ("secondary_emails", "secondary_phones", "newsletter_emails", "newsletter_phones"):
+        if participant.get(key):
+            merged = _union(person.get(key, ()), participant[key])
+            if len(merged) != len(person.get(key, ())):
+                person[key] = merged
+    if participant.get("newsletter_pref"):
+        person["newsletter_pref"] = participant["newsletter_pref"]
+    if "consent_contact" in participant:
+        person["consent_contact"] = participant["consent_contact"]
+    if "created_at" in participant:
+        person["enrolled_at"] = participant["created_at"] or ""
+
+    if participant.get("contact_updates"):
+        updates = list(person.get("contact_updates", ()))
+        # Both stores logged the same secondary contact, seconds apart.
+        seen = {(cu.get("type"), cu.get("value"), cu.get("visit_number")) for cu in updates}
+        added = False
+        for cu in participant["contact_updates"]:
+            key = (cu.get("type"), cu.get("value"), cu.get("visit_number"))
+            if key not in seen:
+                seen.add(key)
+                updates.append(cu)
+                added = True
+        if added:
+            updates.sort(key=lambda cu: cu.get("added_at") or "")
+            person["contact_updates"] = updates
+    if participant.get("visits"):
+        visits = list(person.get("visits", ()))
+        numbers = {v.get("visit_number") for v in visits}
+        visits.extend(v for v in participant["visits"] if v.get("visit_number") not in numbers)
+        person["visits"] = visits
+
+
+def load_registry_csv():
+    """
+    The registry from the five private CSVs, without indexes or the journal.
+    """
+    # Two steps, so the registry CSVs' rows are freed before the participant ones are read.
+    registry = _registry_from_people_rows(read_csv(config.GUID_PEOPLE_CSV), read_csv(config.GUID_CONTACT_UPDATES_CSV))
+    _add_participant_rows(
+        registry,
+        read_csv(config.PARTICIPANTS_CSV),
+        read_csv(config.PARTICIPANT_VISITS_CSV),
+        read_csv(config.PARTICIPANT_CONTACT_UPDATES_CSV),
+    )
+    return registry
+
+
+def maybe_migrate_legacy_to_csv():
+    """
+    One-time migration from legacy JSON to CSV source-of-truth.
+    Only runs if CSVs don't exist and legacy file does.
+    """
+    if os.path.exists(config.GUID_PEOPLE_CSV) or os.path.exists(config.PARTICIPANTS_CSV):
+        return
+    if not os.path.exists(config.LEGACY_DATA_FILE):
+        return
+    try:
+        with open(config.LEGACY_DATA_FILE, "r", encoding="utf-8") as f:
+            legacy = json.load(f)
+    except Exception:
+        return
+
+    people = []
+    for p in legacy.get("profiles", []):
+        guid = p.get("guid") or new_guid()
+        created_at = p.get("created_at") or now_iso()
+
+        visits = []
+        for idx, v in enumerate(p.get("visits", []), start=1):
+            visit_dt = v.get("visit_datetime") or now_iso()
+            visit_date = visit_dt.split("T")[0]
+            visit_time = visit_dt.split("T")[1] if "T" in visit_dt else ""
+            visits.append(
+                {
+                    "visit_number": idx,
+                    "visit_datetime": visit_dt,
+                    "visit_date": visit_date,
+                    "visit_time": visit_time,
+                    "tubric_study_code": v.get("tubric_study_code", ""),
+                    "consent_contact": v.get("consent_contact"),
+                    "entered_by": v.get("entered_by"),
+                }
+            )
+
+        people.append(
+            Person(
+                guid=guid,
+                first_name=p.get("first_name", ""),
+                last_name=p.get("last_name", ""),
+                dob=p.get("dob", ""),
+                primary_email=normalize_email(p.get("email", "")),
+                primary_phone=normalize_phone(p.get("phone", "")),
+                consent_contact=p.get("consent_contact"),
+                created_at=created_at,
+                enrolled_at=created_at,
+                last_seen_at=p.get("created_at", ""),
+                visits=visits,
+            )
+        )
+
+    registry = {"people": people}
+    export_guid_csv(registry)
+    export_participants_csv(registry)
+
+
+GUID_PEOPLE_FIELDS = [
+    "guid",
+    "first_name",
+    "last_name",
+    "dob",
+    "primary_email",
+    "primary_phone",
+    "secondary_emails",
+    "secondary_phones",
+    "newsletter_emails",
+    "newsletter_phones",
+    "newsletter_pref",
+    "created_at",
+    "last_seen_at",
+]
+PARTICIPANT_FIELDS = [
+    "guid",
+    "first_name",
+    "last_name",
+    "dob",
+    "email",
+    "phone",
+    "secondary_emails",
+    "secondary_phones",
+    "newsletter_emails",
+    "newsletter_phones",
+    "newsletter_pref",
+    "consent_contact",
+    "created_at",
+]
+PARTICIPANT_VISIT_FIELDS = [
+    "guid",
+    "visit_number",
+    "visit_datetime",
+    "visit_date",
+    "visit_time",
+    "tubric_study_code",
+    "consent_contact",
+    "entered_by",
+]
+CONTACT_UPDATE_FIELDS = ["guid", "type", "value", "added_at", "visit_number", "visit_datetime"]
+DEID_VISIT_FIELDS = ["guid", "visit_number", "visit_datetime", "visit_date", "visit_time", "tubric_study_code"]
+
+# participants.csv columns that a Person stores under another name.
+PARTICIPANT_VIEW_NAMES = {"email": "primary_email", "phone": "primary_phone", "created_at": "enrolled_at"}
+_PARTICIPANT_SOURCE_FIELDS = [PARTICIPANT_VIEW_NAMES.get(f, f) for f in PARTICIPANT_FIELDS]
+
+# One-call readers for each export's fields off a Record (see record_row).
+_PERSON_VALUES = attrgetter(*GUID_PEOPLE_FIELDS)
+_PARTICIPANT_VALUES = attrgetter(*_PARTICIPANT_SOURCE_FIELDS)
+_VISIT_VALUES = attrgetter(*PARTICIPANT_VISIT_FIELDS[1:])
+_DEID_VISIT_VALUES = attrgetter(*DEID_VISIT_FIELDS[1:])
+_CONTACT_UPDATE_VALUES = attrgetter(*CONTACT_UPDATE_FIELDS[1:])
+
+
+def record_row(record, fields, values=None):
+    """
+    The values of `fields` from a record (or plain dict) in order, with lists
+    joined by "|" as in the CSVs. `values`, an attrgetter over the same
+    fields, reads a Record in one call when none of them is unset.
+    """
+    row = None
+    if isinstance(record, Record):
+        if values is not None:
+            try:
+                row = values(record)
+            except AttributeError:
+                pass
+        if row is None:
+            row = [getattr(record, field, "") for field in fields]
+    else:
+        row = [record.get(field, "") for field in fields]
+    return ["|".join(value) if type(value) in (list, tuple) else value for value in row]
+
+
+def person_row(p):
+    return record_row(p, GUID_PEOPLE_FIELDS, _PERSON_VALUES)
+
+
+def participant_row(p):
+    """
+    A Person's participants.csv row.
+    """
+    return record_row(p, _PARTICIPANT_SOURCE_FIELDS, _PARTICIPANT_VALUES)
+
+
+def visit_row(guid, v):
+    return [guid] + record_row(v, PARTICIPANT_VISIT_FIELDS[1:], _VISIT_VALUES)
+
+
+def deidentified_visit_row(guid, v):
+    return [guid] + record_row(v, DEID_VISIT_FIELDS[1:], _DEID_VISIT_VALUES)
+
+
+def contact_update_row(guid, cu):
+    return [guid] + record_row(cu, CONTACT_UPDATE_FIELDS[1:], _CONTACT_UPDATE_VALUES)
+
+
+def participants(registry):
+    """
+    The people who have checked in at least once: the rows of participants.csv.
+    """
+    return [p for p in registry.get("people", []) if p.get("enrolled_at") is not None]
+
+
+def export_guid_csv(registry):
+    people_rows = []
+    contact_rows = []
+
+    for p in registry.get("people", []):
+        people_rows.append(person_row(p))
+        for cu in p.get("contact_updates", []):
+            contact_rows.append(contact_update_row(p.get("guid", ""), cu))
+
+    write_csv(config.GUID_PEOPLE_CSV, GUID_PEOPLE_FIELDS, people_rows)
+    write_csv(config.GUID_CONTACT_UPDATES_CSV, CONTACT_UPDATE_FIELDS, contact_rows)
+
+
+def export_participants_csv(registry):
+    participant_rows = []
+    visit_rows = []
+    contact_rows = []
+
+    for p in participants(registry):
+        participant_rows.append(participant_row(p))
+        for v in p.get("visits", []):
+            visit_rows.append(visit_row(p.get("guid", ""), v))
+        for cu in p.get("contact_updates", []):
+            contact_rows.append(contact_update_row(p.get("guid", ""), cu))
+
+    write_csv(config.PARTICIPANTS_CSV, PARTICIPANT_FIELDS, participant_rows)
+    write_csv(config.PARTICIPANT_VISITS_CSV, PARTICIPANT_VISIT_FIELDS, visit_rows)
+    write_csv(config.PARTICIPANT_CONTACT_UPDATES_CSV, CONTACT_UPDATE_FIELDS, contact_rows)
+
+
+def export_deidentified_visits(registry):
+    rows = []
+    for p in registry.get("people", []):
+        for v in p.get("visits", []):
+            rows.append(deidentified_visit_row(p.get("guid", ""), v))
+    write_csv(config.DEID_EXPORT_FILE, DEID_VISIT_FIELDS, rows)
+
+
+def append_deidentified_visit(guid, visit):
+    """
+    Appends one visit row to the de-identified export.
+    Returns False (nothing written) if the file is missing, has a different
+    header or a torn last line; the caller should rebuild it in full.
+    """
+    return append_deidentified_visits([(guid, visit)])
+
+
+def append_deidentified_visits(visits):
+    """
+    append_deidentified_visit() for several (guid, visit) pairs with one fsync.
+    """
+    try:
+        with open(config.DEID_EXPORT_FILE, "rb") as f:
+            header = f.readline().decode("utf-8").strip()
+            f.seek(-1, os.SEEK_END)
+            ends_with_newline = f.read(1) == b"\n"
+    except (OSError, UnicodeDecodeError):
+        return False
+    if header != ",".join(DEID_VISIT_FIELDS) or not ends_with_newline:
+        return False
+
+    with open(config.DEID_EXPORT_FILE, "a", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerows(deidentified_visit_row(guid, visit) for guid, visit in visits)
+        f.flush()
+        os.fsync(f.fileno())
+    return True
+
+
+def verify_deidentified_visits(registry):
+    """
+    Checks the de-identified export against the source visits (order-insensitive).
+    Returns a list of problems; empty means the file is in sync.
+    """
+    expected = Counter()
+    for p in registry.get("people", []):
+        for v in p.get("visits", []):
+            row = deidentified_visit_row(p.get("guid", ""), v)
+            expected[tuple("" if value is None else str(value) for value in row)] += 1
+
+    if not os.path.exists(config.DEID_EXPORT_FILE):
+        return ["file missing"]
+    actual = Counter(
+        tuple(r.get(f) or "" for f in DEID_VISIT_FIELDS) for r in read_csv(config.DEID_EXPORT_FILE)
+    )
+
+    problems = []
+    missing = expected - actual
+    extra = actual - expected
+    if missing:
+        problems.append(f"{sum(missing.values())} visit row(s) missing")
+    if extra:
+        problems.append(f"{sum(extra.values())} unexpected or duplicate row(s)")
+    return problems
+
+
+def repair_deidentified_visits(registry):
+    """
+    Verifies the de-identified export and rebuilds it in full if it drifted.
+    Returns the problems found.
+    """
+    problems = verify_deidentified_visits(registry)
+    if problems:
+        export_deidentified_visits(registry)
+    return problems
+
+
+# ----------------------------
+# Storage lock
+# ----------------------------
+# Several processes may share one db_exports folder (two kiosks, or the Tk
+# app next to the Electron backend). Every change to the private storage
+# happens under an exclusive flock on STORAGE_LOCK_FILE, after the writer
+# has caught up with what the others saved (sync_registry), so no process
+# ever writes from a stale copy. Loading takes the lock shared.
+_lock_local = threading.local()
+# Without fcntl there is no shared mode. Threads of this process queue on this
+# lock first, so only one of them at a time waits on the msvcrt byte lock.
+_process_lock = threading.Lock()
+
+
+def _lock_file_msvcrt(f):
+    f.seek(0)
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            return
+        except OSError as exc:
+            if exc.errno not in (errno.EACCES, errno.EDEADLOCK):
+                raise
+            time.sleep(0.01)
+
+
+def _unlock_file_msvcrt(f):
+    f.seek(0)
+    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextlib.contextmanager
+def storage_lock(shared=False):
+    """
+    Cross-process advisory lock around the private storage. Re-entrant within
+    a thread; a nested request runs under the outer lock, so it may not ask
+    for exclusive access inside a shared one. Without fcntl (Windows) every
+    lock is exclusive.
+    """
+    held = getattr(_lock_local, "mode", None)
+    if held is not None:
+        if held == "shared" and not shared:
+            raise RuntimeError("storage_lock: cannot upgrade a shared lock to exclusive")
+        yield
+        return
+
+    os.makedirs(os.path.dirname(config.STORAGE_LOCK_FILE), exist_ok=True)
+    with open(config.STORAGE_LOCK_FILE, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        else:
+            _process_lock.acquire()
+            try:
+                _lock_file_msvcrt(f)
+            except BaseException:
+                _process_lock.release()
+                raise
+        _lock_local.mode = "shared" if shared else "exclusive"
+        try:
+            yield
+        finally:
+            _lock_local.mode = None
+            if fcntl is None:
+                try:
+                    _unlock_file_msvcrt(f)
+                finally:
+                    _process_lock.release()
+            # Closing the file releases the flock.
+
+
+# ----------------------------
+# Check-in journal
+# ----------------------------
+# Each in-memory copy remembers how much of the shared log it has applied in
+# registry["journal_position"]: ("csv", generation, byte offset) or
+# ("sqlite", last checkin_log id). Compaction moves the journal to
+# CHECKIN_JOURNAL_PREVIOUS and bumps the generation, so a copy that is one
+# compaction behind can still catch up incrementally.
+def read_journal_generation():
+    try:
+        with open(config.JOURNAL_GENERATION_FILE, "r", encoding="utf-8") as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def _write_journal_generation(generation):
+    tmp_path = config.JOURNAL_GENERATION_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(f"{generation}\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, config.JOURNAL_GENERATION_FILE)
+
+
+def append_journal_entry(entry):
+    """
+    Appends one check-in to the journal and fsyncs it before returning.
+    Call under storage_lock(). Returns the journal size after the append.
+    """
+    return append_journal_entries([entry])
+
+
+def append_journal_entries(entries):
+    """
+    append_journal_entry() for several check-ins: one write and one fsync.
+    """
+    os.makedirs(os.path.dirname(config.CHECKIN_JOURNAL), exist_ok=True)
+    line = "".join(json.dumps(entry, separators=(",", ":"), default=json_default) + "\n" for entry in entries)
+    with open(config.CHECKIN_JOURNAL, "a+b") as f:
+        # A crash can leave a torn last line; end it so this entry starts clean.
+        if f.seek(0, os.SEEK_END) > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                line = "\n" + line
+        f.write(line.encode("utf-8"))
+        f.flush()
+        os.fsync(f.fileno())
+        return f.tell()
+
+
+def read_journal_from(path, offset=0):
+    """
+    Returns (entries, end_offset) for the complete lines of a journal file
+    from byte `offset` on. A torn last line is left for a later read; torn
+    lines that were terminated afterwards are skipped.
+    """
+    try:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+    except OSError:
+        return [], offset
+    end = data.rfind(b"\n") + 1
+    entries = []
+    for line in data[:end].splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            continue
+    return entries, offset + end
+
+
+def read_journal():
+    return read_journal_from(config.CHECKIN_JOURNAL)[0]
+
+
+def _apply_journal_event(event, registry):
+    """
+    Applies one journal event. Every event is idempotent, so replaying a
+    journal over CSVs that already contain it (crash mid-compaction) is safe.
+
+    Entries written before the registry was unified also carry
+    `new_participant` events and participant `contact_update`s (store
+    "participants"); those are folded in with merge_participant().
+    """
+    kind = event.get("event")
+    guid = event.get("guid", "")
+    people_by_guid = registry["people_by_guid"]
+    person = people_by_guid.get(guid)
+
+    if kind == "new_person":
+        if person is None:
+            person = Person(event.get("person", {}))
+            registry["people"].append(person)
+            index_person(registry, person)
+
+    elif kind == "new_visit":
+        visit = Visit(event.get("visit", {}))
+        if person is not None:
+            visits = person.setdefault("visits", [])
+            if all(v.get("visit_number") != visit.get("visit_number") for v in visits):
+                visits.append(visit)
+
+    elif kind == "contact_update":
+        if person is not None:
+            if event.get("store") == "participants":
+                merge_participant(person, event.get("fields", {}))
+            else:
+                person.update(event.get("fields", {}))
+            index_person_contacts(registry, person)
+
+    elif kind == "enrolled":
+        if person is not None:
+            person["enrolled_at"] = event.get("enrolled_at", "")
+            person["consent_contact"] = event.get("consent_contact")
+
+    elif kind == "last_seen":
+        if person is not None:
+            person["last_seen_at"] = event.get("last_seen_at", "")
+
+    elif kind == "new_participant":
+        participant = event.get("participant", {})
+        if person is None:
+            person = new_person_from_participant(participant)
+            registry["people"].append(person)
+            index_person(registry, person)
+        elif person.get("enrolled_at") is None:
+            merge_participant(person, participant)
+            index_person_contacts(registry, person)
+
+
+def _apply_entries(entries, registry):
+    for entry in entries:
+        for event in entry.get("events", []):
+            _apply_journal_event(event, registry)
+
+
+def replay_journal(registry):
+    """
+    Applies the whole journal and records the position reached.
+    """
+    ensure_indexes(registry)
+    entries, end = read_journal_from(config.CHECKIN_JOURNAL)
+    _apply_entries(entries, registry)
+    registry["journal_position"] = ("csv", read_journal_generation(), end)
+    return len(entries)
+
+
+def current_journal_position():
+    if config.STORAGE_BACKEND == "sqlite":
+        return ("sqlite", sqlite_read_log(None)[1])
+    try:
+        size = os.path.getsize(config.CHECKIN_JOURNAL)
+    except OSError:
+        size = 0
+    return ("csv", read_journal_generation(), size)
+
+
+def sync_registry(registry):
+    """
+    Catches an in-memory copy up with the check-ins other processes saved
+    since it was loaded or last synced. Call under storage_lock(). Returns
+    the registry; it is reloaded from disk if the copy is too far behind
+    (more than one compaction) to merge incrementally.
+
+    A registry assembled without load_registry() has no position; it is taken
+    as current, as before this existed.
+    """
+    ensure_indexes(registry)
+    position = registry.get("journal_position")
+    if position is None:
+        registry["journal_position"] = current_journal_position()
+        return registry
+
+    if config.STORAGE_BACKEND == "sqlite":
+        if position[0] != "sqlite":
+            return load_registry()
+        entries, last_id = sqlite_read_log(position[1])
+        if entries is None:
+            return load_registry()
+        _apply_entries(entries, registry)
+        registry["journal_position"] = ("sqlite", last_id)
+        return registry
+
+    if position[0] != "csv":
+        return load_registry()
+    _, known_generation, offset = position
+    generation = read_journal_generation()
+    if known_generation == generation:
+        sources = [(config.CHECKIN_JOURNAL, offset)]
+    elif known_generation == generation - 1 and os.path.exists(config.CHECKIN_JOURNAL_PREVIOUS):
+        sources = [(config.CHECKIN_JOURNAL_PREVIOUS, offset), (config.CHECKIN_JOURNAL, 0)]
+    else:
+        return load_registry()
+
+    end = 0
+    for path, start in sources:
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size < start:
+            # The file was replaced underneath this copy; start over.
+            return load_registry()
+        entries, end = read_journal_from(path, start)
+        _apply_entries(entries, registry)
+    registry["journal_position"] = ("csv", generation, end)
+    return registry
+
+
+# ----------------------------
+# Snapshot cache
+# ----------------------------
+def _snapshot_sources():
+    return [
+        config.GUID_PEOPLE_CSV,
+        config.GUID_CONTACT_UPDATES_CSV,
+        config.PARTICIPANTS_CSV,
+        config.PARTICIPANT_VISITS_CSV,
+        config.PARTICIPANT_CONTACT_UPDATES_CSV,
+    ]
+
+
+def source_fingerprint():
+    """
+    (name, size, mtime_ns, blake2b) for each source CSV; None for missing files.
+    """
+    fingerprint = []
+    for path in _snapshot_sources():
+        try:
+            st = os.stat(path)
+            digest = hashlib.blake2b(digest_size=16)
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+        except OSError:
+            fingerprint.append((os.path.basename(path), None))
+            continue
+        fingerprint.append((os.path.basename(path), st.st_size, st.st_mtime_ns, digest.hexdigest()))
+    return fingerprint
+
+
+@contextlib.contextmanager
+def gc_paused():
+    """
+    Pauses the cyclic GC while loading or exporting the whole registry. These
+    allocate hundreds of thousands of acyclic records and rows, and every
+    collection they trigger would walk all of them again.
+    """
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def freeze_loaded_registry():
+    """
+    Moves everything allocated so far into the GC's permanent generation.
+    Long-lived processes call this once, after their first load_registry().
+
+    The registry stays resident for the whole session and holds no reference
+    cycles. Slotted records, unlike dicts of strings, are always tracked by the
+    cyclic GC, so without this every full collection walks all of them. A
+    replaced registry is still freed by reference counting; one loaded later
+    (after an error or a reload) is simply not frozen.
+    """
+    gc.freeze()
+
+
+def load_snapshot(fingerprint):
+    """
+    Returns the registry if the snapshot matches `fingerprint`, else None.
+    """
+    try:
+        with gc_paused(), open(config.SNAPSHOT_FILE, "rb") as f:
+            data = pickle.load(f)
+    except Exception:
+        return None
+    if not isinstance(data, dict) or data.get("version") != config.SNAPSHOT_VERSION:
+        return None
+    if data.get("fingerprint") != fingerprint:
+        return None
+    return data["registry"]
+
+
+def save_snapshot(fingerprint, registry):
+    """
+    Best effort: a failed write only costs the next startup a CSV parse.
+    """
+    tmp_path = f"{config.SNAPSHOT_FILE}.{os.getpid()}.tmp"
+    data = {
+        "version": config.SNAPSHOT_VERSION,
+        "fingerprint": fingerprint,
+        "registry": registry,
+    }
+    try:
+        os.makedirs(os.path.dirname(config.SNAPSHOT_FILE), exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, config.SNAPSHOT_FILE)
+    except Exception:
+        pass
+
+
+def _load_csv_registry():
+    with storage_lock():
+        maybe_migrate_legacy_to_csv()
+    with storage_lock(shared=True):
+        return _load_csv_registry_locked()
+
+
+def _load_csv_registry_locked():
+    fingerprint = source_fingerprint()
+    registry = load_snapshot(fingerprint)
+    if registry is None:
+        with gc_paused():
+            registry = load_registry_csv()
+            build_indexes(registry)
+        save_snapshot(fingerprint, registry)
+    replay_journal(registry)
+    return registry
+
+
+def load_registry():
+    """
+    Returns the registry with lookup indexes built.
+
+    CSV backend: the CSV materialized views plus any check-ins journaled since
+    the last compaction. SQLite backend: the database, seeded from the CSVs
+    and journal the first time it is opened.
+    """
+    if config.STORAGE_BACKEND == "sqlite":
+        if not os.path.exists(config.SQLITE_DB):
+            with storage_lock():
+                if not os.path.exists(config.SQLITE_DB):
+                    sqlite_import_registry(_load_csv_registry())
+                    if os.path.exists(config.CHECKIN_JOURNAL):
+                        os.remove(config.CHECKIN_JOURNAL)
+        with gc_paused():
+            registry = sqlite_load_registry()
+            build_indexes(registry)
+    else:
+        registry = _load_csv_registry()
+    return registry
+
+
+def export_all_csv(registry):
+    with gc_paused():
+        export_guid_csv(registry)
+        export_participants_csv(registry)
+        export_deidentified_visits(registry)
+
+
+def compact_journal(registry):
+    """
+    Catches up with other processes, regenerates the full CSVs from memory,
+    then retires the journal (it becomes CHECKIN_JOURNAL_PREVIOUS under the
+    next generation). Under the SQLite backend there is no journal; this
+    refreshes the exports and records which check-ins they include. Returns
+    the (possibly reloaded) registry.
+    """
+    with storage_lock():
+        registry = sync_registry(registry)
+        export_all_csv(registry)
+        if config.STORAGE_BACKEND == "csv":
+            if os.path.exists(config.CHECKIN_JOURNAL):
+                os.replace(config.CHECKIN_JOURNAL, config.CHECKIN_JOURNAL_PREVIOUS)
+            generation = read_journal_generation() + 1
+            _write_journal_generation(generation)
+            registry["journal_position"] = ("csv", generation, 0)
+            # Memory now matches the CSVs exactly, so the next startup can skip parsing.
+            save_snapshot(source_fingerprint(), registry)
+        else:
+            sqlite_mark_exported(registry["journal_position"][1])
+            if os.path.exists(config.CHECKIN_JOURNAL):
+                os.remove(config.CHECKIN_JOURNAL)
+    return registry
+
+
+def journal_size():
+    """
+    How far the CSV views lag behind the saved check-ins, in bytes: the
+    journal (CSV backend), or the check-ins logged since the last export
+    (SQLite), so both backends compact on the same thresholds.
+    """
+    if config.STORAGE_BACKEND == "sqlite":
+        return sqlite_unexported_bytes()
+    try:
+        return os.path.getsize(config.CHECKIN_JOURNAL)
+    except OSError:
+        return 0
+
+
+def maybe_compact_journal(registry, size=None):
+    """
+    Compacts once journal_size() (or the `size` the caller just measured)
+    reaches JOURNAL_COMPACT_BYTES. Returns True if it did.
+    """
+    if size is None:
+        size = journal_size()
+    if size < config.JOURNAL_COMPACT_BYTES:
+        return False
+    compact_journal(registry)
+    return True
+
+
+def persist_checkin(entry, registry):
+    """
+    Durably records one check-in with the configured storage backend.
+    Call under storage_lock() with a registry that sync_registry() just caught
+    up, so the position can move past this entry without re-reading it.
+    Returns True if this triggered a compaction (all exports rewritten).
+    """
+    return persist_checkins([entry], registry)
+
+
+def persist_checkins(entries, registry, compact=True):
+    """
+    persist_checkin() for several check-ins as one group commit: one journal
+    write and fsync, or one SQLite transaction. With compact=False a large
+    journal (or, under SQLite, a large backlog of unexported check-ins) is
+    left for the caller to compact later.
+    """
+    if config.STORAGE_BACKEND == "sqlite":
+        log_id, size = sqlite_apply_entries(entries)
+        registry["journal_position"] = ("sqlite", log_id)
+    else:
+        size = append_journal_entries(entries)
+        position = registry.get("journal_position")
+        if position and position[0] == "csv":
+            registry["journal_position"] = ("csv", position[1], size)
+    return compact and maybe_compact_journal(registry, size)
+
+
+# ----------------------------
+# SQLite backend
+# ----------------------------
+SQLITE_PEOPLE_FIELDS = GUID_PEOPLE_FIELDS + ["consent_contact", "enrolled_at"]
+
+# enrolled_at is NULL for people who have never checked in; participants.csv
+# is the rows where it is set.
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS people (
+    guid TEXT PRIMARY KEY,
+    first_name TEXT, last_name TEXT, dob TEXT,
+    primary_email TEXT, primary_phone TEXT,
+    secondary_emails TEXT, secondary_phones TEXT,
+    newsletter_emails TEXT, newsletter_phones TEXT, newsletter_pref TEXT,
+    created_at TEXT, last_seen_at TEXT,
+    consent_contact TEXT, enrolled_at TEXT
+);
+CREATE INDEX IF NOT EXISTS people_dob ON people (dob);
+CREATE INDEX IF NOT EXISTS people_email ON people (primary_email);
+CREATE INDEX IF NOT EXISTS people_phone ON people (primary_phone);
+
+CREATE TABLE IF NOT EXISTS visits (
+    guid TEXT, visit_number INTEGER,
+    visit_datetime TEXT, visit_date TEXT, visit_time TEXT,
+    tubric_study_code TEXT, consent_contact TEXT, entered_by TEXT,
+    PRIMARY KEY (guid, visit_number)
+);
+
+CREATE TABLE IF NOT EXISTS contact_updates (
+    guid TEXT, type TEXT, value TEXT, added_at TEXT,
+    visit_number INTEGER, visit_datetime TEXT
+);
+CREATE INDEX IF NOT EXISTS contact_updates_guid ON contact_updates (guid);
+CREATE INDEX IF NOT EXISTS contact_updates_value ON contact_updates (value);
+
+CREATE TABLE IF NOT EXISTS checkin_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    entry TEXT
+);
+
+-- The last checkin_log id the CSV exports include (a single row).
+CREATE TABLE IF NOT EXISTS csv_export (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    log_id INTEGER
+);
+"""
+
+# Tables of the layout with separate people and participants stores.
+_SQLITE_SPLIT_TABLES = [
+    "people",
+    "guid_contact_updates",
+    "participants",
+    "participant_visits",
+    "participant_contact_updates",
+]
+
+
+def sqlite_connect(path=None):
+    path = path or config.SQLITE_DB
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=FULL")
+    _sqlite_upgrade_split_tables(conn)
+    conn.executescript(SQLITE_SCHEMA)
+    return conn
+
+
+def _sqlite_has_table(conn, name):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+
+def _sqlite_upgrade_split_tables(conn):
+    """
+    Rewrites a database with separate people and participants tables into the
+    single-registry layout, merging the two copies of each person the way
+    registry_from_rows() does. One transaction, so a concurrent process
+    either sees the old layout and waits, or finds the upgrade done.
+    checkin_log is kept; its entries replay with the legacy events.
+    """
+    if not _sqlite_has_table(conn, "participants"):
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if not _sqlite_has_table(conn, "participants"):
+            conn.execute("ROLLBACK")
+            return
+
+        def rows(table):
+            return [dict(r) for r in conn.execute(f"SELECT * FROM {table} ORDER BY rowid")]
+
+        registry = registry_from_rows(*(rows(table) for table in _SQLITE_SPLIT_TABLES))
+        for table in _SQLITE_SPLIT_TABLES:
+            conn.execute(f"DROP TABLE {table}")
+        # executescript() would commit the open transaction.
+        for statement in SQLITE_SCHEMA.split(";"):
+            if statement.strip():
+                conn.execute(statement)
+        for person in registry["people"]:
+            _sqlite_insert_person(conn, person)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _sqlite_insert(conn, table, fields, row, verb="INSERT"):
+    placeholders = ", ".join("?" for _ in fields)
+    values = ["" if value is None else value for value in row]
+    conn.execute(f"{verb} INTO {table} ({', '.join(fields)}) VALUES ({placeholders})", values)
+
+
+def _sqlite_insert_person(conn, person):
+    guid = person.get("guid", "")
+    row = ["" if value is None else value for value in record_row(person, SQLITE_PEOPLE_FIELDS[:-1])]
+    # Stays NULL for someone who has not checked in.
+    row.append(person.get("enrolled_at"))
+    placeholders = ", ".join("?" for _ in SQLITE_PEOPLE_FIELDS)
+    conn.execute(f"INSERT OR IGNORE INTO people ({', '.join(SQLITE_PEOPLE_FIELDS)}) VALUES ({placeholders})", row)
+    for v in person.get("visits", []):
+        _sqlite_insert(conn, "visits", PARTICIPANT_VISIT_FIELDS, visit_row(guid, v), "INSERT OR IGNORE")
+    for cu in person.get("contact_updates", []):
+        _sqlite_insert(conn, "contact_updates", CONTACT_UPDATE_FIELDS, contact_update_row(guid, cu))
+
+
+def sqlite_import_registry(registry):
+    """
+    Creates SQLITE_DB from an already-loaded registry. Built under a temporary
+    name so a failed import never leaves a half-filled database behind.
+    """
+    tmp_path = config.SQLITE_DB + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite_connect(tmp_path)
+    try:
+        with conn:
+            for person in registry["people"]:
+                _sqlite_insert_person(conn, person)
+    finally:
+        conn.close()
+    os.replace(tmp_path, config.SQLITE_DB)
+
+
+def sqlite_load_registry():
+    conn = sqlite_connect()
+    try:
+        def rows(table):
+            return [dict(r) for r in conn.execute(f"SELECT * FROM {table} ORDER BY rowid")]
+
+        # One read transaction, so the tables and the log position agree.
+        conn.execute("BEGIN")
+        visits_by_guid = _visits_by_guid(rows("visits"))
+        contacts_by_guid = _contact_updates_by_guid(rows("contact_updates"))
+        people = [
+            _person_from_row(p, contacts_by_guid.get(p["guid"], []), visits_by_guid.get(p["guid"], ()))
+            for p in rows("people")
+        ]
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM checkin_log").fetchone()[0]
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+    return {"people": people, "journal_position": ("sqlite", last_id)}
+
+
+def sqlite_read_log(after_id):
+    """
+    Returns (entries, last_id) for check-ins logged after `after_id`, or
+    (None, None) if some of them were already pruned from checkin_log.
+    With after_id None, returns ([], the latest id).
+    """
+    conn = sqlite_connect()
+    try:
+        if after_id is None:
+            return [], conn.execute("SELECT COALESCE(MAX(id), 0) FROM checkin_log").fetchone()[0]
+        rows = conn.execute("SELECT id, entry FROM checkin_log WHERE id > ? ORDER BY id", (after_id,)).fetchall()
+    finally:
+        conn.close()
+    if rows and rows[0]["id"] != after_id + 1:
+        return None, None
+    entries = [json.loads(r["entry"]) for r in rows]
+    return entries, rows[-1]["id"] if rows else after_id
+
+
+def _sqlite_update_contacts(conn, event):
+    guid = event.get("guid", "")
+    fields = dict(event.get("fields", {}))
+    contact_updates = fields.pop("contact_updates", None)
+    if event.get("store") == "participants":
+        # A check-in logged before the two stores were one: fold it in as
+        # merge_participant() does in memory.
+        person = _sqlite_person(conn, guid)
+        if person is None:
+            return
+        merge_participant(person, {**fields, "contact_updates": contact_updates or []})
+        fields = contact_snapshot(person, CONTACT_FIELDS)
+        contact_updates = fields.pop("contact_updates")
+
+    if fields:
+        columns = ", ".join(f"{k} = ?" for k in fields)
+        values = ["|".join(v) if type(v) in (list, tuple) else ("" if v is None else v) for v in fields.values()]
+        conn.execute(f"UPDATE people SET {columns} WHERE guid = ?", values + [guid])
+    if contact_updates is not None:
+        conn.execute("DELETE FROM contact_updates WHERE guid = ?", (guid,))
+        for cu in contact_updates:
+            _sqlite_insert(conn, "contact_updates", CONTACT_UPDATE_FIELDS, contact_update_row(guid, cu))
+
+
+def _sqlite_person(conn, guid):
+    row = conn.execute("SELECT * FROM people WHERE guid = ?", (guid,)).fetchone()
+    if row is None:
+        return None
+    contact_rows = [dict(r) for r in conn.execute("SELECT * FROM contact_updates WHERE guid = ? ORDER BY rowid", (guid,))]
+    return _person_from_row(dict(row), _contact_updates_by_guid(contact_rows).get(guid, []))
+
+
+def sqlite_apply_entry(entry):
+    """
+    Applies one check-in (the same events the journal records) in a single
+    transaction, and logs it in checkin_log so other processes can catch up.
+    Returns the log id.
+    """
+    return sqlite_apply_entries([entry])[0]
+
+
+def sqlite_apply_entries(entries):
+    """
+    sqlite_apply_entry() for several check-ins in one transaction. Returns
+    (last log id, bytes logged since the CSVs were last exported).
+    """
+    conn = sqlite_connect()
+    try:
+        if not entries:
+            log_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM checkin_log").fetchone()[0]
+        else:
+            with conn:
+                for entry in entries:
+                    log_id = _sqlite_apply_entry(conn, entry)
+                conn.execute("DELETE FROM checkin_log WHERE id <= ?", (log_id - config.SQLITE_LOG_KEEP,))
+        return log_id, _sqlite_unexported_bytes(conn)
+    finally:
+        conn.close()
+
+
+def sqlite_unexported_bytes():
+    """
+    Size of the check-ins logged since the CSVs were last exported. Only
+    checks an existing database: creating one here would skip its seeding.
+    """
+    if not os.path.exists(config.SQLITE_DB):
+        return 0
+    conn = sqlite_connect()
+    try:
+        return _sqlite_unexported_bytes(conn)
+    finally:
+        conn.close()
+
+
+def _sqlite_unexported_bytes(conn):
+    return conn.execute(
+        "SELECT COALESCE(SUM(LENGTH(CAST(entry AS BLOB))), 0) FROM checkin_log"
+        " WHERE id > COALESCE((SELECT log_id FROM csv_export), 0)"
+    ).fetchone()[0]
+
+
+def sqlite_mark_exported(log_id):
+    conn = sqlite_connect()
+    try:
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO csv_export (id, log_id) VALUES (1, ?)", (log_id,))
+    finally:
+        conn.close()
+
+
+def _sqlite_apply_entry(conn, entry):
+    log_id = conn.execute(
+        "INSERT INTO checkin_log (entry) VALUES (?)", (json.dumps(entry, separators=(",", ":"), default=json_default),)
+    ).lastrowid
+    for event in entry.get("events", []):
+        kind = event.get("event")
+        guid = event.get("guid", "")
+        if kind == "new_person":
+            _sqlite_insert_person(conn, event.get("person", {}))
+        elif kind == "new_visit":
+            _sqlite_insert(
+                conn,
+                "visits",
+                PARTICIPANT_VISIT_FIELDS,
+                visit_row(guid, event.get("visit", {})),
+                "INSERT OR IGNORE",
+            )
+        elif kind == "contact_update":
+            _sqlite_update_contacts(conn, event)
+        elif kind == "enrolled":
+            conn.execute(
+                "UPDATE people SET enrolled_at = ?, consent_contact = ? WHERE guid = ?",
+                (event.get("enrolled_at", ""), event.get("consent_contact") or "", guid),
+            )
+        elif kind == "last_seen":
+            conn.execute("UPDATE people SET last_seen_at = ? WHERE guid = ?", (event.get("last_seen_at", ""), guid))
+    return log_id
@@ -0,0 +1,107 @@
+"""
+Single writer thread for check-ins coming from an interactive UI.
+"""
+
+import queue
+import threading
+import traceback
+
+from . import config
+from .checkin import submit_checkin
+from .normalize import now_iso
+from .storage import freeze_loaded_registry, load_registry
+
+
+class CheckinWriter:
+    """
+    Owns the registry and saves check-ins one at a time on its own thread.
+
+    The UI calls submit() with a copy of the check-in state and moves on; the
+    queue is bounded so a stuck disk cannot pile up unsaved check-ins without
+    limit. Failures are counted for status() so the UI can flag them to staff.
+    The writer lives as long as the UI, so its first load is frozen out of the
+    cyclic GC (see freeze_loaded_registry()).
+    """
+
+    def __init__(self, maxsize=config.WRITER_QUEUE_SIZE, on_saved=None):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._on_saved = on_saved
+        self.registry = None
+        self.saved = 0
+        self.failures = 0
+        self.last_error = ""
+        self.last_error_at = ""
+        self._thread = threading.Thread(target=self._run, name="checkin-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, state):
+        """
+        Queues a copy of `state` for saving. Never blocks: returns False at once
+        if the queue is full, since the caller is the UI thread.
+        """
+        try:
+            self._queue.put_nowait(dict(state))
+        except queue.Full:
+            self._record_failure("Check-in queue is full; the writer is not keeping up.")
+            return False
+        return True
+
+    def status(self):
+        with self._lock:
+            return {
+                "queue_depth": self._queue.unfinished_tasks,
+                "saved": self.saved,
+                "failures": self.failures,
+                "last_error": self.last_error,
+                "last_error_at": self.last_error_at,
+            }
+
+    def flush(self, timeout=None):
+        """
+        Waits until every queued check-in has been saved (or failed).
+        Returns False if `timeout` ran out first.
+        """
+        done = threading.Event()
+
+        def wait():
+            self._queue.join()
+            done.set()
+
+        threading.Thread(target=wait, daemon=True).start()
+        return done.wait(timeout)
+
+    def _record_failure(self, message):
+        with self._lock:
+            self.failures += 1
+            self.last_error = message
+            self.last_error_at = now_iso()
+
+    def _run(self):
+        try:
+            self.registry = load_registry()
+        except Exception as exc:
+            traceback.print_exc()
+            self._record_failure(f"Could not load the registry: {exc}")
+        else:
+            freeze_loaded_registry()
+
+        while True:
+            state = self._queue.get()
+            try:
+                guid, action, self.registry = submit_checkin(state, self.registry)
+            except Exception as exc:
+                traceback.print_exc()
+                self._record_failure(str(exc) or exc.__class__.__name__)
+                # The in-memory copy may be half-updated; start over from disk.
+                try:
+                    self.registry = load_registry()
+                except Exception:
+                    self.registry = None
+            else:
+                with self._lock:
+                    self.saved += 1
+                if self._on_saved is not None:
+                    self._on_saved(state, guid, action)
+            finally:
+                self._queue.task_done()
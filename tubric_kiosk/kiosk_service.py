@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Optional asyncio check-in service for a desk with several kiosk front-ends.
+
+One process owns the in-memory registry; clients connect over a Unix socket
+(or localhost TCP) and speak the same protocol as `kiosk_backend_cli.py
+--serve`: one JSON object per line, answered by id, so a client may pipeline
+requests on one connection. The Electron app uses it when
+TUBRIC_SERVICE_SOCKET points at its socket, and otherwise starts its own
+`--serve` backend. The Tk kiosk always saves through its own CheckinWriter.
+  python3 kiosk_service.py                        # Unix socket config.SERVICE_SOCKET
+  python3 kiosk_service.py --socket /tmp/tubric.sock
+  python3 kiosk_service.py --port 8765            # 127.0.0.1 only
+
+Check-ins go onto one queue drained by a single writer task. Everything that
+queued up while the previous batch was being saved is saved as the next one
+(submit_checkins: one journal fsync or SQLite transaction), so throughput
+grows with the load instead of stopping at one fsync per check-in. The
+journal is compacted once the desk has been quiet for a moment rather than
+in the middle of a rush (see SERVICE_COMPACT_* in config). All other
+ops run on the same registry thread between batches, so a lookup never sees
+a half-applied check-in and the event loop never blocks on the disk.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import kiosk_core as core
+from kiosk_backend_cli import Backend
+from kiosk_core import config
+
+
+class CheckinService:
+    def __init__(self, backend, registry, batch_max=config.SERVICE_BATCH_MAX):
+        self.backend = backend
+        # The only thread that touches backend.registry.
+        self.registry = registry
+        self.batch_max = batch_max
+        self.queue = asyncio.Queue(maxsize=config.SERVICE_QUEUE_SIZE)
+        self.stats = {"checkins": 0, "batches": 0, "largest_batch": 0, "compactions": 0}
+
+    async def handle(self, request):
+        op = request.get("op", "submit")
+        loop = asyncio.get_running_loop()
+        if op == "submit":
+            future = loop.create_future()
+            await self.queue.put((request.get("payload") or {}, future))
+            return await future
+        result = await loop.run_in_executor(self.registry, self.backend.handle, request)
+        if op == "status":
+            result["service"] = dict(self.stats, queue_depth=self.queue.qsize())
+        return result
+
+    async def handle_line(self, line):
+        try:
+            request = json.loads(line)
+        except ValueError as exc:
+            return {"id": None, "ok": False, "error": f"Invalid JSON input: {exc}"}
+        try:
+            result = await self.handle(request)
+        except Exception as exc:
+            return {"id": request.get("id"), "ok": False, "error": str(exc)}
+        return {"id": request.get("id"), "ok": True, "result": result}
+
+    async def write_loop(self):
+        """
+        The single writer: saves queued check-ins in arrival order, in batches,
+        and compacts the journal when the desk goes quiet.
+        """
+        loop = asyncio.get_running_loop()
+        getter = None
+        while True:
+            if getter is None:
+                getter = asyncio.ensure_future(self.queue.get())
+            done, _ = await asyncio.wait({getter}, timeout=config.SERVICE_COMPACT_IDLE_SECONDS)
+            if not done:
+                await self.compact_if_due(config.JOURNAL_COMPACT_BYTES)
+                continue
+            batch = [getter.result()]
+            getter = None
+            while len(batch) < self.batch_max and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            try:
+                outcomes = await loop.run_in_executor(
+                    self.registry,
+                    self.backend.submit_many,
+                    [payload for payload, _ in batch],
+                    False,
+                )
+            except Exception as exc:
+                outcomes = [exc] * len(batch)
+            for (_, future), outcome in zip(batch, outcomes):
+                if not future.done():
+                    if isinstance(outcome, Exception):
+                        future.set_exception(outcome)
+                    else:
+                        future.set_result(outcome)
+                self.queue.task_done()
+            self.stats["checkins"] += len(batch)
+            self.stats["batches"] += 1
+            self.stats["largest_batch"] = max(self.stats["largest_batch"], len(batch))
+            await self.compact_if_due(config.SERVICE_COMPACT_MAX_BYTES)
+
+    async def compact_if_due(self, limit):
+        loop = asyncio.get_running_loop()
+        try:
+            if await loop.run_in_executor(self.registry, self.backend.compact_if_due, limit):
+                self.stats["compactions"] += 1
+        except Exception:
+            # The check-ins are safe in the journal; the next quiet moment retries.
+            traceback.print_exc()
+
+    async def serve_connection(self, reader, writer):
+        write_lock = asyncio.Lock()
+        pending = set()
+
+        async def answer(line):
+            response = await self.handle_line(line)
+            async with write_lock:
+                try:
+                    writer.write((json.dumps(response) + "\n").encode("utf-8"))
+                    await writer.drain()
+                except ConnectionError:
+                    pass
+
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ConnectionError, ValueError):
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                task = asyncio.create_task(answer(line.decode("utf-8")))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending)
+        finally:
+            writer.close()
+
+
+async def start_server(service, socket_path=None, port=None):
+    if port:
+        return await asyncio.start_server(service.serve_connection, "127.0.0.1", port)
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    os.makedirs(os.path.dirname(os.path.abspath(socket_path)), exist_ok=True)
+    server = await asyncio.start_unix_server(service.serve_connection, path=socket_path)
+    # Requests carry identifiable data; only this user may connect.
+    os.chmod(socket_path, 0o600)
+    return server
+
+
+async def serve(socket_path=None, port=None, batch_max=config.SERVICE_BATCH_MAX, ready=None):
+    """
+    Loads the registry, serves until SIGINT/SIGTERM, then saves whatever is
+    still queued. `ready` (a threading/multiprocessing Event) is set once
+    connections are accepted.
+    """
+    loop = asyncio.get_running_loop()
+    registry = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kiosk-registry")
+    backend = await loop.run_in_executor(registry, Backend)
+    core.freeze_loaded_registry()
+    service = CheckinService(backend, registry, batch_max=batch_max)
+    writer_task = asyncio.create_task(service.write_loop())
+
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    server = await start_server(service, socket_path, port)
+    where = f"127.0.0.1:{port}" if port else socket_path
+    print(f"Serving {len(backend.registry['people'])} people on {where}", file=sys.stderr, flush=True)
+    if ready is not None:
+        ready.set()
+    try:
+        async with server:
+            await stop.wait()
+        await service.queue.join()
+    finally:
+        writer_task.cancel()
+        registry.shutdown(wait=True)
+        if not port and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve check-ins and lookups to several kiosks from one process.")
+    parser.add_argument("--socket", default=config.SERVICE_SOCKET, help="Unix socket path to listen on.")
+    parser.add_argument("--port", type=int, help="Listen on 127.0.0.1:PORT instead of a Unix socket.")
+    parser.add_argument(
+        "--batch-max",
+        type=int,
+        default=config.SERVICE_BATCH_MAX,
+        help="Most check-ins saved per group commit (1 saves each one on its own).",
+    )
+    args = parser.parse_args()
+    if args.batch_max < 1:
+        print("--batch-max must be at least 1.")
+        return 1
+
+    try:
+        asyncio.run(serve(args.socket, args.port, args.batch_max))
+    finally:
+        core.get_push_worker().flush(timeout=config.PUSH_TIMEOUT_SECONDS)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Load test for kiosk_service.py: many kiosks checking in at once.
+
+Seeds a synthetic registry in a temporary folder (see bench_checkin.py),
+starts the service on a Unix socket in a child process, and runs N
+concurrent clients. Each client opens its own connection and sends one
+request at a time: mostly check-ins of known people, some new people and
+some contact lookups (`owners`). Reports throughput and p50/p95/p99 latency:
+  python3 load_test_service.py --clients 50 --requests 40
+  python3 load_test_service.py --server threaded   # kiosk_backend_cli.py --socket, for comparison
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import kiosk_backend_cli
+import kiosk_service
+from bench_checkin import checkin_state, new_person_state, seed_registry, use_data_dir
+from kiosk_core import config
+
+
+def run_server(kind, data_dir, socket_path, batch_max, storage, ready):
+    # A spawned child starts from a fresh kiosk_core.config.
+    use_data_dir(data_dir)
+    config.STORAGE_BACKEND = storage
+    if kind == "threaded":
+        ready.set()
+        kiosk_backend_cli.serve_socket(kiosk_backend_cli.Backend(), socket_path)
+    else:
+        asyncio.run(kiosk_service.serve(socket_path, batch_max=batch_max, ready=ready))
+
+
+def percentile(samples, fraction):
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def latency_summary(samples):
+    samples = sorted(samples)
+    if not samples:
+        return {"n": 0}
+    return {
+        "n": len(samples),
+        "p50_ms": round(percentile(samples, 0.50), 2),
+        "p95_ms": round(percentile(samples, 0.95), 2),
+        "p99_ms": round(percentile(samples, 0.99), 2),
+        "max_ms": round(samples[-1], 2),
+    }
+
+
+def plan_requests(client, count, people, rng, new_fraction, lookup_fraction):
+    requests = []
+    for i in range(count):
+        roll = rng.random()
+        if roll < lookup_fraction:
+            person = rng.choice(people)
+            requests.append({"op": "owners", "payload": {"contact": person["email"]}})
+        elif roll < lookup_fraction + new_fraction:
+            requests.append({"op": "submit", "payload": new_person_state(client * 100000 + i)})
+        else:
+            requests.append({"op": "submit", "payload": checkin_state(rng.choice(people))})
+    return requests
+
+
+async def run_client(connection, requests, latencies, errors):
+    reader, writer = connection
+    try:
+        for request_id, request in enumerate(requests):
+            request = dict(request, id=request_id)
+            start = time.perf_counter()
+            writer.write((json.dumps(request) + "\n").encode("utf-8"))
+            await writer.drain()
+            response = json.loads(await reader.readline())
+            latencies.setdefault(request["op"], []).append((time.perf_counter() - start) * 1000.0)
+            if not response.get("ok"):
+                errors.append(response.get("error", ""))
+    finally:
+        writer.close()
+
+
+async def run_load(socket_path, plans):
+    latencies = {}
+    errors = []
+    # Connect one at a time up front, each confirmed with a ping, since the
+    # threaded server's listen backlog is only 5.
+    connections = []
+    for _ in plans:
+        reader, writer = await asyncio.open_unix_connection(socket_path)
+        writer.write(b'{"id": 0, "op": "ping"}\n')
+        await writer.drain()
+        await reader.readline()
+        connections.append((reader, writer))
+    start = time.perf_counter()
+    await asyncio.gather(*(run_client(c, plan, latencies, errors) for c, plan in zip(connections, plans)))
+    elapsed = time.perf_counter() - start
+
+    reader, writer = await asyncio.open_unix_connection(socket_path)
+    writer.write(b'{"id": 0, "op": "status"}\n')
+    await writer.drain()
+    status = json.loads(await reader.readline()).get("result", {})
+    writer.close()
+    return latencies, errors, elapsed, status
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-kiosk load test for the check-in service.")
+    parser.add_argument("--clients", type=int, default=50, help="Concurrent kiosk connections.")
+    parser.add_argument("--requests", type=int, default=40, help="Requests per client.")
+    parser.add_argument("--people", type=int, default=10000, help="Synthetic registry size.")
+    parser.add_argument("--new-fraction", type=float, default=0.1, help="Share of check-ins by new people.")
+    parser.add_argument("--lookup-fraction", type=float, default=0.1, help="Share of requests that are lookups.")
+    parser.add_argument("--server", choices=["service", "threaded"], default="service", help="Server to test.")
+    parser.add_argument("--batch-max", type=int, default=config.SERVICE_BATCH_MAX, help="Service group commit size.")
+    parser.add_argument("--storage", choices=["csv", "sqlite"], default="csv", help="Storage backend.")
+    parser.add_argument("--output", help="Also write the results as JSON here.")
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="tubric_load_")
+    socket_path = os.path.join(data_dir, "service.sock")
+    server = None
+    try:
+        use_data_dir(data_dir)
+        config.STORAGE_BACKEND = args.storage
+        people = seed_registry(args.people)
+        rng = random.Random(args.clients)
+        plans = [
+            plan_requests(c, args.requests, people, rng, args.new_fraction, args.lookup_fraction)
+            for c in range(args.clients)
+        ]
+
+        ctx = multiprocessing.get_context("spawn")
+        ready = ctx.Event()
+        server = ctx.Process(
+            target=run_server,
+            args=(args.server, data_dir, socket_path, args.batch_max, args.storage, ready),
+        )
+        server.start()
+        ready.wait(timeout=120)
+        while not os.path.exists(socket_path):
+            time.sleep(0.05)
+
+        latencies, errors, elapsed, status = asyncio.run(run_load(socket_path, plans))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.join(timeout=30)
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    total = sum(len(v) for v in latencies.values())
+    results = {
+        "server": args.server,
+        "storage": args.storage,
+        "clients": args.clients,
+        "people": args.people,
+        "requests": total,
+        "errors": len(errors),
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(total / elapsed, 1),
+        "checkins_per_second": round(len(latencies.get("submit", [])) / elapsed, 1),
+        "latency": latency_summary([ms for samples in latencies.values() for ms in samples]),
+        "latency_by_op": {op: latency_summary(samples) for op, samples in latencies.items()},
+        "service": status.get("service"),
+    }
+
+    print(
+        f"{args.server}: {total} requests from {args.clients} clients in {elapsed:.2f}s "
+        f"({results['requests_per_second']}/s, {results['checkins_per_second']} check-ins/s), {len(errors)} errors"
+    )
+    for op, summary in [("all", results["latency"])] + sorted(results["latency_by_op"].items()):
+        print(
+            f"  {op:<7} p50 {summary['p50_ms']:>8.2f} ms  p95 {summary['p95_ms']:>8.2f} ms  "
+            f"p99 {summary['p99_ms']:>8.2f} ms"
+        )
+    if results["service"]:
+        service = results["service"]
+        print(
+            f"  {service['checkins']} check-ins in {service['batches']} batches "
+            f"(largest {service['largest_batch']}), {service['compactions']} compaction(s)"
+        )
+    if errors:
+        print(f"  first error: {errors[0]}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote: {args.output}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Smoke test for kiosk_backend_cli.py as the Electron app runs it.
+
+Seeds a small synthetic registry in a temporary folder (see bench_checkin.py)
+and runs the CLI in child interpreters: twice without flags (one payload on
+stdin, the one-shot default) and once with --serve. Checks that every call
+answers with a GUID and action, and that the registry ends up with exactly
+one visit per check-in:
+  python3 smoke_backend_cli.py
+Exits 1 on the first failure.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import kiosk_core as core
+from bench_checkin import new_person_state, seed_registry, use_data_dir
+
+KIOSK_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Runs the CLI with the storage paths pointed at the temporary folder.
+CLI_RUNNER = """
+import sys
+from bench_checkin import use_data_dir
+use_data_dir(sys.argv[1])
+sys.argv = ["kiosk_backend_cli.py"] + sys.argv[2:]
+import kiosk_backend_cli
+kiosk_backend_cli.main()
+"""
+
+
+def run_cli(data_dir, args, stdin):
+    return subprocess.run(
+        [sys.executable, "-c", CLI_RUNNER, data_dir] + args,
+        cwd=KIOSK_DIR,
+        input=stdin,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+
+
+def check(condition, message, result=None):
+    if condition:
+        print(f"OK: {message}")
+        return
+    print(f"FAIL: {message}")
+    if result is not None:
+        print(f"  exit {result.returncode}\n  stdout: {result.stdout.strip()}\n  stderr: {result.stderr.strip()}")
+    sys.exit(1)
+
+
+def main():
+    data_dir = tempfile.mkdtemp(prefix="tubric_smoke_")
+    try:
+        use_data_dir(data_dir)
+        seed_registry(50)
+        payload = json.dumps(new_person_state(1))
+
+        guids = []
+        for expected in ("created_new", "matched_existing"):
+            result = run_cli(data_dir, [], payload)
+            try:
+                response = json.loads(result.stdout)
+            except ValueError:
+                response = {}
+            check(
+                result.returncode == 0 and response.get("action") == expected,
+                f"one-shot check-in answers {expected}",
+                result,
+            )
+            guids.append(response["guid"])
+
+        requests = [
+            {"id": 1, "op": "ping"},
+            {"id": 2, "op": "submit", "payload": json.loads(payload)},
+        ]
+        result = run_cli(data_dir, ["--serve"], "".join(json.dumps(r) + "\n" for r in requests))
+        responses = [json.loads(line) for line in result.stdout.splitlines() if line.strip()]
+        check(
+            result.returncode == 0 and len(responses) == 2 and all(r.get("ok") for r in responses),
+            "--serve answers ping and submit",
+            result,
+        )
+        guids.append(responses[1]["result"]["guid"])
+        check(len(set(guids)) == 1, "all three check-ins matched one GUID")
+
+        person = core.load_registry()["people_by_guid"][guids[0]]
+        numbers = [v["visit_number"] for v in person.get("visits", ())]
+        check(numbers == [1, 2, 3], f"one visit saved per check-in (visit numbers {numbers})")
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,8 @@
 import tkinter as tk
 from tkinter import messagebox
-from datetime import datetime
 import os
-import re
-import uuid
-import csv
+
+from kiosk_core import CheckinWriter, config, get_push_worker, normalize_dob, normalize_phone, today_str
 
 APP_TITLE = "TUBRIC Check-In"
 SITE_NAME = "TUBRIC"
@@ -33,92 +31,31 @@ FONT_LABEL = ("Helvetica Neue", 13, "bold")
 FONT_BUTTON = ("Helvetica Neue", 15, "bold")
 FONT_SMALL = ("Helvetica Neue", 12)
 
-LEGACY_DATA_FILE = os.path.join(os.path.dirname(__file__), "tubric_profiles.json")
-
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))  # /.../TUBRIC/Database
-PRIVATE_DIR = os.path.abspath(os.path.join(BASE_DIR, "..", "ID-data"))     # /.../TUBRIC/ID-data
 LOGO_PATH = os.path.join(BASE_DIR, "sourcephoto", "logo.png")
 SHOW_LOGO = False
 
-FULL_EXPORT_DIR = os.path.join(PRIVATE_DIR, "db_exports")
-DEID_EXPORT_DIR = os.path.join(BASE_DIR, "db_exports")
-
-GUID_PEOPLE_CSV = os.path.join(FULL_EXPORT_DIR, "guid_people.csv")
-GUID_CONTACT_UPDATES_CSV = os.path.join(FULL_EXPORT_DIR, "guid_contact_updates.csv")
-PARTICIPANTS_CSV = os.path.join(FULL_EXPORT_DIR, "participants.csv")
-PARTICIPANT_VISITS_CSV = os.path.join(FULL_EXPORT_DIR, "participant_visits.csv")
-PARTICIPANT_CONTACT_UPDATES_CSV = os.path.join(FULL_EXPORT_DIR, "participant_contact_updates.csv")
-
-DEID_EXPORT_FILE = os.path.join(DEID_EXPORT_DIR, "deidentified_visits.csv")
+# How often the staff save-error banner is refreshed, and how long exiting
+# waits for queued check-ins to be written.
+WRITER_POLL_MS = 1000
+WRITER_EXIT_TIMEOUT_SECONDS = 10
 
 ## CODE COMPLETE!
 
 # ----------------------------
 # Helpers
 # ----------------------------
-def now_iso():
-    return datetime.now().isoformat(timespec="seconds")
-
-
-def today_str():
-    return datetime.now().strftime("%Y-%m-%d")
-
-
-def normalize_email(s: str) -> str:
-    return (s or "").strip().lower()
-
 
-def normalize_phone(s: str) -> str:
+def log_checkin(state, guid, action):
     """
-    Accepts ONLY valid US phone numbers with exactly 10 digits
-    (optionally entered with formatting characters).
-    Returns 10-digit string or "" if invalid.
+    Runs on the writer thread after each save.
     """
-    digits = re.sub(r"\D+", "", s or "")
-    return digits if len(digits) == 10 else ""
-
-
-def normalize_name(s: str) -> str:
-    s = (s or "").strip().lower()
-    s = re.sub(r"\s+", " ", s)
-    return s
-
-
-def normalize_dob(s: str) -> str:
-    """
-    STRICT: Accepts ONLY MM-DD-YYYY entered by the user.
-    Returns canonical YYYY-MM-DD for storage/matching, or "" if invalid.
-
-    Example accepted: 03-14-2007
-    """
-    raw = (s or "").strip()
-    if not raw:
-        return ""
-
-    try:
-        dt = datetime.strptime(raw, "%m-%d-%Y")
-        return dt.strftime("%Y-%m-%d")
-    except ValueError:
-        return ""
-
-
-def read_csv(path):
-    if not os.path.exists(path):
-        return []
-    try:
-        with open(path, "r", newline="", encoding="utf-8") as f:
-            return list(csv.DictReader(f))
-    except Exception:
-        return []
-
-
-def write_csv(path, fieldnames, rows):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
-        writer.writeheader()
-        for r in rows:
-            writer.writerow(r)
+    # DEV log (remove later)
+    print("\n--- CHECK-IN SAVED ---")
+    print("Action:", action)
+    print("GUID:", guid)
+    print("State:", state)
+    print("--- END ---\n")
 
 
 def load_logo(max_width=520, max_height=120):
@@ -137,703 +74,6 @@ def load_logo(max_width=520, max_height=120):
         return None
 
 
-def _split_list(value: str):
-    if not value:
-        return []
-    return [v for v in value.split("|") if v]
-
-
-def _int_or_blank(value):
-    try:
-        return int(value)
-    except Exception:
-        return ""
-
-
-def load_guid_db():
-    people_rows = read_csv(GUID_PEOPLE_CSV)
-    contact_rows = read_csv(GUID_CONTACT_UPDATES_CSV)
-
-    contact_by_guid = {}
-    for c in contact_rows:
-        contact_by_guid.setdefault(c.get("guid", ""), []).append(
-            {
-                "type": c.get("type", ""),
-                "value": c.get("value", ""),
-                "added_at": c.get("added_at", ""),
-                "visit_number": _int_or_blank(c.get("visit_number", "")),
-                "visit_datetime": c.get("visit_datetime", ""),
-            }
-        )
-
-    people = []
-    for p in people_rows:
-        guid = p.get("guid", "")
-        people.append(
-            {
-                "guid": guid,
-                "first_name": p.get("first_name", ""),
-                "last_name": p.get("last_name", ""),
-                "dob": p.get("dob", ""),
-                "primary_email": p.get("primary_email", ""),
-                "primary_phone": p.get("primary_phone", ""),
-                "secondary_emails": _split_list(p.get("secondary_emails", "")),
-                "secondary_phones": _split_list(p.get("secondary_phones", "")),
-                "newsletter_emails": _split_list(p.get("newsletter_emails", "")),
-                "newsletter_phones": _split_list(p.get("newsletter_phones", "")),
-                "newsletter_pref": p.get("newsletter_pref", ""),
-                "created_at": p.get("created_at", ""),
-                "last_seen_at": p.get("last_seen_at", ""),
-                "contact_updates": contact_by_guid.get(guid, []),
-            }
-        )
-    return {"people": people}
-
-
-def load_participants_db():
-    participant_rows = read_csv(PARTICIPANTS_CSV)
-    visit_rows = read_csv(PARTICIPANT_VISITS_CSV)
-    contact_rows = read_csv(PARTICIPANT_CONTACT_UPDATES_CSV)
-
-    visits_by_guid = {}
-    for v in visit_rows:
-        visits_by_guid.setdefault(v.get("guid", ""), []).append(
-            {
-                "visit_number": _int_or_blank(v.get("visit_number", "")),
-                "visit_datetime": v.get("visit_datetime", ""),
-                "visit_date": v.get("visit_date", ""),
-                "visit_time": v.get("visit_time", ""),
-                "tubric_study_code": v.get("tubric_study_code", ""),
-                "consent_contact": v.get("consent_contact", ""),
-                "entered_by": v.get("entered_by", ""),
-            }
-        )
-
-    contacts_by_guid = {}
-    for c in contact_rows:
-        contacts_by_guid.setdefault(c.get("guid", ""), []).append(
-            {
-                "type": c.get("type", ""),
-                "value": c.get("value", ""),
-                "added_at": c.get("added_at", ""),
-                "visit_number": _int_or_blank(c.get("visit_number", "")),
-                "visit_datetime": c.get("visit_datetime", ""),
-            }
-        )
-
-    participants = []
-    for p in participant_rows:
-        guid = p.get("guid", "")
-        participants.append(
-            {
-                "guid": guid,
-                "first_name": p.get("first_name", ""),
-                "last_name": p.get("last_name", ""),
-                "dob": p.get("dob", ""),
-                "email": p.get("email", ""),
-                "phone": p.get("phone", ""),
-                "secondary_emails": _split_list(p.get("secondary_emails", "")),
-                "secondary_phones": _split_list(p.get("secondary_phones", "")),
-                "newsletter_emails": _split_list(p.get("newsletter_emails", "")),
-                "newsletter_phones": _split_list(p.get("newsletter_phones", "")),
-                "newsletter_pref": p.get("newsletter_pref", ""),
-                "consent_contact": p.get("consent_contact", ""),
-                "created_at": p.get("created_at", ""),
-                "visits": visits_by_guid.get(guid, []),
-                "contact_updates": contacts_by_guid.get(guid, []),
-            }
-        )
-    return {"participants": participants}
-
-
-def maybe_migrate_legacy_to_csv():
-    """
-    One-time migration from legacy JSON to CSV source-of-truth.
-    Only runs if CSVs don't exist and legacy file does.
-    """
-    if os.path.exists(GUID_PEOPLE_CSV) or os.path.exists(PARTICIPANTS_CSV):
-        return
-    if not os.path.exists(LEGACY_DATA_FILE):
-        return
-    try:
-        import json
-        with open(LEGACY_DATA_FILE, "r", encoding="utf-8") as f:
-            legacy = json.load(f)
-    except Exception:
-        return
-
-    people = []
-    participants = []
-
-    for p in legacy.get("profiles", []):
-        guid = p.get("guid") or new_guid()
-        created_at = p.get("created_at") or now_iso()
-
-        visits = []
-        for idx, v in enumerate(p.get("visits", []), start=1):
-            visit_dt = v.get("visit_datetime") or now_iso()
-            visit_date = visit_dt.split("T")[0]
-            visit_time = visit_dt.split("T")[1] if "T" in visit_dt else ""
-            visits.append(
-                {
-                    "visit_number": idx,
-                    "visit_datetime": visit_dt,
-                    "visit_date": visit_date,
-                    "visit_time": visit_time,
-                    "tubric_study_code": v.get("tubric_study_code", ""),
-                    "consent_contact": v.get("consent_contact"),
-                    "entered_by": v.get("entered_by"),
-                }
-            )
-
-        person = {
-            "guid": guid,
-            "first_name": p.get("first_name", ""),
-            "last_name": p.get("last_name", ""),
-            "dob": p.get("dob", ""),
-            "primary_email": normalize_email(p.get("email", "")),
-            "primary_phone": normalize_phone(p.get("phone", "")),
-            "secondary_emails": [],
-            "secondary_phones": [],
-            "created_at": created_at,
-            "last_seen_at": p.get("created_at", ""),
-            "contact_updates": [],
-        }
-        people.append(person)
-
-        participant = {
-            "guid": guid,
-            "first_name": p.get("first_name", ""),
-            "last_name": p.get("last_name", ""),
-            "dob": p.get("dob", ""),
-            "email": normalize_email(p.get("email", "")),
-            "phone": normalize_phone(p.get("phone", "")),
-            "secondary_emails": [],
-            "secondary_phones": [],
-            "contact_updates": [],
-            "consent_contact": p.get("consent_contact"),
-            "created_at": created_at,
-            "visits": visits,
-        }
-        participants.append(participant)
-
-    export_guid_csv({"people": people})
-    export_participants_csv({"participants": participants})
-
-def export_guid_csv(guid_db):
-    people_rows = []
-    contact_rows = []
-
-    for p in guid_db.get("people", []):
-        people_rows.append(
-            {
-                "guid": p.get("guid", ""),
-                "first_name": p.get("first_name", ""),
-                "last_name": p.get("last_name", ""),
-                "dob": p.get("dob", ""),
-                "primary_email": p.get("primary_email", ""),
-                "primary_phone": p.get("primary_phone", ""),
-                "secondary_emails": "|".join(p.get("secondary_emails", [])),
-                "secondary_phones": "|".join(p.get("secondary_phones", [])),
-                "newsletter_emails": "|".join(p.get("newsletter_emails", [])),
-                "newsletter_phones": "|".join(p.get("newsletter_phones", [])),
-                "newsletter_pref": p.get("newsletter_pref", ""),
-                "created_at": p.get("created_at", ""),
-                "last_seen_at": p.get("last_seen_at", ""),
-            }
-        )
-
-        for cu in p.get("contact_updates", []):
-            contact_rows.append(
-                {
-                    "guid": p.get("guid", ""),
-                    "type": cu.get("type", ""),
-                    "value": cu.get("value", ""),
-                    "added_at": cu.get("added_at", ""),
-                    "visit_number": cu.get("visit_number", ""),
-                    "visit_datetime": cu.get("visit_datetime", ""),
-                }
-            )
-
-    write_csv(
-        GUID_PEOPLE_CSV,
-        [
-            "guid",
-            "first_name",
-            "last_name",
-            "dob",
-            "primary_email",
-            "primary_phone",
-            "secondary_emails",
-            "secondary_phones",
-            "newsletter_emails",
-            "newsletter_phones",
-            "newsletter_pref",
-            "created_at",
-            "last_seen_at",
-        ],
-        people_rows,
-    )
-    write_csv(
-        GUID_CONTACT_UPDATES_CSV,
-        ["guid", "type", "value", "added_at", "visit_number", "visit_datetime"],
-        contact_rows,
-    )
-
-
-def export_participants_csv(participants_db):
-    participant_rows = []
-    visit_rows = []
-    contact_rows = []
-
-    for p in participants_db.get("participants", []):
-        participant_rows.append(
-            {
-                "guid": p.get("guid", ""),
-                "first_name": p.get("first_name", ""),
-                "last_name": p.get("last_name", ""),
-                "dob": p.get("dob", ""),
-                "email": p.get("email", ""),
-                "phone": p.get("phone", ""),
-                "secondary_emails": "|".join(p.get("secondary_emails", [])),
-                "secondary_phones": "|".join(p.get("secondary_phones", [])),
-                "newsletter_emails": "|".join(p.get("newsletter_emails", [])),
-                "newsletter_phones": "|".join(p.get("newsletter_phones", [])),
-                "newsletter_pref": p.get("newsletter_pref", ""),
-                "consent_contact": p.get("consent_contact", ""),
-                "created_at": p.get("created_at", ""),
-            }
-        )
-
-        for v in p.get("visits", []):
-            visit_rows.append(
-                {
-                    "guid": p.get("guid", ""),
-                    "visit_number": v.get("visit_number", ""),
-                    "visit_datetime": v.get("visit_datetime", ""),
-                    "visit_date": v.get("visit_date", ""),
-                    "visit_time": v.get("visit_time", ""),
-                    "tubric_study_code": v.get("tubric_study_code", ""),
-                    "consent_contact": v.get("consent_contact", ""),
-                    "entered_by": v.get("entered_by", ""),
-                }
-            )
-
-        for cu in p.get("contact_updates", []):
-            contact_rows.append(
-                {
-                    "guid": p.get("guid", ""),
-                    "type": cu.get("type", ""),
-                    "value": cu.get("value", ""),
-                    "added_at": cu.get("added_at", ""),
-                    "visit_number": cu.get("visit_number", ""),
-                    "visit_datetime": cu.get("visit_datetime", ""),
-                }
-            )
-
-    write_csv(
-        PARTICIPANTS_CSV,
-        [
-            "guid",
-            "first_name",
-            "last_name",
-            "dob",
-            "email",
-            "phone",
-            "secondary_emails",
-            "secondary_phones",
-            "newsletter_emails",
-            "newsletter_phones",
-            "newsletter_pref",
-            "consent_contact",
-            "created_at",
-        ],
-        participant_rows,
-    )
-    write_csv(
-        PARTICIPANT_VISITS_CSV,
-        [
-            "guid",
-            "visit_number",
-            "visit_datetime",
-            "visit_date",
-            "visit_time",
-            "tubric_study_code",
-            "consent_contact",
-            "entered_by",
-        ],
-        visit_rows,
-    )
-    write_csv(
-        PARTICIPANT_CONTACT_UPDATES_CSV,
-        ["guid", "type", "value", "added_at", "visit_number", "visit_datetime"],
-        contact_rows,
-    )
-
-
-def export_deidentified_visits(participants_db):
-    rows = []
-    for p in participants_db.get("participants", []):
-        for v in p.get("visits", []):
-            rows.append(
-                {
-                    "guid": p.get("guid", ""),
-                    "visit_number": v.get("visit_number", ""),
-                    "visit_datetime": v.get("visit_datetime", ""),
-                    "visit_date": v.get("visit_date", ""),
-                    "visit_time": v.get("visit_time", ""),
-                    "tubric_study_code": v.get("tubric_study_code", ""),
-                }
-            )
-    write_csv(
-        DEID_EXPORT_FILE,
-        ["guid", "visit_number", "visit_datetime", "visit_date", "visit_time", "tubric_study_code"],
-        rows,
-    )
-
-
-def _python_executable():
-    exe = os.environ.get("VIRTUAL_ENV")
-    if exe:
-        candidate = os.path.join(exe, "bin", "python")
-        if os.path.exists(candidate):
-            return candidate
-    return "python3"
-
-
-def auto_push_deidentified():
-    """
-    Pushes de-identified CSV to the Git repo at BASE_DIR.
-    Safe to ignore failures (e.g., no remote, auth not set).
-    """
-    try:
-        import subprocess
-        script = os.path.join(os.path.dirname(__file__), "push_deidentified_to_git.py")
-        subprocess.run(
-            [_python_executable(), script, BASE_DIR, "--file", DEID_EXPORT_FILE],
-            check=False,
-            capture_output=True,
-            text=True,
-        )
-    except Exception:
-        pass
-
-
-def submit_checkin(state, guid_db=None, participants_db=None):
-    """
-    Core save path used by both Tk UI and Electron.
-    Returns (guid, action, guid_db, participants_db).
-    """
-    if guid_db is None or participants_db is None:
-        maybe_migrate_legacy_to_csv()
-        guid_db = load_guid_db()
-        participants_db = load_participants_db()
-
-    s = state
-
-    dob = s.get("dob", "")
-    email = s.get("email", "")
-    phone = s.get("phone", "")
-    newsletter_email = s.get("newsletter_email", "")
-    newsletter_phone = s.get("newsletter_phone", "")
-    newsletter_pref = s.get("newsletter_pref", "")
-
-    existing = find_person(
-        guid_db["people"],
-        dob=dob,
-        first_name=s.get("first_name", ""),
-        last_name=s.get("last_name", ""),
-        email=email,
-        phone=phone,
-    )
-
-    visit_datetime = now_iso()
-    visit_date = visit_datetime.split("T")[0]
-    visit_time = visit_datetime.split("T")[1] if "T" in visit_datetime else ""
-
-    visit = {
-        "visit_number": 1,
-        "visit_datetime": visit_datetime,
-        "visit_date": visit_date,
-        "visit_time": visit_time,
-        "tubric_study_code": s.get("tubric_study_code", ""),
-        "consent_contact": s.get("consent_contact"),
-        "entered_by": s.get("is_guardian"),
-    }
-
-    if existing:
-        guid = existing["guid"]
-        existing["last_seen_at"] = visit_datetime
-
-        participant = find_participant_by_guid(participants_db["participants"], guid)
-        if participant:
-            visit_number = len(participant.get("visits", [])) + 1
-        else:
-            visit_number = 1
-
-        # Update primary contact info if missing, otherwise track secondary changes
-        if email:
-            if not existing.get("primary_email"):
-                existing["primary_email"] = normalize_email(email)
-            elif normalize_email(email) != normalize_email(existing.get("primary_email", "")):
-                add_secondary_email(existing, email, visit_number, visit_datetime)
-
-        if phone:
-            if not existing.get("primary_phone"):
-                existing["primary_phone"] = normalize_phone(phone)
-            elif normalize_phone(phone) != normalize_phone(existing.get("primary_phone", "")):
-                add_secondary_phone(existing, phone, visit_number, visit_datetime)
-
-            if participant:
-                if email:
-                    if not participant.get("email"):
-                        participant["email"] = normalize_email(email)
-                    elif normalize_email(email) != normalize_email(participant.get("email", "")):
-                        add_secondary_email(participant, email, visit_number, visit_datetime)
-
-                if phone:
-                    if not participant.get("phone"):
-                        participant["phone"] = normalize_phone(phone)
-                    elif normalize_phone(phone) != normalize_phone(participant.get("phone", "")):
-                        add_secondary_phone(participant, phone, visit_number, visit_datetime)
-
-                if newsletter_email:
-                    add_newsletter_email(participant, newsletter_email, visit_number, visit_datetime)
-                if newsletter_phone:
-                    add_newsletter_phone(participant, newsletter_phone, visit_number, visit_datetime)
-                if newsletter_pref:
-                    participant["newsletter_pref"] = newsletter_pref
-
-                visit["visit_number"] = visit_number
-                participant.setdefault("visits", []).append(visit)
-            else:
-                visit["visit_number"] = 1
-                participant = {
-                "guid": guid,
-                "first_name": s.get("first_name", "").strip(),
-                "last_name": s.get("last_name", "").strip(),
-                "dob": dob,
-                "email": normalize_email(email),
-                "phone": normalize_phone(phone),
-                    "secondary_emails": [],
-                    "secondary_phones": [],
-                    "newsletter_emails": [],
-                    "newsletter_phones": [],
-                    "contact_updates": [],
-                    "consent_contact": s.get("consent_contact"),
-                    "created_at": now_iso(),
-                    "visits": [visit],
-                }
-                if newsletter_email:
-                    add_newsletter_email(participant, newsletter_email, visit_number, visit_datetime)
-                if newsletter_phone:
-                    add_newsletter_phone(participant, newsletter_phone, visit_number, visit_datetime)
-                if newsletter_pref:
-                    participant["newsletter_pref"] = newsletter_pref
-                participants_db["participants"].append(participant)
-            action = "matched_existing"
-    else:
-        guid = new_guid()
-        person = {
-            "guid": guid,
-            "first_name": s.get("first_name", "").strip(),
-            "last_name": s.get("last_name", "").strip(),
-            "dob": dob,
-            "primary_email": normalize_email(email),
-            "primary_phone": normalize_phone(phone),
-            "secondary_emails": [],
-            "secondary_phones": [],
-            "newsletter_emails": [],
-            "newsletter_phones": [],
-            "created_at": now_iso(),
-            "last_seen_at": visit_datetime,
-            "contact_updates": [],
-        }
-        if newsletter_email:
-            add_newsletter_email(person, newsletter_email, 1, visit_datetime)
-        if newsletter_phone:
-            add_newsletter_phone(person, newsletter_phone, 1, visit_datetime)
-        if newsletter_pref:
-            person["newsletter_pref"] = newsletter_pref
-        guid_db["people"].append(person)
-
-        visit["visit_number"] = 1
-        participant = {
-            "guid": guid,
-            "first_name": s.get("first_name", "").strip(),
-            "last_name": s.get("last_name", "").strip(),
-            "dob": dob,
-            "email": normalize_email(email),
-            "phone": normalize_phone(phone),
-            "secondary_emails": [],
-            "secondary_phones": [],
-            "newsletter_emails": [],
-            "newsletter_phones": [],
-            "contact_updates": [],
-            "consent_contact": s.get("consent_contact"),
-            "created_at": now_iso(),
-            "visits": [visit],
-        }
-        if newsletter_email:
-            add_newsletter_email(participant, newsletter_email, 1, visit_datetime)
-        if newsletter_phone:
-            add_newsletter_phone(participant, newsletter_phone, 1, visit_datetime)
-        if newsletter_pref:
-            participant["newsletter_pref"] = newsletter_pref
-        participants_db["participants"].append(participant)
-        action = "created_new"
-
-    export_guid_csv(guid_db)
-    export_participants_csv(participants_db)
-    export_deidentified_visits(participants_db)
-    auto_push_deidentified()
-
-    return guid, action, guid_db, participants_db
-
-
-def names_match(p, first_name: str, last_name: str) -> bool:
-    return (
-        normalize_name(p.get("first_name", "")) == normalize_name(first_name)
-        and normalize_name(p.get("last_name", "")) == normalize_name(last_name)
-    )
-
-
-def _email_matches(person, email_n: str) -> bool:
-    if not email_n:
-        return False
-    primary = normalize_email(person.get("primary_email", ""))
-    if primary and primary == email_n:
-        return True
-    for e in person.get("secondary_emails", []):
-        if normalize_email(e) == email_n:
-            return True
-    return False
-
-
-def _phone_matches(person, phone_n: str) -> bool:
-    if not phone_n:
-        return False
-    primary = normalize_phone(person.get("primary_phone", ""))
-    if primary and primary == phone_n:
-        return True
-    for p in person.get("secondary_phones", []):
-        if normalize_phone(p) == phone_n:
-            return True
-    return False
-
-
-def find_person(people, dob, first_name, last_name, email, phone):
-    """
-    DOB-first matching:
-      - Step 1: candidates = exact DOB match (canonical YYYY-MM-DD)
-      - Step 2: confirm identity using name/email/phone
-      - Accept the best candidate only if confirmation score >= 2
-
-    Scoring:
-      +2 name match (first+last)
-      +1 email match
-      +1 phone match
-    """
-    email_n = normalize_email(email)
-    phone_n = normalize_phone(phone)  # will be "" if invalid (we validate earlier)
-
-    candidates = [p for p in people if p.get("dob") == dob]
-    if not candidates:
-        return None
-
-    best = None
-    best_score = -1
-
-    for p in candidates:
-        score = 0
-
-        if names_match(p, first_name, last_name):
-            score += 2
-
-        if _email_matches(p, email_n):
-            score += 1
-
-        if _phone_matches(p, phone_n):
-            score += 1
-
-        if score > best_score:
-            best_score = score
-            best = p
-
-    return best if best_score >= 2 else None
-
-
-def new_guid():
-    return str(uuid.uuid4())
-
-
-def find_participant_by_guid(participants, guid: str):
-    for p in participants:
-        if p.get("guid") == guid:
-            return p
-    return None
-
-
-def add_contact_update(person, contact_type: str, value: str, visit_number: int, visit_datetime: str):
-    person.setdefault("contact_updates", []).append(
-        {
-            "type": contact_type,
-            "value": value,
-            "added_at": now_iso(),
-            "visit_number": visit_number,
-            "visit_datetime": visit_datetime,
-        }
-    )
-
-
-def add_secondary_email(person, email: str, visit_number: int, visit_datetime: str):
-    email_n = normalize_email(email)
-    if not email_n:
-        return False
-    existing = [normalize_email(e) for e in person.get("secondary_emails", [])]
-    if email_n in existing:
-        return False
-    person.setdefault("secondary_emails", []).append(email_n)
-    add_contact_update(person, "email", email_n, visit_number, visit_datetime)
-    return True
-
-
-def add_secondary_phone(person, phone: str, visit_number: int, visit_datetime: str):
-    phone_n = normalize_phone(phone)
-    if not phone_n:
-        return False
-    existing = [normalize_phone(p) for p in person.get("secondary_phones", [])]
-    if phone_n in existing:
-        return False
-    person.setdefault("secondary_phones", []).append(phone_n)
-    add_contact_update(person, "phone", phone_n, visit_number, visit_datetime)
-    return True
-
-
-def add_newsletter_email(person, email: str, visit_number: int, visit_datetime: str):
-    email_n = normalize_email(email)
-    if not email_n:
-        return False
-    existing = [normalize_email(e) for e in person.get("newsletter_emails", [])]
-    if email_n in existing:
-        return False
-    person.setdefault("newsletter_emails", []).append(email_n)
-    add_contact_update(person, "newsletter_email", email_n, visit_number, visit_datetime)
-    return True
-
-
-def add_newsletter_phone(person, phone: str, visit_number: int, visit_datetime: str):
-    phone_n = normalize_phone(phone)
-    if not phone_n:
-        return False
-    existing = [normalize_phone(p) for p in person.get("newsletter_phones", [])]
-    if phone_n in existing:
-        return False
-    person.setdefault("newsletter_phones", []).append(phone_n)
-    add_contact_update(person, "newsletter_phone", phone_n, visit_number, visit_datetime)
-    return True
-
-
 # ----------------------------
 # Custom Styled Widgets
 # ----------------------------
@@ -1440,7 +680,12 @@ class StudyCodeFrame(BaseFrame):
 
         self.controller.state["tubric_study_code"] = code
 
-        self.controller.submit_silently()
+        if not self.controller.submit_silently():
+            messagebox.showerror(
+                "Check-In Not Saved",
+                "Your check-in could not be saved.\nPlease let the research assistant know.",
+            )
+            return
         self.controller.show("DoneFrame")
 
 
@@ -1494,9 +739,9 @@ class KioskApp(tk.Tk):
 
         self.logo_image = load_logo()
 
-        maybe_migrate_legacy_to_csv()
-        self.guid_db = load_guid_db()
-        self.participants_db = load_participants_db()
+        # Saves run on the writer thread so Finish never waits on disk or git.
+        self.writer = CheckinWriter(on_saved=log_checkin)
+        self.acknowledged_failures = 0
 
         self.state = {
             "date": today_str(),
@@ -1530,6 +775,18 @@ class KioskApp(tk.Tk):
         self.container.grid_rowconfigure(0, weight=1)
         self.container.grid_columnconfigure(0, weight=1)
 
+        self.status_label = tk.Label(
+            self,
+            bg=COLORS['accent'],
+            fg='white',
+            font=FONT_SMALL,
+            padx=12,
+            pady=6,
+            cursor="hand2",
+        )
+        self.status_label.bind("<Button-1>", lambda e: self._show_save_errors())
+        self._poll_writer()
+
         self.show("WelcomeFrame")
 
     def show(self, frame_name: str):
@@ -1539,8 +796,44 @@ class KioskApp(tk.Tk):
 
     def _confirm_exit(self):
         if messagebox.askyesno("Exit Kiosk", "Are you sure you want to exit the kiosk?"):
+            if not self.writer.flush(timeout=WRITER_EXIT_TIMEOUT_SECONDS):
+                if not messagebox.askyesno(
+                    "Exit Kiosk",
+                    "Some check-ins are still being saved. Exit anyway?",
+                ):
+                    return
+            # The push worker is a daemon thread; give the last de-identified
+            # push a chance to finish before the process exits.
+            if not get_push_worker().flush(timeout=config.PUSH_TIMEOUT_SECONDS):
+                print("De-identified push did not finish before exit; it will go out with the next check-in.")
             self.destroy()
 
+    def _poll_writer(self):
+        """
+        Shows a staff-only banner while saves are failing. Tk widgets are only
+        touched here, on the main thread; the writer just keeps counters.
+        """
+        status = self.writer.status()
+        unacknowledged = status["failures"] - self.acknowledged_failures
+        if unacknowledged > 0:
+            self.status_label.configure(
+                text=f"⚠ {unacknowledged} check-in save error(s) — tap for details"
+            )
+            self.status_label.place(relx=1.0, rely=1.0, anchor="se", x=-12, y=-12)
+            self.status_label.lift()
+        else:
+            self.status_label.place_forget()
+        self.after(WRITER_POLL_MS, self._poll_writer)
+
+    def _show_save_errors(self):
+        status = self.writer.status()
+        messagebox.showwarning(
+            "Check-In Save Errors",
+            f"{status['failures'] - self.acknowledged_failures} check-in(s) failed to save.\n\n"
+            f"Last error ({status['last_error_at']}):\n{status['last_error']}",
+        )
+        self.acknowledged_failures = status["failures"]
+
     def reset(self):
         self.state.update(
             {
@@ -1560,21 +853,9 @@ class KioskApp(tk.Tk):
     def submit_silently(self):
         """
         Silent save + DOB-first matching. Participant never sees matching details.
+        Hands a copy of the state to the writer thread; returns False only if it could not be queued.
         """
-        guid, action, self.guid_db, self.participants_db = submit_checkin(
-            self.state,
-            self.guid_db,
-            self.participants_db,
-        )
-
-        # DEV log (remove later)
-        print("\n--- CHECK-IN SAVED ---")
-        print("Action:", action)
-        print("GUID:", guid)
-        print("State:", dict(self.state))
-        print("--- END ---\n")
-
-        return guid, action
+        return self.writer.submit(self.state)
 
 
 if __name__ == "__main__":